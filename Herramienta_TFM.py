@@ -1,25 +1,46 @@
 # Proyecto RedisTour
 # github: https://github.com/mikebarrdiaz/Deep5
 
+import time
+_t_script = time.perf_counter()
+
+import os
 from pathlib import Path
-from datetime import datetime
-from zoneinfo import ZoneInfo
 
 import numpy as np
 import pandas as pd
 import streamlit as st
-import pydeck as pdk
-import altair as alt
-from streamlit.components.v1 import html as html_component
 import html
 import base64
 
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.neighbors import NearestNeighbors
-
-from streamlit_autorefresh import st_autorefresh
+# pydeck, altair y sklearn se importan de forma perezosa en la sección que los usa
+from instrumentacion import (
+    importar, registrar_seccion, informe_tiempos,
+    iniciar_perfil, medir, medido, cerrar_perfil, eventos_perfil, informe_perfil,
+)
+from datos import (
+    BASE, DATA_DIR, FORECASTS_XLSX, _coerce_numeric,
+    cargar_datos, cargar_descripciones_y_datazt, cargar_opiniones_zt, cargar_forecasts,
+    entrenar_pipeline, mapa_descripciones,
+    FEATURES_KNN, preparar_datazt_filtros, agregado_mapa, construir_ranking,
+    OCC_COLS_DEFAULT, attach_occupancy_breakdown, attach_occupancy_intervals, generacion_actual,
+    forecasts_regenerados,
+)
+from consultas import CONSULTAS
+from tarjetas import render_zone_result_cards, resultados_paginados
+from opiniones import resumen_por_zona
+from busqueda import (
+    PESO_RELEVANCIA_TEXTO, PESO_SATURACION_RANKING, PESO_TEXTO, indice_texto, perfiles_zona, plegar,
+    puntuar_alternativas,
+)
+from saturacion import UMBRAL_SATURACION, indice_saturacion
+from redistribucion import OCUPACION_OBJETIVO, exportar_plan, planificar
+from portada import carrusel_hero
+from precarga import iniciar_precarga
+from metricas import iniciar_metricas, observar
+from historico import VENTANAS_COMPARACION, CRITERIOS_RANKING, presupuesto_puntos, submuestrear_series
+from paquete import paquete_vigente
+from exportacion import FiltroExportacion, FORMATOS_EXPORTACION, exportar_a_bytes, parquet_disponible, version_datos
 
 # =========================
 # CONFIG BASICA DE LA APP
@@ -29,6 +50,15 @@ st.set_page_config(
     page_icon="🌍",
     layout="wide"
 )
+# panel de rendimiento: ?tiempos=1 perfila las ejecuciones de esta sesión. Expone estadísticas
+# internas y escribe en perfil.jsonl, así que solo se atiende si el despliegue lo habilita
+# con REDISTOUR_PANEL_TIEMPOS=1
+PANEL_TIEMPOS = os.environ.get("REDISTOUR_PANEL_TIEMPOS", "0") == "1" and st.query_params.get("tiempos") == "1"
+iniciar_perfil(PANEL_TIEMPOS)
+
+# Cachés calientes en segundo plano desde la primera ejecución del proceso
+iniciar_precarga()
+iniciar_metricas()
 
 # =========================
 # PALETA + UTILIDADES
@@ -46,52 +76,24 @@ MESES_ES = {
     7: "Julio", 8: "Agosto", 9: "Septiembre", 10: "Octubre", 11: "Noviembre", 12: "Diciembre"
 }
 
-# === Ocupación por tipo (columnas por defecto para el desglose) ===
-OCC_COLS_DEFAULT = {
-    "Hotel": "GRADO_OCUPA_PLAZAS_EOH",
-    "Turismo rural": "GRADO_OCUPA_PLAZAS_EOTR",
-    "Apartamentos": "GRADO_OCUPA_PLAZAS_EOAP",
-    "Camping": "GRADO_OCUPA_PARCELAS_EOAC",
-}
-# Etiquetas cortas para chips
-OCC_LABELS = {
-    "Hotel": "🏨 Hotel",
-    "Turismo rural": "🏡 Rural",
-    "Apartamentos": "🏢 Apart.",
-    "Camping": "⛺ Camping",
-}
-
-def attach_occupancy_breakdown(df_fore: pd.DataFrame, zonas_list: list[str], año_sel: int, mes_sel: int) -> dict[str, dict]:
-    """
-    Devuelve {zona: {tipo: valor_float_or_None, ...}} usando OCC_COLS_DEFAULT
-    """
-    out = {z: {} for z in zonas_list}
-    if df_fore is None:
-        return out
-
-    cols_exist = [c for c in OCC_COLS_DEFAULT.values() if c in df_fore.columns]
-    if not cols_exist:
-        return out
-
-    df_mes = df_fore[(df_fore["AÑO"] == año_sel) & (df_fore["MES"] == mes_sel)].copy()
-    if "ZONA_TURISTICA" not in df_mes.columns:
-        return out
-
-    keep_cols = ["ZONA_TURISTICA"] + cols_exist
-    df_mes = df_mes[keep_cols]
-    df_mes["ZONA_TURISTICA"] = df_mes["ZONA_TURISTICA"].astype(str)
-
-    tmp = df_mes.set_index("ZONA_TURISTICA").to_dict(orient="index")
-    for z in zonas_list:
-        zstr = str(z)
-        if zstr in tmp:
-            values = tmp[zstr]
-            for tipo, col in OCC_COLS_DEFAULT.items():
-                out[z].update({tipo: float(values[col]) if (col in values and pd.notna(values[col])) else None})
-        else:
-            for tipo in OCC_COLS_DEFAULT.keys():
-                out[z].update({tipo: None})
-    return out
+@medido("Ocupación desglosada", filas=len)
+def ocupacion_desglosada(paq, df_fore: pd.DataFrame, zonas_list: list[str], año_sel: int, mes_sel: int) -> dict[str, dict]:
+    """Como attach_occupancy_breakdown, pero leyendo el cubo del paquete compartido si lo hay."""
+    if paq is None:
+        return attach_occupancy_breakdown(df_fore, zonas_list, año_sel, mes_sel)
+    occ = paq.ocupacion(zonas_list, año_sel, mes_sel)
+    return {z: {tipo: occ[z].get(col) for tipo, col in OCC_COLS_DEFAULT.items()} for z in zonas_list}
+
+def intervalos_desglosados(paq, df_fore: pd.DataFrame, zonas_list: list[str], año_sel: int, mes_sel: int) -> dict[str, dict]:
+    """{zona: {tipo: (p10, p90) o None}}: intervalo de predicción de la ocupación de cada tipo."""
+    if paq is None:
+        return attach_occupancy_intervals(df_fore, zonas_list, año_sel, mes_sel)
+    itv = paq.intervalos(zonas_list, año_sel, mes_sel)
+    return {z: {tipo: itv[z].get(col) for tipo, col in OCC_COLS_DEFAULT.items()} for z in zonas_list}
+
+def version_consultas(paq) -> tuple:
+    """Versión de los datos de los que dependen los resultados de los recomendadores."""
+    return generacion_actual(), (paq.version if paq is not None else None)
 
 def hex_to_rgba(hex_str, alpha=1.0):
     hex_str = hex_str.strip("#")
@@ -101,12 +103,6 @@ def hex_to_rgba(hex_str, alpha=1.0):
     a = int(max(0, min(1, alpha)) * 255)
     return [r, g, b, a]
 
-def format_pct(x, nan_txt="-"):
-    try:
-        return f"{float(x):.1f}%"
-    except Exception:
-        return nan_txt
-
 def p95_normalized_similarity(distances: list[float]) -> float:
     """Devuelve el percentil 95 (para normalizar similitud), con mínimos de seguridad."""
     if not distances:
@@ -117,11 +113,15 @@ def p95_normalized_similarity(distances: list[float]) -> float:
     return max(float(p95), 1e-9)
 
 
+# Ancho aproximado (px) de los gráficos a ancho completo con layout="wide": Streamlit no
+# expone el ancho real en el servidor. Limita los puntos por serie que se envían a Altair;
+# en despliegues con pantallas mucho más anchas o estrechas se ajusta con la variable de entorno.
+ANCHO_GRAFICO_PX = int(os.environ.get("REDISTOUR_ANCHO_GRAFICO_PX", 1200))
+
+
 # =========================
 # RUTAS (robustas)
 # =========================
-BASE = Path(__file__).resolve().parent
-DATA_DIR = BASE / "Data_Dataestur"
 LOGOS_DIR = BASE / "Logos"
 
 
@@ -168,262 +168,6 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-# =========================
-# CARGA DE DATOS (mapa) – Excel
-# =========================
-REQ_COLS_TOTAL = ["ZONA_TURISTICA", "AÑO", "MES",
-                  "VIAJEROS_EOH", "VIAJEROS_EOTR", "VIAJEROS_EOAP", "VIAJEROS_EOAC"]
-REQ_COLS_COORDS = ["ZONA_TURISTICA", "lat", "long"]
-
-def _coerce_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
-    for c in cols:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
-
-def _normalize_zone_colnames(df: pd.DataFrame) -> pd.DataFrame:
-    """Normaliza nombres de columnas eliminando acentos, espacios y mayúsculas/minúsculas.
-       Mapea a: ZONA_TURISTICA, DESCRIPCION, Comunidad_Autonoma, Provincia
-    """
-    def deaccent(s: str) -> str:
-        return (s.replace("Í","I").replace("í","i")
-                 .replace("Ú","U").replace("ú","u")
-                 .replace("Á","A").replace("á","a")
-                 .replace("É","E").replace("é","e")
-                 .replace("Ó","O").replace("ó","o"))
-    ren = {}
-    for c in df.columns:
-        norm = deaccent(c).strip().replace(" ", "_").upper()
-        mapping = {
-            "ZONA_TURISTICA": "ZONA_TURISTICA",
-            "DESCRIPCION": "DESCRIPCION",
-            "COMUNIDAD_AUTONOMA": "Comunidad_Autonoma",
-            "PROVINCIA": "Provincia",
-        }
-        if norm in mapping:
-            ren[c] = mapping[norm]
-    if ren:
-        df = df.rename(columns=ren)
-    if "ZONA_TURISTICA" in df.columns:
-        df["ZONA_TURISTICA"] = df["ZONA_TURISTICA"].astype(str).str.strip()
-    return df
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_datos():
-    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
-    if not total_excel.exists():
-        st.error(f"No se encuentra {total_excel}.")
-        st.stop()
-    # salt de cache por mtime
-    _salt = total_excel.stat().st_mtime
-    try:
-        df_total = pd.read_excel(total_excel, sheet_name="Total")
-        df_coords = pd.read_excel(total_excel, sheet_name="Coordenadas ZT")
-    except Exception as e:
-        st.error(f"No se pudo abrir el Excel: {e}")
-        st.stop()
-
-    df_total = _normalize_zone_colnames(df_total)
-    df_coords = _normalize_zone_colnames(df_coords)
-
-    faltan_total = [c for c in REQ_COLS_TOTAL if c not in df_total.columns]
-    faltan_coords = [c for c in REQ_COLS_COORDS if c not in df_coords.columns]
-    if faltan_total:
-        st.error(f"Faltan columnas en DATA_TOTAL: {faltan_total}")
-        st.stop()
-    if faltan_coords:
-        st.error(f"Faltan columnas en COORDS_ZT: {faltan_coords}")
-        st.stop()
-
-    df_total = _coerce_numeric(df_total, ["AÑO", "MES", "VIAJEROS_EOH", "VIAJEROS_EOTR", "VIAJEROS_EOAP", "VIAJEROS_EOAC"])
-
-    df_coords = df_coords.drop_duplicates("ZONA_TURISTICA")
-    df = df_total.merge(df_coords[["ZONA_TURISTICA", "lat", "long"]], on="ZONA_TURISTICA", how="left")
-
-    return df_total, df_coords, df, _salt
-
-df_total, df_coords, df, _salt_datos = cargar_datos()
-
-# =========================
-# DESCRIPCIONES + DATA ZT
-# =========================
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_descripciones_y_datazt():
-    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
-    if not total_excel.exists():
-        st.error(f"No se encuentra {total_excel}.")
-        st.stop()
-    _salt = total_excel.stat().st_mtime
-
-    try:
-        df_zt = pd.read_excel(total_excel, sheet_name="Data ZT")
-    except Exception as e:
-        st.error(f"No se pudo leer la hoja 'Data ZT' en DATA_TOTAL.xlsx: {e}")
-        st.stop()
-    df_zt = _normalize_zone_colnames(df_zt)
-
-    try:
-        df_desc = pd.read_excel(total_excel, sheet_name="Descripciones")
-    except Exception as e:
-        st.warning(f"No se pudo leer la hoja 'Descripciones': {e}")
-        df_desc = pd.DataFrame(columns=["ZONA_TURISTICA", "DESCRIPCION"])
-
-    df_desc = _normalize_zone_colnames(df_desc)
-    if "DESCRIPCION" not in df_desc.columns:
-        if "Descripcion" in df_desc.columns:
-            df_desc = df_desc.rename(columns={"Descripcion": "DESCRIPCION"})
-        else:
-            df_desc["DESCRIPCION"] = ""
-
-    if "ZONA_TURISTICA" in df_desc.columns:
-        df_desc["DESCRIPCION"] = df_desc["DESCRIPCION"].fillna("").astype(str).str.strip()
-        df_desc = df_desc.drop_duplicates(subset=["ZONA_TURISTICA"], keep="first")
-
-    return df_zt, df_desc, _salt
-
-df_zt_all, df_desc_all, _salt_desc = cargar_descripciones_y_datazt()
-
-def get_desc_dict(df_desc: pd.DataFrame) -> dict:
-    if "ZONA_TURISTICA" not in df_desc.columns or "DESCRIPCION" not in df_desc.columns:
-        return {}
-    keys = df_desc["ZONA_TURISTICA"].astype(str).str.strip()
-    vals = df_desc["DESCRIPCION"].fillna("").astype(str).str.strip()
-    return dict(zip(keys, vals))
-
-DESC_MAP = get_desc_dict(df_desc_all)
-
-def _pick_col(df: pd.DataFrame, candidates: list[str]):
-    for c in candidates:
-        if c in df.columns:
-            return c
-    return None
-
-def get_loc_info(zona: str):
-    """Intenta devolver (Comunidad, Provincia) desde Data ZT si existen."""
-    ca_col = _pick_col(df_zt_all, ["CCAA", "Comunidad Autónoma", "COMUNIDAD_AUTONOMA", "Comunidad_Autonoma"])
-    pr_col = _pick_col(df_zt_all, ["Provincia", "PROVINCIA"])
-    ca = pr = "—"
-    if "ZONA_TURISTICA" in df_zt_all.columns:
-        sub = df_zt_all.loc[df_zt_all["ZONA_TURISTICA"].astype(str).str.strip() == str(zona).strip()]
-        if len(sub):
-            if ca_col: 
-                val = sub.iloc[0][ca_col]
-                ca = str(val) if pd.notna(val) else "—"
-            if pr_col: 
-                val = sub.iloc[0][pr_col]
-                pr = str(val) if pd.notna(val) else "—"
-    return ca, pr
-
-
-# =========================
-# CARGA GLOBAL DE OPINIONES Y FORECASTS 
-# =========================
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_opiniones_zt():
-    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
-    try:
-        df_op = pd.read_excel(total_excel, sheet_name="OpinionesZT")
-    except Exception as e: 
-        return {}, f"No se pudo leer la hoja 'Opiniones ZT': {e}"
-    df_op = _normalize_zone_colnames(df_op)
-    if "Opiniones" not in df_op.columns:
-        for alt_col in ["OPINIONES", "Opinion", "OPINION", "Reseñas", "Resenas"]:
-            if alt_col in df_op.columns:
-                df_op = df_op.rename(columns={alt_col: "Opiniones"})
-                break
-    if "ZONA_TURISTICA" not in df_op.columns or "Opiniones" not in df_op.columns:
-        return {}, "Faltan columnas en 'Opiniones ZT' (se requieren ZONA_TURISTICA y Opiniones)."
-    df_op["ZONA_TURISTICA"] = df_op["ZONA_TURISTICA"].astype(str).str.strip()
-    df_op["Opiniones"] = df_op["Opiniones"].fillna("").astype(str).str.strip()
-    df_op = df_op[df_op["Opiniones"] != ""]
-    op_map = {str(z): sub["Opiniones"].tolist() for z, sub in df_op.groupby("ZONA_TURISTICA")}
-    return op_map, None
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def cargar_forecasts():
-    fpath = BASE / "Forecasts_2025_2026_2027.xlsx"
-    try:
-        df_f = pd.read_excel(fpath)
-    except Exception as e:
-        return None, f"No se pudo leer el Excel de forecasts: {e}"
-    for c in ["AÑO", "MES"]:
-        if c in df_f.columns:
-            df_f[c] = pd.to_numeric(df_f[c], errors="coerce").astype("Int64")
-    return df_f, None
-
-OPINIONES_MAP, _err_ops_global = cargar_opiniones_zt()
-df_fore_global, _err_fore_global = cargar_forecasts()
-
-
-# =========================
-# RECOMENDADOR k-NN (Destino alternativo)
-# =========================
-@st.cache_resource(show_spinner=False)
-def entrenar_pipeline(df_zt: pd.DataFrame):
-    features = [
-        # Categóricas
-        "Tipo_Ubicación",
-        "Clima_Köppen",
-        "Estacionalidad_Climática",
-        "Nivel_Infraestructura_Turística",
-        "Aeropuerto_mas_cercano",
-        "Tipo_Turismo_Principal",
-        "Actividad principal 1",
-        "Actividad principal 2",
-        "Tipo_entorno_protegido",
-        "Patrimonio_cultural",
-        "Oferta_complementaria",
-
-        # Numéricas continuas
-        "Altitud_Media_msnm",
-        "Distancia_al_mar_km",
-        "Indice_conectividad",
-        "Distancia_aeropuerto_km",
-        "Distancia_estacion_tren_km",
-        "Porcentaje_area_protegida",
-
-        # Binarias 0/1
-        "Actividad_Naturaleza",
-        "Actividad_Historico",
-        "Actividad_Entretenimiento",
-        "Actividad_Montanismo",
-        "Actividad_Deportes_Acuaticos",
-        "Actividad_Gastronomia",
-        "Actividad_Cultural",
-        "Actividad_Ocio",
-        "Actividad_Senderismo",
-        "Actividad_Turismo_rural",
-        "Actividad_Astronomia",
-        "Actividad_Deportes_de_Invierno",
-        "Actividad_Observacion_de_Fauna",
-        "Actividad_Playa",
-        "Actividad_Cicloturismo",
-        "Actividad_Wellness_Termalismo",
-        "Actividad_Compras",
-        "Actividad_Enoturismo",
-        "Actividad_Negocios_MICE",
-        "Actividad_Religioso",
-        "Actividad_Aventura",
-        "Actividad_Turismo_Nautico",
-    ]
-    feats = [f for f in features if f in df_zt.columns]
-    df_knn = df_zt[feats].copy()
-
-    categorical_cols = df_knn.select_dtypes(include='object').columns.tolist()
-    numerical_cols = [c for c in df_knn.columns if c not in categorical_cols]
-
-    preprocessor = ColumnTransformer(transformers=[
-        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_cols),
-        ('num', StandardScaler(), numerical_cols)
-    ])
-
-    knn_pipeline = Pipeline(steps=[
-        ('preprocessor', preprocessor),
-        ('knn', NearestNeighbors(n_neighbors=10, metric='cosine'))
-    ])
-    knn_pipeline.fit(df_knn)
-    return knn_pipeline, df_knn, feats
-
 # =========================
 # ENCABEZADO (logos + texto)
 # =========================
@@ -442,35 +186,11 @@ with col_text:
 
 st.markdown("<br>", unsafe_allow_html=True)
 
-# =========================
-# IMAGENES HERO
-# =========================
-imagenes = [
-    {"url":"https://images.unsplash.com/photo-1605654464243-3668a4c0de3d?q=80&w=1700&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Alhambra, Granada"},
-    {"url":"https://images.unsplash.com/photo-1655405927893-96a5b68490c1?q=80&w=1548&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Benidorm, Alicante"},
-    {"url":"https://images.unsplash.com/photo-1536075597888-91fe9f9cacd7?q=80&w=1740&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Mirador del Cap de la Barra, Costa Brava"},
-    {"url":"https://images.unsplash.com/photo-1677939217436-01d7c0b8738e?q=80&w=1740&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Torre del Oro, Sevilla"},
-    {"url":"https://cdn.pixabay.com/photo/2020/05/08/22/51/national-park-5147616_1280.jpg","ciudad":"Aigüestortes, Lleida"},
-    {"url":"https://images.unsplash.com/photo-1665157809094-02fc338305f5?q=80&w=2064&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Alt Pirineu, Lleida"},
-    {"url":"https://multimedia.comunitatvalenciana.com/B5B34B4AEFC64B248A719A3B64306FD9/img/E991F48A7CEC482AA06F299319096C07/costa_de_azahar.jpg?responsive","ciudad":"Costa Azahar, Comunitat Valenciana"},
-    {"url":"https://cdn.pixabay.com/photo/2022/11/18/16/53/spain-7600551_1280.jpg","ciudad":"Los Alcornocales, Cádiz"},
-    {"url":"https://mediaim.expedia.com/destination/1/f8e3b5569445fd06122bf4f0bbee0806.jpg","ciudad":"Cadí-Moixeró, Barcelona"},
-    {"url":"https://www.barcelo.com/guia-turismo/wp-content/uploads/ok-costa-vizcaina.jpg","ciudad":"Costa Bizkaia, País Vasco"},
-    {"url":"https://www.andaluciasimple.com/wp-content/uploads/2020/11/AdobeStock_132882206-scaled.jpeg","ciudad":"Costa del Sol (Málaga), Andalucía"}
-]
-
 # =========================
 # SESSION STATE
 # =========================
-if "imagen_idx" not in st.session_state:
-    st.session_state.imagen_idx = 0
 if "seccion" not in st.session_state:
     st.session_state.seccion = "Inicio"
-if "last_refresh_count" not in st.session_state:
-    st.session_state.last_refresh_count = -1
-
-def avanzar(): st.session_state.imagen_idx = (st.session_state.imagen_idx + 1) % len(imagenes)
-def retroceder(): st.session_state.imagen_idx = (st.session_state.imagen_idx - 1) % len(imagenes)
 
 # =========================
 # MENU SUPERIOR (mantenido)
@@ -496,30 +216,15 @@ with col3:
         st.session_state.seccion = "Encuentra tu destino"
 
 opcion = st.session_state.seccion
+# búsqueda del recomendador resuelta en esta ejecución (para la métrica de latencia)
+consulta_metrica = None
 
 # =========================
 # SECCIONES
 # =========================
 if opcion == "Inicio":
-    refresh_count = st_autorefresh(interval=4000, key="auto_refresh_hero")
-    if refresh_count != st.session_state.last_refresh_count:
-        avanzar()
-        st.session_state.last_refresh_count = refresh_count
-
-    imagen_actual = imagenes[st.session_state.imagen_idx]
-    st.markdown(f"""
-        <div class="img-wrapper">
-            <img src="{imagen_actual['url']}" alt="{html.escape(imagen_actual['ciudad'])}">
-            <div class="city-label">{imagen_actual['ciudad']}</div>
-        </div>
-    """, unsafe_allow_html=True)
-
-    # Controles hero
-    col1b, col2b, col3b = st.columns([1, 30, 1])
-    with col1b:
-        st.button("◀", key="hero_prev", use_container_width=True, on_click=retroceder, help="Imagen anterior")
-    with col3b:
-        st.button("▶", key="hero_next", use_container_width=True, on_click=avanzar, help="Imagen siguiente")
+    # El carrusel es un fragmento: su auto-avance solo re-ejecuta el bloque de la imagen
+    carrusel_hero()
 
     # Estilos profesionales
     st.markdown("""
@@ -627,6 +332,13 @@ elif opcion == "Seleccionar destino alternativo":
     st.subheader("🔍 Recomendador de destinos turísticos alternativos")
     st.info("Elige mes y año; verás similitud y el % de ocupación desglosado (Hotel, Rural, Aptos, Camping).")
 
+    df_zt_all = cargar_descripciones_y_datazt()[0]
+    DESC_MAP = mapa_descripciones()
+    _err_ops_global = cargar_opiniones_zt()[1]
+    # con paquete vigente la ocupación prevista (y en esta sección los vecinos) se leen de disco
+    paq = paquete_vigente()
+    df_fore_global, _err_fore_global = cargar_forecasts() if paq is None else (None, None)
+
     if _err_ops_global:
         st.warning(_err_ops_global)
 
@@ -634,7 +346,8 @@ elif opcion == "Seleccionar destino alternativo":
     if "ZONA_TURISTICA" not in df_zt.columns:
         st.error("⚠️ Falta la columna 'ZONA_TURISTICA' en los datos de zonas.")
     else:
-        knn_pipeline, df_knn, features = entrenar_pipeline(df_zt)
+        if paq is None:
+            knn_pipeline, df_knn, features = entrenar_pipeline(df_zt)
         zona_nombres = df_zt['ZONA_TURISTICA'].astype(str).tolist()
 
         df_fore, err_fore = df_fore_global, _err_fore_global
@@ -658,6 +371,22 @@ elif opcion == "Seleccionar destino alternativo":
         with c4:
             k_recom = st.slider("N.º recomendaciones", min_value=3, max_value=12, value=6, step=1)
 
+        peso_texto = st.slider(
+            "Peso de descripciones y opiniones en la similitud",
+            min_value=0.0, max_value=1.0, value=PESO_TEXTO, step=0.05,
+            help="0 = solo atributos de la zona; 1 = solo parecido de las descripciones y opiniones de viajeros."
+        )
+        penalizar_saturacion = st.toggle(
+            "Penalizar destinos saturados",
+            help=f"Resta {PESO_SATURACION_RANKING:g} puntos de similitud por cada punto del índice de saturación "
+                 "del destino en el mes elegido (el índice ya incluye su ocupación prevista)."
+        )
+        ordenar_p90 = st.toggle(
+            "Desempatar por escenario de ocupación alto (P90)",
+            help="Entre destinos con la misma puntuación, desempata por el extremo alto del intervalo de predicción "
+                 "en lugar de por la ocupación prevista: baja los destinos cuya previsión es más incierta."
+        )
+
         buscar = st.button("🔎 Buscar", use_container_width=True)
         if not buscar:
             st.markdown(f"""
@@ -670,176 +399,38 @@ elif opcion == "Seleccionar destino alternativo":
 
         st.markdown("<br>", unsafe_allow_html=True)
 
-        def render_zone_result_cards(rows: list[dict], subtitle: str = "", per_row: int = 1):
-            if not rows:
-                return
-
-            colA, colB, colC = st.columns([9, 13, 3])
-            with colA:
-                st.markdown(f"#### {subtitle}")
-
-            with colC:
-                logo_path = LOGOS_DIR / "TripAdvisor_Logo.svg"
-                if logo_path.exists():
-                    st.markdown(
-                        "<div style='text-align:left;font-size:0.85rem;color:#6b7280;'>Powered by</div>",
-                        unsafe_allow_html=True
-                    )
-                    st.image(str(logo_path), width=120)
-
-            css_block = """
-            <style>
-            .desc-card{
-              background:#fff;border:1px solid #d9e2ea;border-radius:16px;
-              padding:14px 16px;box-shadow:0 4px 14px rgba(0,0,0,0.06);
-              font-family:Satoshi,system-ui;overflow:visible;margin-bottom:10px;
-            }
-            .sel{border:2px solid #306388;}
-            .header-row{display:flex;justify-content:space-between;align-items:flex-start;gap:8px;margin-bottom:6px;}
-            .title-block{display:flex;flex-direction:column;min-width:0;}
-            .badges{display:flex;gap:8px;flex-wrap:wrap;margin:0;}
-            .badge{background:#e6eaed;color:#224762;border-radius:999px;padding:2px 10px;font-size:.75rem;font-weight:600;}
-            .card-title{font-weight:800;color:#224762;margin:0 0 2px 0;font-size:1.05rem;}
-            .meta{color:#4a5a67;font-size:.92rem;margin:0;}
-            .kpis-head{font-weight:700;color:#224762;font-size:.88rem;margin:4px 0 6px 0;}
-            .kpis{display:flex;gap:8px;flex-wrap:wrap;margin:0 0 8px 0;}
-            .kpi{background:#f5f7f9;border:1px solid #e5eef5;border-radius:10px;padding:6px 10px;font-size:.86rem;color:#224762;}
-            .kpi2{background:#e9eff3;border:1px solid #e5eef5;border-radius:3px;padding:6px 10px;font-size:.86rem;color:#224762;}
-            .desc-body{color:#3a4b59;margin:0;line-height:1.35;font-size:0.95rem;}
-            .reviews-wrap { margin-top:8px; }
-            .reviews-wrap details { background:#f7f9fb; border:1px solid #e5eef5; border-radius:10px; padding:8px 10px; }
-            .reviews-wrap summary { cursor:pointer; color:#224762; font-weight:700; }
-            .reviews-scroll{ max-height:500px; overflow:auto; margin-top:8px; padding-right:6px; }
-            .reviews-list { margin:0 0 0 16px; color:#3a4b59; font-size:0.92rem; }
-            .reviews-list li { margin-bottom:6px; }
-            </style>
-            """
-
-            sel_rows = [r for r in rows if r.get("seleccionada")]
-            other_rows = [r for r in rows if not r.get("seleccionada")]
-            ordered = sel_rows + other_rows
-
-            def _is_num(x):
-                try:
-                    return (x is not None) and (not (isinstance(x, float) and np.isnan(x)))
-                except Exception:
-                    return False
-
-            def kpi_html(r: dict) -> str:
-                oc = r.get("ocups")
-                if not isinstance(oc, dict) or not len(oc):
-                    return ""
-                parts = []
-                for tipo in [t for t in ["Hotel", "Turismo rural", "Apartamentos", "Camping"] if t in oc]:
-                    if _is_num(oc.get(tipo)):
-                        parts.append(f"<div class='kpi'>{OCC_LABELS[tipo]}: <b>{format_pct(oc[tipo])}</b></div>")
-                return "".join(parts)
-
-            def reviews_html(r: dict) -> str:
-                opiniones = r.get("opiniones") or []
-                if not opiniones:
-                    return ""
-                try:
-                    n = min(5, len(opiniones))
-                    idx = np.random.choice(len(opiniones), size=n, replace=False)
-                    sample = [str(opiniones[i]) for i in idx]
-                except Exception:
-                    sample = [str(op) for op in opiniones[:5]]
-
-                items = "\n".join([f"<li>{html.escape(s)}</li>" for s in sample])
-                return f"""
-                    <div class='reviews-wrap'>
-                        <details>
-                            <summary>🌟 Opiniones de viajeros</summary>
-                            <div class='reviews-scroll'>
-                                <ul class='reviews-list'>
-                                    {items}
-                                </ul>
-                            </div>
-                        </details>
-                    </div>
-                """
-
-            def card_html(r: dict) -> str:
-                css_sel = " sel" if r.get("seleccionada") else ""
-                zona = r.get("zona", "—")
-                ca = r.get("comunidad", "—")
-                pr = r.get("provincia", "—")
-                si = r.get("similitud") or "No hay datos"
-                desc = r.get("desc", "Sin descripción disponible.")
-
-                oc = r.get("ocups") if isinstance(r.get("ocups"), dict) else {}
-                has_occ = any(_is_num(v) for v in oc.values())
-
-                occ_chips = kpi_html(r)
-                if has_occ and occ_chips:
-                    occ_block = f"""
-                        <div class='kpis-head'>Índices de saturación disponibles</div>
-                        <div class='kpis'>
-                            {occ_chips}
-                            <div class='kpi2' title='Porcentaje de similitud de perfil'>Similitud: <b>{si}</b></div>
-                        </div>
-                    """
-                else:
-                    occ_block = f"""
-                        <div class='kpis-head'>Índices de saturación disponibles</div>
-                        <div class='kpis'>
-                            <div class='kpi'>No hay datos disponibles de ocupación</div>
-                            <div class='kpi2' title='Porcentaje de similitud de perfil'>Similitud: <b>{si}</b></div>
-                        </div>
-                    """
-
-                opiniones_block = reviews_html(r)
-
-                return f"""
-                    <div class='desc-card{css_sel}'>
-                        <div class='header-row'>
-                            <div class='title-block'>
-                                <div class='card-title'>{zona}</div>
-                                <div class='meta'>{ca} · {pr}</div>
-                            </div>
-                            <div class='badges'>
-                                <span class='badge'>Zona turística</span>
-                                {("<span class='badge'>Seleccionada</span>" if r.get("seleccionada") else "")}
-                            </div>
-                        </div>
-                        {occ_block}
-                        <p class='desc-body'>{desc}</p>
-                        {opiniones_block}
-                    </div>
-                """
-
-            cards_html = "\n".join([card_html(r) for r in ordered])
-            full_html = css_block + f"<div>{cards_html}</div>"
-
-            base_per_card = 220
-            extra_if_reviews = 150
-            cnt_reviews = sum(1 for r in ordered if r.get("opiniones"))
-            est_height = base_per_card * len(ordered) + extra_if_reviews * cnt_reviews
-            est_height = max(200, min(est_height+150, 2000))
-            html_component(full_html, height=est_height, scrolling=True)
-
         if buscar:
-            if df_fore is None:
+            consulta_metrica = "destino_alternativo"
+            if df_fore is None and paq is None:
                 st.error("No hay forecasts disponibles; no se puede generar el ranking.")
+            elif zona_objetivo not in zona_nombres:
+                st.error("No se encontró la zona seleccionada en los datos.")
             else:
-                try:
+                # búsquedas idénticas de cualquier sesión se sirven de la caché de consultas
+                clave = ("destino_alternativo", zona_objetivo, año_sel, mes_sel, k_recom, round(peso_texto, 2),
+                         penalizar_saturacion, ordenar_p90)
+                version = version_consultas(paq)
+                rows = CONSULTAS.obtener(clave, version)
+                if rows is None:
                     indice_zona = zona_nombres.index(zona_objetivo)
-                except ValueError:
-                    st.error("No se encontró la zona seleccionada en los datos.")
-                else:
-                    n_total = len(df_knn)
+                    n_total = len(zona_nombres)
                     n_vecinos = min(k_recom + 1, max(1, n_total))
 
-                    zona_vector = df_knn.iloc[[indice_zona]]
-                    Xq = knn_pipeline.named_steps['preprocessor'].transform(zona_vector)
-                    distancias, indices = knn_pipeline.named_steps['knn'].kneighbors(Xq, n_neighbors=n_vecinos)
-
-                    similares = []
-                    for j, i in enumerate(indices[0]):
-                        nombre = zona_nombres[i]
-                        dist = float(distancias[0][j])
-                        similares.append({"Zona": nombre, "Distancia": dist})
+                    if peso_texto > 0:
+                        # perfiles precalculados (paquete o caché por generación): solo productos escalares
+                        perfiles = (paq.perfiles if paq is not None else None) or perfiles_zona()
+                        vecinos = perfiles.vecinos(zona_objetivo, n_vecinos, peso_texto)
+                    else:
+                        vecinos = paq.vecinos(zona_objetivo, n_vecinos) if paq is not None else None
+                    if vecinos is None:
+                        if paq is not None:
+                            knn_pipeline, df_knn, features = entrenar_pipeline(df_zt)
+                        zona_vector = df_knn.iloc[[indice_zona]]
+                        Xq = knn_pipeline.named_steps['preprocessor'].transform(zona_vector)
+                        distancias, indices = knn_pipeline.named_steps['knn'].kneighbors(Xq, n_neighbors=n_vecinos)
+                        vecinos = [(zona_nombres[i], float(distancias[0][j])) for j, i in enumerate(indices[0])]
+
+                    similares = [{"Zona": nombre, "Distancia": dist} for nombre, dist in vecinos]
 
                     # dedup y p95
                     seen, filtrados = set(), []
@@ -861,43 +452,106 @@ elif opcion == "Seleccionar destino alternativo":
 
                     # ocupación desglosada
                     zonas_list = df_sim["Zona"].astype(str).tolist()
-                    occ_break = attach_occupancy_breakdown(df_fore, zonas_list, año_sel, mes_sel)
+                    occ_break = ocupacion_desglosada(paq, df_fore, zonas_list, año_sel, mes_sel)
+                    occ_itv = intervalos_desglosados(paq, df_fore, zonas_list, año_sel, mes_sel)
 
-                    # ocupación media (para ordenar)
+                    # ocupación media (desempate): prevista o, con ordenar_p90, el extremo alto del intervalo
                     def occ_media(z):
-                        vals = [v for v in occ_break.get(z, {}).values() if v is not None]
+                        if ordenar_p90:
+                            vals = [itv[1] if itv is not None else occ_break.get(z, {}).get(tipo)
+                                    for tipo, itv in occ_itv.get(z, {}).items()]
+                        else:
+                            vals = occ_break.get(z, {}).values()
+                        vals = [v for v in vals if v is not None]
                         return float(np.mean(vals)) if vals else np.nan
 
                     df_sim["OCC_MEDIA"] = df_sim["Zona"].apply(occ_media)
+                    resumen_op = resumen_por_zona()
+                    df_sim["TONO"] = df_sim["Zona"].map(lambda z: resumen_op.get(z, {}).get("TONO", np.nan))
+                    saturacion = indice_saturacion().por_zonas(zonas_list, año_sel, mes_sel)
+                    df_sim["SATURACION"] = df_sim["Zona"].map(saturacion).astype(float)
 
-                    # ordenar: mayor similitud, menor ocupación media
-                    df_final = df_sim.sort_values(
-                        by=["Similitud_num", "OCC_MEDIA"],
-                        ascending=[False, True],
-                        na_position="last"
-                    ).reset_index(drop=True)
+                    # ordenar por similitud (premiada por el tono de las opiniones y, si se pide, penalizada
+                    # por la saturación del destino) y, a igualdad, por menor ocupación media
+                    df_final = puntuar_alternativas(df_sim, zona_objetivo, penalizar_saturacion)
 
                     rows = []
                     for _, r in df_final.iterrows():
                         z = str(r["Zona"])
-                        ca, pr = get_loc_info(z)
                         rows.append({
                             "zona": z,
-                            "comunidad": ca,
-                            "provincia": pr,
                             "ocups": occ_break.get(z, {}),
+                            "intervalos": occ_itv.get(z, {}),
+                            "saturacion": saturacion.get(z),
                             "similitud": f"{abs(r['Similitud_num']):.1f}%",
-                            "desc": DESC_MAP.get(z, "Sin descripción disponible."),
                             "seleccionada": (z == zona_objetivo),
-                            "opiniones": OPINIONES_MAP.get(z, [])
                         })
-
-                    render_zone_result_cards(rows, subtitle=f"Ranking – {mes_nombre} {año_sel}")
+                    CONSULTAS.guardar(clave, version, rows)
+
+                criterios = (["saturación penalizada"] if penalizar_saturacion else []) \
+                    + (["desempate por P90"] if ordenar_p90 else [])
+                render_zone_result_cards(rows, subtitle=f"Ranking – {mes_nombre} {año_sel}"
+                                                        + (f" ({', '.join(criterios)})" if criterios else ""))
+
+        st.divider()
+        with st.expander(f"⚖️ Plan de redistribución de todas las zonas saturadas – {mes_nombre} {año_sel}"):
+            st.caption("Reparte el exceso de viajeros de cada zona por encima del umbral de saturación entre sus "
+                       "zonas más parecidas con margen hasta la ocupación objetivo, minimizando la distancia "
+                       "entre perfiles (usa el peso de descripciones y opiniones elegido arriba).")
+            r1, r2, r3 = st.columns([2, 2, 1])
+            with r1:
+                umbral_plan = st.slider("Umbral de saturación", min_value=30, max_value=80,
+                                        value=int(UMBRAL_SATURACION), step=1,
+                                        help="Zonas con un índice de saturación (0-100) mayor se consideran saturadas.")
+            with r2:
+                ocupacion_plan = st.slider("Ocupación objetivo de los destinos (%)", min_value=40, max_value=95,
+                                           value=int(OCUPACION_OBJETIVO), step=5,
+                                           help="Cada destino recibe viajeros hasta alcanzar esta ocupación.")
+            with r3:
+                calcular_plan = st.toggle("Calcular plan", key="k_plan")
+
+            if calcular_plan:
+                perfiles = (paq.perfiles if paq is not None else None) or perfiles_zona()
+                plan = planificar(indice_saturacion(), perfiles, año_sel, mes_sel,
+                                  umbral=umbral_plan, ocupacion_objetivo=ocupacion_plan, peso_texto=peso_texto)
+                res_plan = plan.resumen()
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Zonas saturadas", res_plan["zonas_saturadas"])
+                m2.metric("Exceso de viajeros", f"{res_plan['exceso']:,.0f}".replace(",", "."))
+                m3.metric("Reubicado", f"{res_plan['pct_reubicado']:.0f}%",
+                          help=f"{res_plan['destinos']} zonas de destino")
+                m4.metric("Similitud media", "N/D" if res_plan["similitud_media"] is None
+                          else f"{res_plan['similitud_media']:.1f}%")
+                if plan.estado != "Óptimo":
+                    st.info(plan.estado)
+                st.caption(f"Resuelto en {plan.segundos * 1000:.0f} ms.")
+
+                if len(plan.flujos):
+                    tabla = plan.flujos.rename(columns={
+                        "ORIGEN": "Origen", "DESTINO": "Destino", "VIAJEROS": "Viajeros", "SIMILITUD": "Similitud (%)",
+                        "SATURACION_ORIGEN": "Saturación origen", "SATURACION_DESTINO": "Saturación destino",
+                        "OCUPACION_DESTINO": "Ocupación destino (%)", "OCUPACION_DESTINO_TRAS": "Ocupación tras plan (%)",
+                    })
+                    st.dataframe(tabla.round(1), hide_index=True, use_container_width=True)
+                    sin_destino = plan.origenes[plan.origenes["SIN_DESTINO"] >= 1]
+                    if len(sin_destino):
+                        st.warning(f"{len(sin_destino)} zonas no pueden reubicar todo su exceso por falta de margen "
+                                   "en sus zonas parecidas.")
+                    st.download_button(
+                        "⬇️ Descargar plan (ZIP)",
+                        data=lambda: exportar_plan(plan),
+                        file_name=f"plan_redistribucion_{año_sel}_{mes_sel:02d}.zip",
+                        mime="application/zip"
+                    )
 
 elif opcion == "Ver mapas de saturación":
     st.subheader("Mapa de saturación turística por zona")
     st.info("Visualiza la concentración de turistas en cada zona. Filtra por zona y desplázate con el ratón para obtener una vista detallada.")
 
+    pdk = importar("pydeck")
+    snap = cargar_datos()
+    df = snap.df
+
     # === Filtros temporales y tipo de turismo ===
     st.markdown("### 🎚️ Filtros temporales y tipo de turismo")
     col_f1, col_f2, col_f3 = st.columns([1.2, 1.2, 2])
@@ -927,24 +581,27 @@ elif opcion == "Ver mapas de saturación":
     }
     columnas_seleccionadas = [columnas_tipo[t] for t in tipo_seleccionado] if tipo_seleccionado else []
 
-    df_filtrado = df.copy()
-    if año_seleccionado != "Todos los años":
-        df_filtrado = df_filtrado[df_filtrado["AÑO"] == int(año_seleccionado)]
+    mes_num = None
     if mes_seleccionado != "Todos los meses":
         mes_num = [k for k, v in MESES_ES.items() if v == mes_seleccionado][0]
-        df_filtrado = df_filtrado[df_filtrado["MES"] == mes_num]
-
-    if columnas_seleccionadas:
-        df_filtrado = _coerce_numeric(df_filtrado, columnas_seleccionadas)
-        df_filtrado["viajeros"] = df_filtrado[columnas_seleccionadas].sum(axis=1).astype(float)
-    else:
-        df_filtrado["viajeros"] = 0.0
-
-    df_grouped = df_filtrado.groupby(["ZONA_TURISTICA", "lat", "long", "AÑO", "MES"], as_index=False)["viajeros"].sum()
-    df_grouped = df_grouped[df_grouped["viajeros"] > 0]
+    df_grouped = agregado_mapa(
+        snap,
+        int(año_seleccionado) if año_seleccionado != "Todos los años" else None,
+        mes_num,
+        columnas_seleccionadas,
+    )
     df_grouped["viajeros_fmt"] = df_grouped["viajeros"].apply(lambda x: f"{x:,.0f}".replace(",", "."))
     df_grouped["anio_fmt"] = df_grouped["AÑO"].astype(str)
     df_grouped["mes_fmt"] = df_grouped["MES"].apply(lambda m: MESES_ES.get(m, str(m)))
+    # resumen de opiniones precalculado por zona: solo un map por zona en cada rerun
+    resumen_op = resumen_por_zona()
+    tono_fmt = {z: f"{r['N_OPINIONES']} opiniones · {r['PCT_POSITIVAS']:.0f}% positivas"
+                for z, r in resumen_op.items() if r["N_OPINIONES"]}
+    df_grouped["opiniones_fmt"] = df_grouped["ZONA_TURISTICA"].map(tono_fmt).fillna("Sin opiniones")
+    # índice de saturación precalculado por zona y mes: una lectura indexada por fila
+    df_grouped["saturacion"] = indice_saturacion().buscar(
+        df_grouped["ZONA_TURISTICA"], df_grouped["AÑO"], df_grouped["MES"])
+    df_grouped["saturacion_fmt"] = df_grouped["saturacion"].apply(lambda x: "N/D" if pd.isna(x) else f"{x:.0f}/100")
 
     zonas = sorted(df_grouped["ZONA_TURISTICA"].unique()) if len(df_grouped) else []
     zona_sel = st.selectbox("Zona turística", ["Todas"] + zonas, index=0)
@@ -952,8 +609,13 @@ elif opcion == "Ver mapas de saturación":
     view_state = pdk.ViewState(latitude=36, longitude=-3.5, zoom=3.9, pitch=40)
 
     color_defecto = hex_to_rgba(COLORS["indigo_dye"], alpha=0.75)
+    color_saturada = hex_to_rgba("#dc2626", alpha=0.85)
     color_seleccion = hex_to_rgba("#f59e0b", alpha=0.95)
 
+    # color de cada columna: de índigo (poco saturada) a rojo (muy saturada)
+    f_sat = np.clip((df_grouped["saturacion"].fillna(0).to_numpy() - 20.0) / 50.0, 0, 1)[:, None]
+    colores_sat = np.rint(np.array(color_defecto) * (1 - f_sat) + np.array(color_saturada) * f_sat).astype(int).tolist()
+
     if zona_sel != "Todas" and len(df_grouped):
         fila = df_grouped[df_grouped["ZONA_TURISTICA"] == zona_sel].iloc[0]
         view_state = pdk.ViewState(
@@ -963,12 +625,11 @@ elif opcion == "Ver mapas de saturación":
             pitch=40
         )
         df_grouped = df_grouped.assign(
-            fill_color=df_grouped["ZONA_TURISTICA"].apply(
-                lambda z: color_seleccion if z == zona_sel else color_defecto
-            )
+            fill_color=[color_seleccion if z == zona_sel else c
+                        for z, c in zip(df_grouped["ZONA_TURISTICA"], colores_sat)]
         )
     else:
-        df_grouped = df_grouped.assign(fill_color=[color_defecto] * len(df_grouped))
+        df_grouped = df_grouped.assign(fill_color=colores_sat)
 
     max_v = float(df_grouped["viajeros"].max()) if len(df_grouped) else 1.0
     max_v = max(1.0, max_v)
@@ -979,106 +640,103 @@ elif opcion == "Ver mapas de saturación":
     tooltip_text = COLORS["indigo_dye"]
     tooltip_border = "#a3bfd2"
 
-    st.pydeck_chart(pdk.Deck(
-        map_style=None,
-        initial_view_state=view_state,
-        layers=[
-            pdk.Layer(
-                "ColumnLayer",
-                data=df_grouped,
-                get_position='[long, lat]',
-                get_elevation='viajeros',
-                elevation_scale=elevation_scale,
-                radius=10000,
-                extruded=True,
-                get_fill_color='fill_color',
-                get_line_color=line_rgba,
-                pickable=True,
-                auto_highlight=True,
-            )
-        ],
-        tooltip={
-            "html": f"""
-                <div style="
-                    font-family: Inter, system-ui, -apple-system, Segoe UI, Roboto, sans-serif;
-                    font-size: 12.5px;
-                    line-height: 1.35;
-                    min-width: 220px;
-                ">
-                    <div style="font-weight: 600; font-size: 14px; color:{tooltip_text}; margin-bottom: 6px;">
-                        {{ZONA_TURISTICA}}
-                    </div>
-                    <div style="margin-bottom: 8px;">
-                        <span style="
-                            display: inline-block;
-                            padding: 2px 8px;
-                            border-radius: 999px;
-                            background: rgba(0,0,0,0.04);
-                            border: 1px solid {tooltip_border};
-                            color: {tooltip_text};
-                            font-size: 12px;
-                            font-weight: 500;
-                        ">
-                            {{mes_fmt}} {{anio_fmt}}
-                        </span>
-                    </div>
+    with medir("Mapa: render pydeck", filas=len(df_grouped)):
+        st.pydeck_chart(pdk.Deck(
+            map_style=None,
+            initial_view_state=view_state,
+            layers=[
+                pdk.Layer(
+                    "ColumnLayer",
+                    data=df_grouped,
+                    get_position='[long, lat]',
+                    get_elevation='viajeros',
+                    elevation_scale=elevation_scale,
+                    radius=10000,
+                    extruded=True,
+                    get_fill_color='fill_color',
+                    get_line_color=line_rgba,
+                    pickable=True,
+                    auto_highlight=True,
+                )
+            ],
+            tooltip={
+                "html": f"""
                     <div style="
-                        display: grid;
-                        grid-template-columns: 1fr auto;
-                        gap: 8px;
-                        align-items: center;
+                        font-family: Inter, system-ui, -apple-system, Segoe UI, Roboto, sans-serif;
+                        font-size: 12.5px;
+                        line-height: 1.35;
+                        min-width: 220px;
                     ">
-                        <div style="opacity: 0.75; color:{tooltip_text};">
-                            Viajeros
+                        <div style="font-weight: 600; font-size: 14px; color:{tooltip_text}; margin-bottom: 6px;">
+                            {{ZONA_TURISTICA}}
+                        </div>
+                        <div style="margin-bottom: 8px;">
+                            <span style="
+                                display: inline-block;
+                                padding: 2px 8px;
+                                border-radius: 999px;
+                                background: rgba(0,0,0,0.04);
+                                border: 1px solid {tooltip_border};
+                                color: {tooltip_text};
+                                font-size: 12px;
+                                font-weight: 500;
+                            ">
+                                {{mes_fmt}} {{anio_fmt}}
+                            </span>
                         </div>
                         <div style="
-                            font-weight: 700;
-                            color:{tooltip_text};
-                            font-size: 14px;
-                            letter-spacing: 0.2px;
-                            font-variant-numeric: tabular-nums;
+                            display: grid;
+                            grid-template-columns: 1fr auto;
+                            gap: 8px;
+                            align-items: center;
                         ">
-                            {{viajeros_fmt}}
+                            <div style="opacity: 0.75; color:{tooltip_text};">
+                                Viajeros
+                            </div>
+                            <div style="
+                                font-weight: 700;
+                                color:{tooltip_text};
+                                font-size: 14px;
+                                letter-spacing: 0.2px;
+                                font-variant-numeric: tabular-nums;
+                            ">
+                                {{viajeros_fmt}}
+                            </div>
+                        </div>
+                        <div style="margin-top: 6px; opacity: 0.75; color:{tooltip_text};">
+                            🔥 Saturación {{saturacion_fmt}}
+                        </div>
+                        <div style="margin-top: 2px; opacity: 0.75; color:{tooltip_text};">
+                            💬 {{opiniones_fmt}}
                         </div>
                     </div>
-                </div>
-            """,
-            "style": {
-                "backgroundColor": tooltip_bg,
-                "color": tooltip_text,
-                "border": f"1px solid {tooltip_border}",
-                "borderRadius": "10px",
-                "padding": "12px",
-                "boxShadow": "0 4px 16px rgba(0,0,0,.08)"
+                """,
+                "style": {
+                    "backgroundColor": tooltip_bg,
+                    "color": tooltip_text,
+                    "border": f"1px solid {tooltip_border}",
+                    "borderRadius": "10px",
+                    "padding": "12px",
+                    "boxShadow": "0 4px 16px rgba(0,0,0,.08)"
+                }
             }
-        }
-    ))
+        ))
 
 elif opcion == "Encuentra tu destino":
     st.subheader("🧭 Encuentra tu destino")
     st.info("Filtra por características y descubre que destino se ajusta más a tus preferencias.")
 
+    df_zt_all = cargar_descripciones_y_datazt()[0]
+    _err_ops_global = cargar_opiniones_zt()[1]
+    # con paquete vigente la ocupación prevista (y en esta sección los vecinos) se leen de disco
+    paq = paquete_vigente()
+    df_fore_global, _err_fore_global = cargar_forecasts() if paq is None else (None, None)
+
     if _err_ops_global:
         st.warning(_err_ops_global)
 
-    df_zt = df_zt_all.copy()
-    # features coherentes con el modelo
-    features = [
-        "Tipo_Ubicación","Clima_Köppen","Estacionalidad_Climática","Nivel_Infraestructura_Turística",
-        "Aeropuerto_mas_cercano","Tipo_Turismo_Principal","Actividad principal 1","Actividad principal 2",
-        "Tipo_entorno_protegido","Patrimonio_cultural","Oferta_complementaria",
-        "Altitud_Media_msnm","Distancia_al_mar_km","Indice_conectividad","Distancia_aeropuerto_km",
-        "Distancia_estacion_tren_km","Porcentaje_area_protegida",
-        "Actividad_Naturaleza","Actividad_Historico","Actividad_Entretenimiento","Actividad_Montanismo",
-        "Actividad_Deportes_Acuaticos","Actividad_Gastronomia","Actividad_Cultural","Actividad_Ocio",
-        "Actividad_Senderismo","Actividad_Turismo_rural","Actividad_Astronomia","Actividad_Deportes_de_Invierno",
-        "Actividad_Observacion_de_Fauna","Actividad_Playa","Actividad_Cicloturismo","Actividad_Wellness_Termalismo",
-        "Actividad_Compras","Actividad_Enoturismo","Actividad_Negocios_MICE","Actividad_Religioso","Actividad_Aventura",
-        "Actividad_Turismo_Nautico",
-    ]
-    for col in features:
-        if col in df_zt.columns and df_zt[col].dtype == object:
-            df_zt[col] = df_zt[col].astype(str)
+    # categóricas del modelo como texto, coherentes con los filtros
+    df_zt = preparar_datazt_filtros(df_zt_all)
     nombre_col = 'ZONA_TURISTICA' if 'ZONA_TURISTICA' in df_zt.columns else df_zt.columns[0]
 
     def safe_options(df, col):
@@ -1121,6 +779,13 @@ elif opcion == "Encuentra tu destino":
         alt_min, alt_max, step = alt_info
         st.session_state.setdefault("k_alt_sel", (alt_min, alt_max))
 
+    texto_libre = st.text_input(
+        "Búsqueda libre",
+        key="k_texto",
+        placeholder="p. ej. playas tranquilas con senderismo",
+        help="Busca en las descripciones de las zonas y en las opiniones de viajeros."
+    )
+
     colA, colB, colC = st.columns([1, 1, 1], gap="large")
 
     with colA:
@@ -1197,6 +862,8 @@ elif opcion == "Encuentra tu destino":
     def chip(name, vals):
         if vals:
             chips.append(f"**{name}:** {', '.join(map(str, vals))}")
+    if texto_libre.strip():
+        chips.append(f"**Texto:** “{texto_libre.strip()}”")
     chip("Tipo de ubicación", st.session_state["k_tipo_ubic"])
     chip("Clima",             st.session_state["k_clima"])
     chip("Turismo",           st.session_state["k_tipo_tur"])
@@ -1227,267 +894,122 @@ elif opcion == "Encuentra tu destino":
     fallback_similares = True
 
     if st.button("🔎 Buscar destinos", use_container_width=True):
-        df_fil = df_zt.copy()
-
-        def filtrar_in(df_fil, col, valores):
-            if valores and col in df_fil.columns:
-                return df_fil[df_fil[col].isin(valores)]
-            return df_fil
-
-        df_fil = filtrar_in(df_fil, "Tipo_Ubicación", tipo_ubic)
-        df_fil = filtrar_in(df_fil, "Clima_Köppen", clima)
-        df_fil = filtrar_in(df_fil, "Tipo_Turismo_Principal", tipo_tur)
-        df_fil = filtrar_in(df_fil, "Estacionalidad_Climática", estac)
-        df_fil = filtrar_in(df_fil, "Nivel_Infraestructura_Turística", infra)
-        df_fil = filtrar_in(df_fil, "Actividad principal 1", act1)
-        df_fil = filtrar_in(df_fil, "Actividad principal 2", act2)
-
-        if alt_sel and 'Altitud_Media_msnm' in df_fil.columns:
-            df_fil = df_fil[pd.to_numeric(df_fil['Altitud_Media_msnm'], errors='coerce').between(alt_sel[0], alt_sel[1])]
-
-        def build_query_from_filters():
-            q = {}
-            def pick_cat(col, seleccion):
-                if seleccion:
-                    return str(seleccion[0])
-                if col in df_zt.columns and df_zt[col].notna().any():
-                    return str(df_zt[col].mode(dropna=True).iloc[0])
-                return ""
-            def pick_num(col, default=0.0):
-                if col in df_zt.columns:
-                    series = pd.to_numeric(df_zt[col], errors="coerce")
-                    if series.notna().any():
-                        return float(series.median())
-                return float(default)
-
-            q['Tipo_Ubicación'] = pick_cat('Tipo_Ubicación', tipo_ubic)
-            q['Clima_Köppen'] = pick_cat('Clima_Köppen', clima)
-            q['Tipo_Turismo_Principal'] = pick_cat('Tipo_Turismo_Principal', tipo_tur)
-            q['Estacionalidad_Climática'] = pick_cat('Estacionalidad_Climática', estac)
-            q['Nivel_Infraestructura_Turística'] = pick_cat('Nivel_Infraestructura_Turística', infra)
-            q['Actividad principal 1'] = pick_cat('Actividad principal 1', act1)
-            q['Actividad principal 2'] = pick_cat('Actividad principal 2', act2)
-            q['Aeropuerto_mas_cercano'] = pick_cat('Aeropuerto_mas_cercano', [])
-            q['Tipo_entorno_protegido'] = pick_cat('Tipo_entorno_protegido', [])
-            q['Patrimonio_cultural'] = pick_cat('Patrimonio_cultural', [])
-            q['Oferta_complementaria'] = pick_cat('Oferta_complementaria', [])
-
-            num_cols = ["Altitud_Media_msnm","Distancia_al_mar_km","Indice_conectividad",
-                        "Distancia_aeropuerto_km","Distancia_estacion_tren_km","Porcentaje_area_protegida"]
-            q['Altitud_Media_msnm'] = float(np.mean(alt_sel)) if alt_sel and 'Altitud_Media_msnm' in df_zt.columns else pick_num('Altitud_Media_msnm')
-            for nc in num_cols[1:]:
-                q[nc] = pick_num(nc)
-
-            for ac in [c for c in features if c.startswith("Actividad_")]:
-                q[ac] = 0
-            return pd.DataFrame([q])
-
-        knn_pipeline, df_knn, _ = entrenar_pipeline(df_zt)
-        q_df = build_query_from_filters()
-
-        def render_zone_result_cards(rows: list[dict], subtitle: str = "", per_row: int = 1):
-            if not rows:
-                return
-
-            colA, colB, colC = st.columns([9, 13, 3])
-            with colA:
-                st.markdown(f"#### {subtitle}")
-
-            with colC:
-                logo_path = LOGOS_DIR / "TripAdvisor_Logo.svg"
-                if logo_path.exists():
-                    st.markdown(
-                        "<div style='text-align:left;font-size:0.85rem;color:#6b7280;'>Powered by</div>",
-                        unsafe_allow_html=True
-                    )
-                    st.image(str(logo_path), width=120)
-
-            css_block = """
-            <style>
-            .desc-card{
-              background:#fff;border:1px solid #d9e2ea;border-radius:16px;
-              padding:14px 16px;box-shadow:0 4px 14px rgba(0,0,0,0.06);
-              font-family:Satoshi,system-ui;overflow:visible;margin-bottom:10px;
-            }
-            .sel{border:2px solid #306388;}
-            .header-row{display:flex;justify-content:space-between;align-items:flex-start;gap:8px;margin-bottom:6px;}
-            .title-block{display:flex;flex-direction:column;min-width:0;}
-            .badges{display:flex;gap:8px;flex-wrap:wrap;margin:0;}
-            .badge{background:#e6eaed;color:#224762;border-radius:999px;padding:2px 10px;font-size:.75rem;font-weight:600;}
-            .card-title{font-weight:800;color:#224762;margin:0 0 2px 0;font-size:1.05rem;}
-            .meta{color:#4a5a67;font-size:.92rem;margin:0;}
-            .kpis-head{font-weight:700;color:#224762;font-size:.88rem;margin:4px 0 6px 0;}
-            .kpis{display:flex;gap:8px;flex-wrap:wrap;margin:0 0 8px 0;}
-            .kpi{background:#f5f7f9;border:1px solid #e5eef5;border-radius:10px;padding:6px 10px;font-size:.86rem;color:#224762;}
-            .kpi2{background:#e9eff3;border:1px solid #e5eef5;border-radius:3px;padding:6px 10px;font-size:.86rem;color:#224762;}
-            .desc-body{color:#3a4b59;margin:0;line-height:1.35;font-size:0.95rem;}
-            .reviews-wrap { margin-top:8px; }
-            .reviews-wrap details { background:#f7f9fb; border:1px solid #e5eef5; border-radius:10px; padding:8px 10px; }
-            .reviews-wrap summary { cursor:pointer; color:#224762; font-weight:700; }
-            .reviews-scroll{ max-height:500px; overflow:auto; margin-top:8px; padding-right:6px; }
-            .reviews-list { margin:0 0 0 16px; color:#3a4b59; font-size:0.92rem; }
-            .reviews-list li { margin-bottom:6px; }
-            </style>
-            """
-
-            sel_rows = [r for r in rows if r.get("seleccionada")]
-            other_rows = [r for r in rows if not r.get("seleccionada")]
-            ordered = sel_rows + other_rows
-
-            def _is_num(x):
-                try:
-                    return (x is not None) and (not (isinstance(x, float) and np.isnan(x)))
-                except Exception:
-                    return False
-
-            def kpi_html(r: dict) -> str:
-                oc = r.get("ocups")
-                if not isinstance(oc, dict) or not len(oc):
-                    return ""
-                parts = []
-                for tipo in [t for t in ["Hotel", "Turismo rural", "Apartamentos", "Camping"] if t in oc]:
-                    if _is_num(oc.get(tipo)):
-                        parts.append(f"<div class='kpi'>{OCC_LABELS[tipo]}: <b>{format_pct(oc[tipo])}</b></div>")
-                return "".join(parts)
-
-            def reviews_html(r: dict) -> str:
-                opiniones = r.get("opiniones") or []
-                if not opiniones:
+        consulta_metrica = "encuentra_tu_destino"
+        # búsquedas idénticas de cualquier sesión se sirven de la caché de consultas
+        clave = ("encuentra_tu_destino", tipo_ubic, clima, tipo_tur, estac, infra, act1, act2,
+                 tuple(alt_sel) if alt_sel else None, año_sel, mes_sel, k_sugerencias, plegar(texto_libre).strip())
+        version = version_consultas(paq)
+        resultado = CONSULTAS.obtener(clave, version)
+        if resultado is None:
+            df_fil = df_zt.copy()
+
+            def filtrar_in(df_fil, col, valores):
+                if valores and col in df_fil.columns:
+                    return df_fil[df_fil[col].isin(valores)]
+                return df_fil
+
+            df_fil = filtrar_in(df_fil, "Tipo_Ubicación", tipo_ubic)
+            df_fil = filtrar_in(df_fil, "Clima_Köppen", clima)
+            df_fil = filtrar_in(df_fil, "Tipo_Turismo_Principal", tipo_tur)
+            df_fil = filtrar_in(df_fil, "Estacionalidad_Climática", estac)
+            df_fil = filtrar_in(df_fil, "Nivel_Infraestructura_Turística", infra)
+            df_fil = filtrar_in(df_fil, "Actividad principal 1", act1)
+            df_fil = filtrar_in(df_fil, "Actividad principal 2", act2)
+
+            if alt_sel and 'Altitud_Media_msnm' in df_fil.columns:
+                df_fil = df_fil[pd.to_numeric(df_fil['Altitud_Media_msnm'], errors='coerce').between(alt_sel[0], alt_sel[1])]
+
+            # el texto libre acota los candidatos (todas las coincidencias: los resultados se paginan)
+            # y su relevancia, relativa a la mejor coincidencia, entra en el orden
+            relevancia = {}
+            if texto_libre.strip():
+                coincidencias = indice_texto().buscar(texto_libre, n=None)
+                if coincidencias:
+                    mejor = coincidencias[0][1]
+                    relevancia = {z: p / mejor for z, p in coincidencias}
+                df_fil = df_fil[df_fil[nombre_col].astype(str).isin(relevancia)]
+            hay_filtros = any([tipo_ubic, clima, tipo_tur, estac, infra, act1, act2]) or bool(
+                alt_info and tuple(alt_sel) != (alt_min, alt_max))
+
+            def build_query_from_filters():
+                q = {}
+                def pick_cat(col, seleccion):
+                    if seleccion:
+                        return str(seleccion[0])
+                    if col in df_zt.columns and df_zt[col].notna().any():
+                        return str(df_zt[col].mode(dropna=True).iloc[0])
                     return ""
-                try:
-                    n = min(5, len(opiniones))
-                    idx = np.random.choice(len(opiniones), size=n, replace=False)
-                    sample = [str(opiniones[i]) for i in idx]
-                except Exception:
-                    sample = [str(op) for op in opiniones[:5]]
-
-                items = "\n".join([f"<li>{html.escape(s)}</li>" for s in sample])
-                return f"""
-                    <div class='reviews-wrap'>
-                        <details>
-                            <summary>🌟 Opiniones de viajeros</summary>
-                            <div class='reviews-scroll'>
-                                <ul class='reviews-list'>
-                                    {items}
-                                </ul>
-                            </div>
-                        </details>
-                    </div>
-                """
-
-            def card_html(r: dict) -> str:
-                css_sel = " sel" if r.get("seleccionada") else ""
-                zona = r.get("zona", "—")
-                ca = r.get("comunidad", "—")
-                pr = r.get("provincia", "—")
-                si = r.get("similitud") or "No hay datos"
-                desc = r.get("desc", "Sin descripción disponible.")
-
-                oc = r.get("ocups") if isinstance(r.get("ocups"), dict) else {}
-                has_occ = any(_is_num(v) for v in oc.values())
-
-                occ_chips = kpi_html(r)
-                if has_occ and occ_chips:
-                    occ_block = f"""
-                        <div class='kpis-head'>Índices de saturación disponibles</div>
-                        <div class='kpis'>
-                            {occ_chips}
-                            <div class='kpi2' title='Porcentaje de similitud de perfil'>Similitud: <b>{si}</b></div>
-                        </div>
-                    """
-                else:
-                    occ_block = f"""
-                        <div class='kpis-head'>Índices de saturación disponibles</div>
-                        <div class='kpis'>
-                            <div class='kpi'>No hay datos disponibles de ocupación</div>
-                            <div class='kpi2' title='Porcentaje de similitud de perfil'>Similitud: <b>{si}</b></div>
-                        </div>
-                    """
-
-                opiniones_block = reviews_html(r)
-
-                return f"""
-                    <div class='desc-card{css_sel}'>
-                        <div class='header-row'>
-                            <div class='title-block'>
-                                <div class='card-title'>{zona}</div>
-                                <div class='meta'>{ca} · {pr}</div>
-                            </div>
-                            <div class='badges'>
-                                <span class='badge'>Zona turística</span>
-                                {("<span class='badge'>Seleccionada</span>" if r.get("seleccionada") else "")}
-                            </div>
-                        </div>
-                        {occ_block}
-                        <p class='desc-body'>{desc}</p>
-                        {opiniones_block}
-                    </div>
-                """
-
-            cards_html = "\n".join([card_html(r) for r in rows])
-            full_html = css_block + f"<div>{cards_html}</div>"
-
-            base_per_card = 220
-            extra_if_reviews = 150
-            cnt_reviews = sum(1 for r in rows if r.get("opiniones"))
-            est_height = base_per_card * len(rows) + extra_if_reviews * cnt_reviews
-            est_height = max(200, min(est_height+150, 2000))
-            html_component(full_html, height=est_height, scrolling=True)
+                def pick_num(col, default=0.0):
+                    if col in df_zt.columns:
+                        series = pd.to_numeric(df_zt[col], errors="coerce")
+                        if series.notna().any():
+                            return float(series.median())
+                    return float(default)
+
+                q['Tipo_Ubicación'] = pick_cat('Tipo_Ubicación', tipo_ubic)
+                q['Clima_Köppen'] = pick_cat('Clima_Köppen', clima)
+                q['Tipo_Turismo_Principal'] = pick_cat('Tipo_Turismo_Principal', tipo_tur)
+                q['Estacionalidad_Climática'] = pick_cat('Estacionalidad_Climática', estac)
+                q['Nivel_Infraestructura_Turística'] = pick_cat('Nivel_Infraestructura_Turística', infra)
+                q['Actividad principal 1'] = pick_cat('Actividad principal 1', act1)
+                q['Actividad principal 2'] = pick_cat('Actividad principal 2', act2)
+                q['Aeropuerto_mas_cercano'] = pick_cat('Aeropuerto_mas_cercano', [])
+                q['Tipo_entorno_protegido'] = pick_cat('Tipo_entorno_protegido', [])
+                q['Patrimonio_cultural'] = pick_cat('Patrimonio_cultural', [])
+                q['Oferta_complementaria'] = pick_cat('Oferta_complementaria', [])
+
+                num_cols = ["Altitud_Media_msnm","Distancia_al_mar_km","Indice_conectividad",
+                            "Distancia_aeropuerto_km","Distancia_estacion_tren_km","Porcentaje_area_protegida"]
+                q['Altitud_Media_msnm'] = float(np.mean(alt_sel)) if alt_sel and 'Altitud_Media_msnm' in df_zt.columns else pick_num('Altitud_Media_msnm')
+                for nc in num_cols[1:]:
+                    q[nc] = pick_num(nc)
+
+                for ac in [c for c in FEATURES_KNN if c.startswith("Actividad_")]:
+                    q[ac] = 0
+                return pd.DataFrame([q])
+
+            knn_pipeline, df_knn, _ = entrenar_pipeline(df_zt)
+            q_df = build_query_from_filters()
+
+            if len(df_fil) > 0:
+                dist_all, idx_all = knn_pipeline.named_steps['knn'].kneighbors(
+                    knn_pipeline.named_steps['preprocessor'].transform(q_df),
+                    n_neighbors=len(df_knn)
+                )
+                nombres_all = df_zt[nombre_col].astype(str).tolist()
+                dist_map = {nombres_all[i]: float(dist_all[0][j]) for j, i in enumerate(idx_all[0])}
 
-        if len(df_fil) > 0:
-            st.success(f"Se han encontrado {len(df_fil)} destinos que cumplen tus criterios.")
+                zonas_list = df_fil[nombre_col].astype(str).tolist()
 
-            dist_all, idx_all = entrenar_pipeline(df_zt)[0].named_steps['knn'].kneighbors(
-                entrenar_pipeline(df_zt)[0].named_steps['preprocessor'].transform(q_df),
-                n_neighbors=len(entrenar_pipeline(df_zt)[1])
-            )
-            nombres_all = df_zt[nombre_col].astype(str).tolist()
-            dist_map = {nombres_all[i]: float(dist_all[0][j]) for j, i in enumerate(idx_all[0])}
-
-            zonas_list = df_fil[nombre_col].astype(str).tolist()
-
-            dists_found = [dist_map.get(str(z), np.nan) for z in zonas_list]
-            dists_found = [d for d in dists_found if pd.notna(d)]
-            p95 = p95_normalized_similarity(dists_found)
-
-            occ_break = attach_occupancy_breakdown(df_fore, zonas_list, año_sel, mes_sel)
-
-            rows = []
-            for z in zonas_list:
-                ca, pr = get_loc_info(z)
-                dist = dist_map.get(z, None)
-                sim = (100.0 * (1.0 - dist / p95)) if (dist is not None) else None
-
-                vals = [v for v in occ_break.get(z, {}).values() if v is not None]
-                occ_med = float(np.mean(vals)) if vals else np.nan
-
-                rows.append({
-                    "zona": z,
-                    "comunidad": ca,
-                    "provincia": pr,
-                    "ocups": occ_break.get(z, {}),
-                    "similitud": f"{abs(sim):.1f}%" if sim is not None else "—",
-                    "desc": DESC_MAP.get(z, "Sin descripción disponible."),
-                    "seleccionada": False,
-                    "_occ_media": occ_med,
-                    "opiniones": OPINIONES_MAP.get(z, [])
-                })
-
-            rows_sorted = sorted(
-                rows,
-                key=lambda r: (-(float(r["similitud"][:-1]) if r["similitud"] != "—" else -0.0),
-                               (r["_occ_media"] if not np.isnan(r["_occ_media"]) else 9999.0))
-            )
-            for r in rows_sorted:
-                r.pop("_occ_media", None)
+                dists_found = [dist_map.get(str(z), np.nan) for z in zonas_list]
+                dists_found = [d for d in dists_found if pd.notna(d)]
+                p95 = p95_normalized_similarity(dists_found)
 
-            render_zone_result_cards(rows_sorted, subtitle=f"Resultados – {mes_nombre} {año_sel}")
+                # la ocupación solo se consulta para la página visible (ver resultados_paginados),
+                # así que el orden es por puntuación y, a igualdad, por nombre: estable entre páginas.
+                # Sin texto la puntuación es la similitud; con texto, la relevancia combinada con ella
+                # (sin filtros de atributos la consulta son modas y medianas, así que solo cuenta el texto)
+                peso_rel = (PESO_RELEVANCIA_TEXTO if hay_filtros else 1.0) if relevancia else 0.0
+                rows = []
+                for z in zonas_list:
+                    dist = dist_map.get(z, None)
+                    sim = (100.0 * (1.0 - dist / p95)) if (dist is not None) else None
+                    sim_txt = f"{abs(sim):.1f}%" if sim is not None else "—"
+                    sim_orden = float(sim_txt[:-1]) / 100 if sim is not None else 0.0
+                    rows.append({
+                        "zona": z,
+                        "similitud": sim_txt,
+                        "seleccionada": False,
+                        "_puntuacion": peso_rel * relevancia.get(z, 0.0) + (1.0 - peso_rel) * sim_orden,
+                    })
 
-        else:
-            if not fallback_similares:
-                st.warning("No se han encontrado destinos con esos criterios. Activa la casilla de sugerencias para ver alternativas similares.")
+                rows_sorted = sorted(rows, key=lambda r: (-r["_puntuacion"], r["zona"]))
+                for r in rows_sorted:
+                    r.pop("_puntuacion")
+                resultado = (len(df_fil), rows_sorted)
+            elif not fallback_similares:
+                resultado = (0, [])
             else:
-                st.info("No hubo coincidencias exactas. Mostrando destinos similares a tus preferencias.")
                 knn_pipeline, df_knn, _ = entrenar_pipeline(df_zt)
                 n_total = len(df_knn)
                 n_vecinos = min(k_sugerencias, max(1, n_total))
@@ -1497,7 +1019,8 @@ elif opcion == "Encuentra tu destino":
 
                 nombres = df_zt[nombre_col].astype(str).tolist()
                 zonas_list = [str(nombres[i]) for j, i in enumerate(idx[0])]
-                occ_break = attach_occupancy_breakdown(df_fore, zonas_list, año_sel, mes_sel)
+                occ_break = ocupacion_desglosada(paq, df_fore, zonas_list, año_sel, mes_sel)
+                occ_itv = intervalos_desglosados(paq, df_fore, zonas_list, año_sel, mes_sel)
 
                 dists = [float(dist[0][j]) for j, _ in enumerate(idx[0])]
                 p95 = p95_normalized_similarity(dists)
@@ -1505,20 +1028,16 @@ elif opcion == "Encuentra tu destino":
                 rows = []
                 for j, i in enumerate(idx[0]):
                     z = str(nombres[i])
-                    ca, pr = get_loc_info(z)
                     sim = (100 * (1 - float(dist[0][j]) / p95))
                     vals = [v for v in occ_break.get(z, {}).values() if v is not None]
                     occ_med = float(np.mean(vals)) if vals else np.nan
                     rows.append({
                         "zona": z,
-                        "comunidad": ca,
-                        "provincia": pr,
                         "ocups": occ_break.get(z, {}),
+                        "intervalos": occ_itv.get(z, {}),
                         "similitud": f"{abs(sim):.1f}%",
-                        "desc": DESC_MAP.get(z, "Sin descripción disponible."),
                         "seleccionada": False,
                         "_occ_media": occ_med,
-                        "opiniones": OPINIONES_MAP.get(z, [])
                     })
 
                 rows = sorted(
@@ -1529,13 +1048,36 @@ elif opcion == "Encuentra tu destino":
                 rows = rows[:k_sugerencias]
                 for r in rows:
                     r.pop("_occ_media", None)
-
-                render_zone_result_cards(rows, subtitle=f"Sugerencias – {mes_nombre} {año_sel}")
+                resultado = (0, rows)
+            CONSULTAS.guardar(clave, version, resultado)
+
+        n_encontrados, rows = resultado
+        if n_encontrados > 0:
+            st.success(f"Se han encontrado {n_encontrados} destinos que cumplen tus criterios.")
+
+            def con_ocupacion(filas: list[dict]) -> list[dict]:
+                zonas_pag = [r["zona"] for r in filas]
+                occ = ocupacion_desglosada(paq, df_fore, zonas_pag, año_sel, mes_sel)
+                itv = intervalos_desglosados(paq, df_fore, zonas_pag, año_sel, mes_sel)
+                return [{**r, "ocups": occ.get(r["zona"], {}), "intervalos": itv.get(r["zona"], {})} for r in filas]
+
+            st.session_state.pag_resultados = 0
+            resultados_paginados(rows, f"Resultados – {mes_nombre} {año_sel}", con_ocupacion)
+        elif not fallback_similares:
+            st.warning("No se han encontrado destinos con esos criterios. Activa la casilla de sugerencias para ver alternativas similares.")
+        else:
+            st.info("No hubo coincidencias exactas. Mostrando destinos similares a tus preferencias.")
+            render_zone_result_cards(rows, subtitle=f"Sugerencias – {mes_nombre} {año_sel}")
 
 elif opcion == "Consultar datos históricos":
     st.subheader("📈 Datos históricos del turismo")
     st.caption("Analiza la evolución temporal por zona turística, tipo de alojamiento y periodo.")
 
+    alt = importar("altair")
+    # una sola instantánea por ejecución: frames y acumulados de la misma versión
+    snap = cargar_datos()
+    df = snap.df
+
     columnas_tipo = {
         "Turismo Hotelero": "VIAJEROS_EOH",
         "Turismo Rural": "VIAJEROS_EOTR",
@@ -1565,7 +1107,7 @@ elif opcion == "Consultar datos históricos":
         tipo_sel = st.selectbox("Tipo de alojamiento", options=tipos_opciones, index=0)
         tipos_sel = tipos_all if tipo_sel == "Todos" else [tipo_sel]
 
-    c4, c5 = st.columns([2.5, 3])
+    c4, c5, c6 = st.columns([2.5, 3, 2.5])
     with c4:
         zonas_all = sorted(df["ZONA_TURISTICA"].dropna().unique().tolist())
         zonas_opciones = ["Todas"] + zonas_all
@@ -1573,6 +1115,14 @@ elif opcion == "Consultar datos históricos":
         zonas_sel = zonas_all if zona_sel == "Todas" else [zona_sel]
     with c5:
         nivel = st.radio("Agregación temporal", ["Mensual", "Trimestral", "Anual"], horizontal=True)
+    with c6:
+        ventana_sel = st.selectbox(
+            "Comparativa interanual",
+            options=list(VENTANAS_COMPARACION.keys()),
+            format_func=lambda k: VENTANAS_COMPARACION[k][0],
+            index=0,
+            help="Periodo que termina en el último mes con datos, comparado con el mismo periodo del año anterior."
+        )
 
     if not tipos_sel:
         st.warning("Selecciona al menos un tipo de alojamiento.")
@@ -1605,40 +1155,29 @@ elif opcion == "Consultar datos históricos":
 
     total_periodo = int(agg["VIAJEROS_SEL"].sum()) if len(agg) else 0
 
-    hoy = datetime.now(ZoneInfo("Europe/Madrid"))
-    mes_actual = hoy.month
-    yoy_txt = "N/D"
-    try:
-        base = df.copy()
-        if zonas_sel:
-            base = base[base["ZONA_TURISTICA"].isin(zonas_sel)]
-        if isinstance(año_rango, tuple):
-            base = base[base["AÑO"].between(año_rango[0], año_rango[1])]
-        base = _coerce_numeric(base, cols_metric)
-        base["VIAJEROS_SEL"] = base[cols_metric].sum(axis=1)
-        años_disp = sorted(base["AÑO"].dropna().unique())
-        if len(años_disp) >= 2:
-            ult_anio = int(años_disp[-1])
-            ant_anio = int(años_disp[-2])
-            max_mes_ult = int(base.loc[base["AÑO"] == ult_anio, "MES"].max())
-            corte_mes = min(max(mes_actual - 1, 1), max_mes_ult)
-            ytd_ult = int(base.loc[(base["AÑO"] == ult_anio) & (base["MES"].between(1, corte_mes)), "VIAJEROS_SEL"].sum())
-            ytd_ant = int(base.loc[(base["AÑO"] == ant_anio) & (base["MES"].between(1, corte_mes)), "VIAJEROS_SEL"].sum())
-            if ytd_ant > 0:
-                yoy = (ytd_ult / ytd_ant - 1) * 100
-                yoy_txt = f"{yoy:+.1f}%"
-    except Exception:
-        yoy_txt = "N/D"
+    comp = snap.motor.comparar(ventana_sel, zonas=zonas_sel, tipos=cols_metric, hasta_año=año_rango[1])
 
+    ranking = construir_ranking(
+        df_h, tuple((t, columnas_tipo[t]) for t in tipos_sel), snap.version,
+        (año_rango, tuple(meses_sel), zona_sel)
+    )
     top_zona_txt = "N/D"
-    if len(df_h):
-        top_zona = df_h.groupby("ZONA_TURISTICA", as_index=False)["VIAJEROS_SEL"].sum().sort_values("VIAJEROS_SEL", ascending=False).head(1)
-        if len(top_zona):
-            top_zona_txt = f"{top_zona.iloc[0]['ZONA_TURISTICA']} ({int(top_zona.iloc[0]['VIAJEROS_SEL']):,}".replace(",", ".") + ")"
+    top_zona = ranking.top(1)
+    if len(top_zona):
+        top_zona_txt = f"{top_zona.iloc[0]['ZONA_TURISTICA']} ({int(top_zona.iloc[0]['VIAJEROS_SEL']):,}".replace(",", ".") + ")"
+
+    sat_media = indice_saturacion().media(zonas_sel, año_rango, meses_sel)
 
-    k1, k2, k3 = st.columns([3, 3, 6])
+    k1, k2, k4, k3 = st.columns([3, 3, 2, 5])
     k1.metric("Viajeros", f"{total_periodo:,}".replace(",", "."))
-    k2.metric("Variación YoY (último año vs. anterior)", yoy_txt)
+    k2.metric(
+        f"Variación YoY – {comp.ventana}", comp.texto,
+        help=f"{comp.periodo_actual} frente a {comp.periodo_anterior}"
+    )
+    if comp.aviso:
+        k2.caption(f"⚠️ {comp.aviso}")
+    k4.metric("Saturación media", "N/D" if sat_media is None else f"{sat_media:.0f}/100",
+              help="Índice de saturación (0-100) medio de las zonas y meses filtrados")
     k3.metric("Zona top", top_zona_txt)
 
     st.divider()
@@ -1656,6 +1195,8 @@ elif opcion == "Consultar datos históricos":
         zonas_plot = agg["ZONA_TURISTICA"].dropna().unique().tolist()
         zonas_sel_plot = st.multiselect("Zonas a mostrar", zonas_plot, default=zonas_plot[:8])
         df_plot = agg[agg["ZONA_TURISTICA"].isin(zonas_sel_plot)].copy()
+        n_pts = presupuesto_puntos(len(zonas_sel_plot), ancho_px=ANCHO_GRAFICO_PX)
+        df_plot = submuestrear_series(df_plot, x_field, "VIAJEROS_SEL", "ZONA_TURISTICA", n_pts)
         if len(df_plot):
             line = alt.Chart(df_plot).mark_line().encode(
                 x=alt.X(x_field, title=x_title, sort=None),
@@ -1689,13 +1230,33 @@ elif opcion == "Consultar datos históricos":
 
     st.divider()
 
-    st.markdown("#### Top 10 zonas")
-    topN = df_h.groupby("ZONA_TURISTICA", as_index=False)["VIAJEROS_SEL"].sum().sort_values("VIAJEROS_SEL", ascending=False).head(10)
+    st.markdown("#### Ranking de zonas")
+    r1, r2, r3 = st.columns([1.2, 2.5, 2])
+    with r1:
+        n_top = st.number_input("N.º de zonas", min_value=1, max_value=max(1, len(ranking.zonas)), value=min(10, max(1, len(ranking.zonas))), step=1)
+    with r2:
+        criterio = st.selectbox(
+            "Criterio",
+            options=list(CRITERIOS_RANKING.keys()),
+            format_func=lambda k: CRITERIOS_RANKING[k][0],
+            help="Crecimiento: último año del periodo frente al anterior, en los mismos meses. "
+                 "Concentración: % de viajeros de la zona en sus tres meses de mayor afluencia."
+        )
+    with r3:
+        tipo_rank = st.selectbox("Tipo de alojamiento (ranking)", ["Todos los seleccionados"] + list(ranking.tipos.keys()))
+    tipo_rank = None if tipo_rank == "Todos los seleccionados" else tipo_rank
+    crit_label, crit_fmt = CRITERIOS_RANKING[criterio]
+
+    topN = ranking.top(int(n_top), criterio, tipo_rank)
     if len(topN):
         barchart = alt.Chart(topN).mark_bar().encode(
-            x=alt.X("VIAJEROS_SEL:Q", title="Viajeros"),
+            x=alt.X("PUNTUACION:Q", title=crit_label),
             y=alt.Y("ZONA_TURISTICA:N", sort="-x", title=None),
-            tooltip=[alt.Tooltip("VIAJEROS_SEL:Q", title="Viajeros", format=",.0f"), "ZONA_TURISTICA:N"]
+            tooltip=[
+                "ZONA_TURISTICA:N",
+                alt.Tooltip("PUNTUACION:Q", title=crit_label, format=crit_fmt),
+                alt.Tooltip("VIAJEROS_SEL:Q", title="Viajeros", format=",.0f"),
+            ]
         ).properties(height=28*len(topN) + 20)
         st.altair_chart(barchart, use_container_width=True)
 
@@ -1703,12 +1264,56 @@ elif opcion == "Consultar datos históricos":
         if show_tbl:
             tmp = topN.copy()
             tmp["Viajeros"] = tmp["VIAJEROS_SEL"].map(lambda x: f"{x:,.0f}".replace(",", "."))
-            st.dataframe(tmp[["ZONA_TURISTICA", "Viajeros"]].reset_index(drop=True), use_container_width=True)
-
-        csv = topN.to_csv(index=False).encode("utf-8")
-        st.download_button("⬇️ Descargar Top 10 (CSV)", data=csv, file_name="top10_zonas_periodo.csv", mime="text/csv")
+            tmp[crit_label] = tmp["PUNTUACION"].map(lambda x: format(x, crit_fmt).replace(",", "."))
+            cols_tbl = ["POSICION", "ZONA_TURISTICA", "Viajeros"] + ([crit_label] if criterio != "volumen" else [])
+            st.dataframe(tmp[cols_tbl].reset_index(drop=True), use_container_width=True)
+
+        st.download_button(
+            "⬇️ Descargar ranking completo (CSV)",
+            data=lambda: ranking.csv(criterio, tipo_rank),
+            file_name=f"ranking_zonas_{criterio}.csv",
+            mime="text/csv"
+        )
     else:
-        st.info("No hay datos para el Top 10 en el periodo seleccionado.")
+        st.info("No hay datos suficientes para el ranking con este criterio en el periodo seleccionado.")
+
+    st.divider()
+
+    with st.expander("⬇️ Exportar datos filtrados (histórico y previsiones)"):
+        st.caption("Exporta todas las filas zona-mes de la selección actual. El ZIP incluye un manifest.json "
+                   "con la versión de los datos y los filtros aplicados.")
+        e1, e2 = st.columns([1, 2])
+        with e1:
+            formatos = [f for f in FORMATOS_EXPORTACION if f != "parquet" or parquet_disponible()]
+            formato_exp = st.radio("Formato", formatos, format_func=FORMATOS_EXPORTACION.get, horizontal=True)
+        with e2:
+            incluir_fore = st.checkbox(
+                "Incluir previsiones de ocupación (2025–2027)",
+                value=FORECASTS_XLSX.exists(),
+                disabled=not FORECASTS_XLSX.exists(),
+                help="A las previsiones se les aplican los filtros de zona y mes, no el de años."
+            )
+        filtro_exp = FiltroExportacion(
+            años=año_rango,
+            meses=None if mes_sel == "Todos" else [int(m) for m in meses_sel],
+            zonas=None if zona_sel == "Todas" else list(zonas_sel),
+            cols_viajeros=cols_metric,
+            incluir_forecast=bool(incluir_fore),
+        )
+        # forecasts regenerados: su versión es la del histórico del que salen, no la del Excel
+        regenerados = forecasts_regenerados()
+        version_exp = version_datos([DATA_DIR / "DATA_TOTAL.xlsx"] + ([] if regenerados else [FORECASTS_XLSX]),
+                                    ["forecasts regenerados"] if regenerados else None)
+        st.download_button(
+            "⬇️ Descargar selección",
+            # los forecasts solo se cargan al pulsar, y solo si se piden
+            data=lambda: exportar_a_bytes(
+                df, cargar_forecasts()[0] if filtro_exp.incluir_forecast else None,
+                filtro_exp, formato_exp, version_exp
+            ),
+            file_name=f"redistour_{version_exp}_{formato_exp}.zip",
+            mime="application/zip"
+        )
 
 
 
@@ -1928,6 +1533,23 @@ elif opcion == "Acerca del proyecto":
 
     """)
 
+registrar_seccion(opcion, _t_script)
+cerrar_perfil(opcion, _t_script)
+if consulta_metrica:
+    observar("redistour_consulta_recomendacion_segundos", time.perf_counter() - _t_script, seccion=consulta_metrica)
+elif opcion == "Ver mapas de saturación":
+    observar("redistour_mapa_segundos", time.perf_counter() - _t_script)
+if PANEL_TIEMPOS:
+    with st.sidebar:
+        st.markdown("#### ⏱️ Esta ejecución")
+        st.dataframe(pd.DataFrame(eventos_perfil()), hide_index=True, use_container_width=True)
+        st.markdown("#### ⏱️ Acumulado del proceso")
+        st.dataframe(pd.DataFrame(informe_perfil()), hide_index=True, use_container_width=True)
+        st.markdown("#### ⏱️ Caché de consultas")
+        st.json(CONSULTAS.estadisticas())
+        st.markdown("#### ⏱️ Tiempos de arranque")
+        st.json(informe_tiempos())
+
 
 # =========================
 # FOOTER
@@ -0,0 +1,231 @@
+# Proyecto RedisTour
+# Prueba de carga sin navegador: N sesiones simuladas (AppTest de Streamlit, una por hilo)
+# ejecutan a la vez mezclas de acciones realistas contra un único proceso, como las sesiones
+# de un servidor real comparten cachés, GIL y memoria. Para cada nº de sesiones mide la
+# latencia de cada rerun (p50/p95/p99), la CPU y el RSS del proceso y el rendimiento
+# (reruns/s), y señala a partir de qué nivel de concurrencia deja de escalar.
+#
+# Uso: python benchmarks/carga.py [--sesiones 1 2 4 8 16] [--acciones 30] [--escala actual]
+#
+# AppTest no incluye la serialización ni el websocket del servidor: las latencias son las
+# del script y las cachés, que es donde está el coste de esta app.
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+BASE = Path(__file__).resolve().parent.parent
+APP = BASE / "Herramienta_TFM.py"
+RESULTADOS = BASE / "benchmarks" / "resultados"
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+SECCIONES = {
+    "Inicio": "Inicio",
+    "Destino alternativo": "Seleccionar destino alternativo",
+    "Mapa saturación": "Ver mapas de saturación",
+    "Datos históricos": "Consultar datos históricos",
+    "Acerca del proyecto": "Acerca del proyecto",
+    "Encuentra tu destino": "Encuentra tu destino",
+}
+# acción -> peso en la mezcla
+MEZCLA = {"seccion": 0.2, "buscar": 0.3, "mapa": 0.25, "historico": 0.25}
+# la concurrencia "se rompe" cuando el p95 supera este múltiplo del de una sesión...
+LIMITE_P95 = 3.0
+# ...o cuando añadir sesiones ya no sube el rendimiento por encima de esta fracción de lo ideal
+LIMITE_EFICIENCIA = 0.5
+
+
+def rss_mb() -> float:
+    """RSS actual del proceso (Linux); si no se puede leer, el pico de `resource`."""
+    try:
+        with open("/proc/self/status") as fh:
+            for linea in fh:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Sesion:
+    """Una sesión simulada: un AppTest propio y la sección en la que está."""
+
+    def __init__(self, semilla: int, timeout: float):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(str(APP), default_timeout=timeout)
+        self.rng = random.Random(semilla)
+        self.latencias: list[tuple[str, float]] = []
+        self.errores = 0
+
+    def _rerun(self, tipo: str, accion):
+        t0 = time.perf_counter()
+        accion()
+        self.latencias.append((tipo, (time.perf_counter() - t0) * 1000))
+        if len(self.at.exception):
+            self.errores += 1
+
+    def _widget(self, tipo: str, etiqueta: str):
+        return next((w for w in getattr(self.at, tipo) if w.label == etiqueta), None)
+
+    def ir_a(self, boton: str, tipo: str = "seccion"):
+        if self.at.session_state["seccion"] == SECCIONES[boton] and tipo != "seccion":
+            return
+        self._rerun(tipo, lambda: self._widget("button", boton).click().run())
+
+    def _cambiar(self, tipo: str, etiqueta: str):
+        w = self._widget("selectbox", etiqueta)
+        if w is None or not w.options:
+            return
+        self._rerun(tipo, lambda: w.select_index(self.rng.randrange(len(w.options))).run())
+
+    def paso(self):
+        accion = self.rng.choices(list(MEZCLA), weights=list(MEZCLA.values()))[0]
+        if accion == "seccion":
+            self.ir_a(self.rng.choice(list(SECCIONES)))
+        elif accion == "buscar":
+            self.ir_a("Destino alternativo", "buscar")
+            self._cambiar("buscar", "Destino actual")
+            boton = self._widget("button", "🔎 Buscar")
+            if boton is not None:
+                self._rerun("buscar", lambda: boton.click().run())
+        elif accion == "mapa":
+            self.ir_a("Mapa saturación", "mapa")
+            self._cambiar("mapa", self.rng.choice(["📅 Año", "🗓️ Mes"]))
+        else:
+            self.ir_a("Datos históricos", "historico")
+            etiqueta = self.rng.choice(["Zona turística", "Comparativa interanual", "Años"])
+            self._cambiar("historico", etiqueta)
+
+
+def calentar(timeout: float) -> float:
+    """Recorre todas las secciones una vez: cargas, imports y modelos quedan en caché."""
+    t0 = time.perf_counter()
+    s = Sesion(0, timeout)
+    s.at.run()
+    for boton in SECCIONES:
+        s.ir_a(boton)
+    s.ir_a("Destino alternativo", "buscar")
+    s._rerun("buscar", lambda: s._widget("button", "🔎 Buscar").click().run())
+    return time.perf_counter() - t0
+
+
+def nivel(n_sesiones: int, acciones: int, timeout: float, semilla: int) -> dict:
+    """Ejecuta `n_sesiones` sesiones concurrentes de `acciones` pasos cada una."""
+    sesiones = [Sesion(semilla + i, timeout) for i in range(n_sesiones)]
+    for s in sesiones:
+        s.at.run()  # primera ejecución de la sesión (estado inicial), fuera de la medida
+    barrera = threading.Barrier(n_sesiones + 1)
+
+    def trabajar(s: Sesion):
+        barrera.wait()
+        for _ in range(acciones):
+            s.paso()
+
+    hilos = [threading.Thread(target=trabajar, args=(s,), daemon=True) for s in sesiones]
+    for h in hilos:
+        h.start()
+    rss0 = rss_mb()
+    barrera.wait()
+    t0, cpu0 = time.perf_counter(), time.process_time()
+    pico = rss0
+    while any(h.is_alive() for h in hilos):
+        pico = max(pico, rss_mb())
+        time.sleep(0.05)
+    pared, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+
+    lat = [(t, ms) for s in sesiones for t, ms in s.latencias]
+    ms = np.array([m for _, m in lat])
+    pct = lambda a: {f"p{q}": round(float(np.percentile(a, q)), 1) for q in (50, 95, 99)} if len(a) else {}
+    return {
+        "sesiones": n_sesiones,
+        "reruns": len(ms),
+        "errores": sum(s.errores for s in sesiones),
+        "segundos": round(pared, 2),
+        "reruns_por_s": round(len(ms) / pared, 2) if pared else None,
+        "latencia_ms": pct(ms),
+        "latencia_ms_por_accion": {t: pct(np.array([m for tt, m in lat if tt == t])) for t in MEZCLA},
+        "cpu_s": round(cpu, 2),
+        # CPU del proceso sobre tiempo de pared: ~1 núcleo como máximo mientras el GIL serialice
+        "cpu_nucleos": round(cpu / pared, 2) if pared else None,
+        "cpu_ms_por_rerun": round(cpu * 1000 / len(ms), 1) if len(ms) else None,
+        "rss_inicio_mb": round(rss0, 1),
+        "rss_pico_mb": round(pico, 1),
+        "rss_mb_por_sesion": round((pico - rss0) / n_sesiones, 2),
+    }
+
+
+def ruptura(niveles: list[dict]) -> dict | None:
+    """Primer nivel cuyo p95 o eficiencia de rendimiento cruza los límites, respecto al primero."""
+    base = niveles[0]
+    p95_0, rps_0 = base["latencia_ms"].get("p95"), base["reruns_por_s"]
+    for r in niveles[1:]:
+        motivos = []
+        if p95_0 and r["latencia_ms"].get("p95", 0) > LIMITE_P95 * p95_0:
+            motivos.append(f"p95 {r['latencia_ms']['p95']:.0f} ms > {LIMITE_P95:g}× {p95_0:.0f} ms")
+        ideal = rps_0 * r["sesiones"] / base["sesiones"]
+        if rps_0 and r["reruns_por_s"] < LIMITE_EFICIENCIA * ideal:
+            motivos.append(f"{r['reruns_por_s']:.1f} reruns/s < {LIMITE_EFICIENCIA:.0%} de {ideal:.1f} ideales")
+        if motivos:
+            return {"sesiones": r["sesiones"], "motivos": motivos}
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Prueba de carga multi-sesión sin navegador")
+    ap.add_argument("--sesiones", nargs="+", type=int, default=[1, 2, 4, 8, 16])
+    ap.add_argument("--acciones", type=int, default=30, help="acciones por sesión en cada nivel")
+    ap.add_argument("--escala", help="genera datos sintéticos de esta escala (ver sintetico.py) en vez de usar los reales")
+    ap.add_argument("--timeout", type=float, default=600)
+    ap.add_argument("--semilla", type=int, default=1)
+    ap.add_argument("--salida", type=Path, help="fichero JSON (por defecto resultados/carga_<fecha>.json)")
+    args = ap.parse_args()
+
+    # la app lee la configuración del entorno al importarse: todo antes de la primera ejecución
+    os.environ.setdefault("REDISTOUR_PRECARGA", "0")
+    os.environ.setdefault("REDISTOUR_RECARGA", "0")
+    tmp = None
+    if args.escala:
+        from sintetico import ESCALAS, escribir
+        tmp = tempfile.TemporaryDirectory(prefix="redistour_carga_")
+        escribir(Path(tmp.name), ESCALAS[args.escala])
+        os.environ["REDISTOUR_DATA_DIR"] = tmp.name
+        os.environ["REDISTOUR_FORECASTS"] = str(Path(tmp.name) / "Forecasts.xlsx")
+
+    salida = {"fecha": datetime.now().isoformat(timespec="seconds"), "escala": args.escala or "datos reales",
+              "acciones_por_sesion": args.acciones, "mezcla": MEZCLA, "nucleos": os.cpu_count()}
+    salida["calentamiento_s"] = round(calentar(args.timeout), 2)
+    print(f"calentamiento: {salida['calentamiento_s']} s, RSS {rss_mb():.0f} MB", flush=True)
+    salida["niveles"] = []
+    for n in args.sesiones:
+        r = nivel(n, args.acciones, args.timeout, args.semilla * 1000 + n)
+        salida["niveles"].append(r)
+        lat = r["latencia_ms"]
+        print(f"{n:>3} sesiones: {r['reruns_por_s']:>6.2f} reruns/s  p50 {lat['p50']:>7.1f}  p95 {lat['p95']:>7.1f}  "
+              f"p99 {lat['p99']:>7.1f} ms  CPU {r['cpu_nucleos']:.2f} núcleos  RSS {r['rss_pico_mb']:.0f} MB  "
+              f"errores {r['errores']}", flush=True)
+    salida["ruptura"] = ruptura(salida["niveles"])
+    if salida["ruptura"]:
+        print(f"deja de escalar con {salida['ruptura']['sesiones']} sesiones: {'; '.join(salida['ruptura']['motivos'])}")
+    else:
+        print("escala en todos los niveles probados")
+
+    ruta = args.salida or RESULTADOS / f"carga_{datetime.now():%Y%m%d_%H%M%S}.json"
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(salida, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Resultados en {ruta}")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
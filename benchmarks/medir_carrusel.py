@@ -0,0 +1,54 @@
+# Proyecto RedisTour
+# Mide la CPU por sesión que consume el auto-avance del carrusel de "Inicio":
+# rerun completo del script (comportamiento con st_autorefresh) frente a rerun del fragmento.
+#
+# Uso: python benchmarks/medir_carrusel.py [--repeticiones 20]
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+BASE = Path(__file__).resolve().parent.parent
+APP = BASE / "Herramienta_TFM.py"
+
+
+def _solo_carrusel(base: str):
+    import sys
+    sys.path.insert(0, base)
+    from portada import carrusel_hero
+    carrusel_hero()
+
+
+def _cpu_por_rerun(at: AppTest, repeticiones: int) -> float:
+    at.run()  # primera ejecución: cachés y módulos ya calientes en las siguientes
+    t0 = time.process_time()
+    for _ in range(repeticiones):
+        at.run()
+    return (time.process_time() - t0) / repeticiones
+
+
+def main():
+    ap = argparse.ArgumentParser(description="CPU del carrusel: rerun completo frente a fragmento")
+    ap.add_argument("--repeticiones", type=int, default=20)
+    ap.add_argument("--intervalo", type=float, default=4.0, help="segundos entre avances del carrusel")
+    args = ap.parse_args()
+
+    completo = _cpu_por_rerun(AppTest.from_file(str(APP), default_timeout=300), args.repeticiones)
+    fragmento = _cpu_por_rerun(
+        AppTest.from_function(_solo_carrusel, args=(str(BASE),), default_timeout=60), args.repeticiones
+    )
+    ticks_hora = 3600 / args.intervalo
+    res = {
+        "cpu_rerun_completo_ms": round(completo * 1000, 2),
+        "cpu_rerun_fragmento_ms": round(fragmento * 1000, 2),
+        "cpu_ahorrada_por_sesion_s_hora": round((completo - fragmento) * ticks_hora, 2),
+        "reduccion_pct": round(100 * (1 - fragmento / completo), 1) if completo > 0 else None,
+    }
+    print(json.dumps(res, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# Proyecto RedisTour
+# Generador de datos sintéticos con el esquema de DATA_TOTAL.xlsx (las cinco hojas) y del
+# Excel de forecasts, a escala configurable, para benchmarks y pruebas de carga.
+#
+# Uso: python benchmarks/sintetico.py DESTINO [--zonas 92] [--desde 2015] [--hasta 2024]
+#                                            [--opiniones 30] [--semilla 0]
+#
+# DESTINO recibe DATA_TOTAL.xlsx y Forecasts.xlsx; la app los usa con
+# REDISTOUR_DATA_DIR=DESTINO REDISTOUR_FORECASTS=DESTINO/Forecasts.xlsx
+
+import argparse
+import sys
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TIPOS = ["EOH", "EOTR", "EOAP", "EOAC"]
+COLS_OCUPA_TOTAL = ["GRADO_OCUPA_PLAZAS_EOH", "GRADO_OCUPA_PLAZAS_EOTR",
+                    "GRADO_OCUPA_PLAZAS_EOAP", "GRADO_OCUPA_PARCELAS_EOAC"]
+# columnas del Excel de forecasts (las cuatro de COLS_OCUPA_TOTAL más las variantes que trae el fichero real)
+COLS_OCUPA_FORECAST = [
+    "GRADO_OCUPA_PLAZAS_EOTR", "GRADO_OCUPA_PLAZAS_FIN_SEMANA_EOTR", "GRADO_OCUPA_HABITACIONES_EOTR",
+    "GRADO_OCUPA_PLAZAS_EOH", "GRADO_OCUPA_PLAZAS_FIN_SEMANA_EOH", "GRADO_OCUPA_POR_HABITACIONES_EOH",
+    "GRADO_OCUPA_PLAZAS_EOAP", "GRADO_OCUPA_APART_EOAP", "GRADO_OCUPA_APART_FIN_SEMANA_EOAP",
+    "GRADO_OCUPA_PARCELAS_EOAC", "GRADO_OCUPA_PARCELAS_FIN_SEMANA_EOAC",
+]
+AÑOS_FORECAST = [2025, 2026, 2027]
+
+CATEGORIAS = {
+    "Tipo_Ubicación": ["Costa", "Interior", "Montaña", "Isla"],
+    "Clima_Köppen": ["Csa", "Csb", "Cfb", "BSk", "BWh"],
+    "Estacionalidad_Climática": ["Alta", "Media", "Baja"],
+    "Nivel_Infraestructura_Turística": ["Bajo", "Medio", "Alto"],
+    "Aeropuerto_mas_cercano": ["MAD", "BCN", "AGP", "PMI", "BIO", "SVQ", "VLC"],
+    "Tipo_Turismo_Principal": ["Sol y playa", "Cultural", "Naturaleza", "Rural", "Urbano"],
+    "Actividad principal 1": ["Playa", "Senderismo", "Gastronomía", "Cultura", "Esquí"],
+    "Actividad principal 2": ["Cultura", "Ocio", "Vino", "Naturaleza", "Compras"],
+    "Tipo_entorno_protegido": ["Parque nacional", "Parque natural", "Ninguno"],
+    "Patrimonio_cultural": ["Sí", "No"],
+    "Oferta_complementaria": ["Alta", "Media", "Baja"],
+}
+NUMERICAS = {
+    "Altitud_Media_msnm": (0, 1800), "Distancia_al_mar_km": (0, 400), "Indice_conectividad": (0, 10),
+    "Distancia_aeropuerto_km": (5, 250), "Distancia_estacion_tren_km": (0, 120),
+    "Porcentaje_area_protegida": (0, 80),
+}
+CCAA = {"Andalucía": ["Málaga", "Cádiz", "Granada"], "Cataluña": ["Girona", "Tarragona"],
+        "Galicia": ["Lugo", "A Coruña"], "Canarias": ["Las Palmas", "Santa Cruz de Tenerife"],
+        "Castilla y León": ["León", "Burgos", "Soria"], "Comunitat Valenciana": ["Alicante", "Valencia"]}
+PALABRAS = ("playa tranquila senderismo montaña gastronomía excelente ruido masificado bonito precioso caro "
+            "limpio sucio familia museo vino atención habitación vistas desayuno ubicación céntrica").split()
+
+
+@dataclass(frozen=True)
+class Escala:
+    zonas: int = 92
+    desde: int = 2015
+    hasta: int = 2024
+    opiniones: int = 30      # media de opiniones por zona
+    semilla: int = 0
+
+
+ESCALAS = {
+    "pequeña": Escala(zonas=50, desde=2019, hasta=2024, opiniones=10),
+    "actual": Escala(),
+    "media": Escala(zonas=300, desde=2010, hasta=2024, opiniones=60),
+    "grande": Escala(zonas=1000, desde=2005, hasta=2024, opiniones=150),
+}
+
+
+def _texto(rng, n_palabras: int) -> str:
+    return " ".join(rng.choice(PALABRAS, n_palabras)).capitalize() + "."
+
+
+def generar(escala: Escala) -> tuple[dict[str, pd.DataFrame], pd.DataFrame]:
+    """Hojas de DATA_TOTAL.xlsx y frame de forecasts para una escala."""
+    from datos import FEATURES_KNN  # importa streamlit: solo cuando se generan datos
+
+    rng = np.random.default_rng(escala.semilla)
+    n = escala.zonas
+    zonas = [f"Zona Turística {i:04d}" for i in range(n)]
+
+    # Total: series mensuales con tendencia, estacionalidad propia de cada zona y huecos
+    años = np.arange(escala.desde, escala.hasta + 1)
+    meses = np.tile(np.arange(1, 13), len(años))
+    años_m = np.repeat(años, 12)
+    T = len(meses)
+    base = rng.uniform(500, 60_000, (n, 1, 4))
+    amp = rng.uniform(0.1, 0.8, (n, 1, 1))
+    fase = np.sin((meses - 4) / 12 * 2 * np.pi)[None, :, None]
+    tendencia = (1 + 0.03 * (años_m - escala.desde))[None, :, None]
+    viajeros = base * (1 + amp * fase) * tendencia * rng.uniform(0.9, 1.1, (n, T, 4))
+    viajeros = np.where(rng.random((n, 1, 4)) < 0.15, np.nan, viajeros)   # zonas sin un tipo de alojamiento
+    ocupa = np.clip(35 + 45 * amp * fase + rng.normal(0, 5, (n, T, 4)), 0, 100)
+    total = pd.DataFrame({
+        "ZONA_TURISTICA": np.repeat(zonas, T),
+        "AÑO": np.tile(años_m, n),
+        "MES": np.tile(meses, n),
+        **{f"VIAJEROS_{t}": viajeros[:, :, k].ravel() for k, t in enumerate(TIPOS)},
+        **{c: ocupa[:, :, k].ravel() for k, c in enumerate(COLS_OCUPA_TOTAL)},
+    })
+
+    coords = pd.DataFrame({"ZONA_TURISTICA": zonas, "lat": rng.uniform(36, 43.5, n), "long": rng.uniform(-9, 3.3, n)})
+
+    ccaa = rng.choice(list(CCAA), n)
+    data_zt = pd.DataFrame({
+        "ZONA TURÍSTICA": zonas,
+        "CCAA": ccaa,
+        "Provincia": [rng.choice(CCAA[c]) for c in ccaa],
+        **{c: rng.choice(v, n) for c, v in CATEGORIAS.items()},
+        **{c: rng.uniform(lo, hi, n).round(1) for c, (lo, hi) in NUMERICAS.items()},
+        **{c: rng.integers(0, 2, n) for c in FEATURES_KNN if c.startswith("Actividad_")},
+    })
+
+    descripciones = pd.DataFrame({"Zona Turística": zonas,
+                                  "Descripción": [_texto(rng, int(rng.integers(25, 60))) for _ in zonas]})
+
+    n_op = rng.poisson(escala.opiniones, n)
+    opiniones = pd.DataFrame({
+        "ZONA_TURISTICA": np.repeat(zonas, n_op),
+        "Opiniones": [_texto(rng, int(rng.integers(5, 60))) for _ in range(int(n_op.sum()))],
+    })
+
+    # Forecasts: 36 meses por zona con la estacionalidad de la zona
+    f_meses = np.tile(np.arange(1, 13), len(AÑOS_FORECAST))
+    f_fase = np.sin((f_meses - 4) / 12 * 2 * np.pi)[None, :, None]
+    f_ocupa = np.clip(40 + 45 * amp * f_fase + rng.normal(0, 4, (n, len(f_meses), len(COLS_OCUPA_FORECAST))), 0, 100)
+    forecasts = pd.DataFrame({
+        "AÑO": np.tile(np.repeat(AÑOS_FORECAST, 12), n),
+        "MES": np.tile(f_meses, n),
+        "ZONA_TURISTICA": np.repeat(zonas, len(f_meses)),
+        **{c: f_ocupa[:, :, k].ravel() for k, c in enumerate(COLS_OCUPA_FORECAST)},
+    })
+
+    hojas = {"Total": total, "Coordenadas ZT": coords, "Data ZT": data_zt,
+             "Descripciones": descripciones, "OpinionesZT": opiniones}
+    return hojas, forecasts
+
+
+def escribir(destino: Path, escala: Escala) -> dict:
+    """Escribe DATA_TOTAL.xlsx y Forecasts.xlsx en `destino`. Devuelve el nº de filas por hoja."""
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    hojas, forecasts = generar(escala)
+    with pd.ExcelWriter(destino / "DATA_TOTAL.xlsx") as w:
+        for nombre, df in hojas.items():
+            df.to_excel(w, sheet_name=nombre, index=False)
+    forecasts.to_excel(destino / "Forecasts.xlsx", index=False)
+    return {**{n: len(df) for n, df in hojas.items()}, "Forecasts": len(forecasts)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Genera un DATA_TOTAL.xlsx y un Excel de forecasts sintéticos.")
+    ap.add_argument("destino", type=Path)
+    for campo, valor in asdict(Escala()).items():
+        ap.add_argument(f"--{campo}", type=int, default=valor)
+    args = ap.parse_args()
+    escala = Escala(**{c: getattr(args, c) for c in asdict(Escala())})
+    print(escribir(args.destino, escala))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# Proyecto RedisTour
+# Benchmarks sobre datos sintéticos (ver sintetico.py): loaders, recomendador, mapa y vistas
+# del histórico, a varias escalas. Cada escala se genera en un directorio temporal y se mide
+# en un proceso aparte que apunta la app a ese directorio; las funciones cacheadas se miden
+# sin caché (`__wrapped__`), es decir, el coste de un fallo.
+#
+# Uso: python benchmarks/suite.py [--escalas pequeña actual media] [--repeticiones 5]
+#      python benchmarks/suite.py --comparar resultados/ANTES.json resultados/DESPUES.json
+#
+# Los resultados se guardan en benchmarks/resultados/<fecha>_<commit>.json.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+RESULTADOS = BASE / "benchmarks" / "resultados"
+sys.path.insert(0, str(BASE))
+sys.path.insert(0, str(BASE / "benchmarks"))
+
+from sintetico import ESCALAS, escribir  # noqa: E402
+
+
+def _cronometrar(fn, repeticiones: int) -> dict:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return {"min_ms": round(tiempos[0], 2), "mediana_ms": round(tiempos[len(tiempos) // 2], 2)}
+
+
+def medir(repeticiones: int) -> dict:
+    """Mide todas las rutas en este proceso (los datos salen de REDISTOUR_DATA_DIR)."""
+    import numpy as np
+    import datos
+    from historico import VENTANAS_COMPARACION, CRITERIOS_RANKING, MotorAcumulados, RankingZonas, \
+        presupuesto_puntos, submuestrear_series
+
+    res = {}
+
+    def caso(nombre, fn, filas=None):
+        res[nombre] = {**_cronometrar(fn, repeticiones), "filas": filas}
+
+    # --- loaders ---
+    def carga_total():
+        datos._datos_actual = None
+        return datos.cargar_datos()
+    snap = carga_total()
+    caso("cargar_datos", carga_total, len(snap.df))
+    df_zt, df_desc = datos._cargar_descripciones_y_datazt.__wrapped__(0)[:2]
+    caso("Data ZT + Descripciones", lambda: datos._cargar_descripciones_y_datazt.__wrapped__(0), len(df_zt))
+    opiniones = datos._cargar_opiniones_zt.__wrapped__(0)[0]
+    caso("OpinionesZT", lambda: datos._cargar_opiniones_zt.__wrapped__(0), sum(map(len, opiniones.values())))
+    import opiniones as resumen
+    caso("Resumen de opiniones (1 proceso)", lambda: resumen.calcular(opiniones, 1), sum(map(len, opiniones.values())))
+    df_fore = datos._cargar_forecasts.__wrapped__(0)[0]
+    caso("Forecasts", lambda: datos._cargar_forecasts.__wrapped__(0), len(df_fore))
+
+    import pronostico
+    cubo = pronostico.cubo_historico(snap.df)
+    caso("Forecasts: regenerar (Holt-Winters)", lambda: pronostico.generar(snap.df), cubo.valores.size)
+    caso("Forecasts: intervalos (bootstrap)", lambda: pronostico.con_intervalos(df_fore, snap.df), len(df_fore))
+
+    # --- recomendador ---
+    entrenar = datos.entrenar_pipeline.__wrapped__
+    pipe, df_knn, _ = entrenar(df_zt.copy())
+    caso("entrenar_pipeline", lambda: entrenar(df_zt.copy()), len(df_knn))
+    zonas = df_zt["ZONA_TURISTICA"].astype(str).tolist()
+    rng = np.random.default_rng(0)
+    consultas = rng.integers(0, len(df_knn), 20)
+    n_vecinos = min(13, len(df_knn))
+
+    def busquedas():
+        for i in consultas:
+            Xq = pipe.named_steps["preprocessor"].transform(df_knn.iloc[[i]])
+            pipe.named_steps["knn"].kneighbors(Xq, n_neighbors=n_vecinos)
+    caso("kNN: 20 búsquedas", busquedas, len(df_knn))
+    import busqueda
+    indice = busqueda._indice_texto.__wrapped__(0)
+    caso("Índice de texto", lambda: busqueda._indice_texto.__wrapped__(0), len(indice.zonas))
+    perfiles = busqueda._perfiles_zona.__wrapped__(0)
+    caso("Perfiles de zona", lambda: busqueda._perfiles_zona.__wrapped__(0), len(perfiles.zonas))
+    caso("kNN combinado: 20 búsquedas",
+         lambda: [perfiles.vecinos(zonas[i], n_vecinos, busqueda.PESO_TEXTO) for i in consultas], len(perfiles.zonas))
+    import redistribucion
+    import saturacion
+    indice_sat = saturacion.calcular(snap.df, df_fore)
+    año_plan = int(df_fore["AÑO"].iloc[0])
+    plan = redistribucion.planificar.__wrapped__(indice_sat, perfiles, año_plan, 8, peso_texto=busqueda.PESO_TEXTO)
+    caso("Plan de redistribución (todas las zonas)",
+         lambda: redistribucion.planificar.__wrapped__(indice_sat, perfiles, año_plan, 8,
+                                                       peso_texto=busqueda.PESO_TEXTO), len(plan.origenes))
+    año_f, mes_f = int(df_fore["AÑO"].iloc[0]), int(df_fore["MES"].iloc[0])
+    ocupacion = datos.attach_occupancy_breakdown.__wrapped__
+    caso("attach_occupancy_breakdown (12 zonas)", lambda: ocupacion(df_fore, zonas[:12], año_f, mes_f), 12)
+    caso("attach_occupancy_breakdown (todas)", lambda: ocupacion(df_fore, zonas, año_f, mes_f), len(zonas))
+
+    # --- mapa ---
+    agregado = datos._agregado_mapa.__wrapped__
+    cols = tuple(datos.VIAJEROS_COLS)
+    año_max = int(snap.df["AÑO"].max())
+    caso("Agregado mapa (todo)", lambda: agregado(snap.df, 0, None, None, cols), len(snap.df))
+    caso("Agregado mapa (año)", lambda: agregado(snap.df, 0, año_max, None, cols), len(snap.df))
+    caso("Agregado mapa (año y mes)", lambda: agregado(snap.df, 0, año_max, 7, cols), len(snap.df))
+    caso("Índice de saturación", lambda: saturacion.calcular(snap.df, df_fore), indice_sat.valores.size)
+    mapa = agregado(snap.df, 0, None, None, cols)
+    caso("Saturación: lectura del mapa",
+         lambda: indice_sat.buscar(mapa["ZONA_TURISTICA"], mapa["AÑO"], mapa["MES"]), len(mapa))
+
+    # --- histórico ---
+    caso("MotorAcumulados", lambda: MotorAcumulados(snap.df, datos.VIAJEROS_COLS), len(snap.df))
+    motor = snap.motor
+    muestra = motor.zonas[: max(1, len(motor.zonas) // 10)]
+    for v in VENTANAS_COMPARACION:
+        caso(f"comparar {v} (todas)", lambda v=v: motor.comparar(v), len(motor.zonas))
+        caso(f"comparar {v} (10% zonas)", lambda v=v: motor.comparar(v, zonas=muestra), len(muestra))
+    cols_tipo = {c: c for c in datos.VIAJEROS_COLS}
+    caso("RankingZonas", lambda: RankingZonas(snap.df, cols_tipo), len(snap.df))
+    ranking = RankingZonas(snap.df, cols_tipo)
+    for criterio in CRITERIOS_RANKING:
+        caso(f"ranking top 10 {criterio}", lambda c=criterio: ranking.top(10, c), len(ranking.zonas))
+    serie = snap.df[snap.df["ZONA_TURISTICA"].isin(muestra)].assign(
+        VIAJEROS_SEL=lambda d: d[datos.VIAJEROS_COLS].sum(axis=1),
+        FECHA=lambda d: d["AÑO"].astype(int) * 12 + d["MES"].astype(int))
+    n_pts = presupuesto_puntos(len(muestra))
+    caso("submuestrear_series (LTTB)",
+         lambda: submuestrear_series(serie, "FECHA", "VIAJEROS_SEL", "ZONA_TURISTICA", n_pts), len(serie))
+    return res
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "sin-git"
+
+
+def ejecutar(escalas: list[str], repeticiones: int) -> dict:
+    salida = {
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_rev(),
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "repeticiones": repeticiones,
+        "escalas": {},
+    }
+    for nombre in escalas:
+        escala = ESCALAS[nombre]
+        with tempfile.TemporaryDirectory(prefix=f"redistour_{nombre}_") as tmp:
+            t0 = time.perf_counter()
+            filas = escribir(Path(tmp), escala)
+            print(f"[{nombre}] datos generados en {time.perf_counter() - t0:.1f} s: {filas}", flush=True)
+            entorno = {**os.environ, "REDISTOUR_DATA_DIR": tmp,
+                       "REDISTOUR_FORECASTS": str(Path(tmp) / "Forecasts.xlsx"),
+                       "REDISTOUR_PRECARGA": "0", "REDISTOUR_RECARGA": "0"}
+            proc = subprocess.run([sys.executable, __file__, "--medir", "--repeticiones", str(repeticiones)],
+                                  env=entorno, cwd=BASE, capture_output=True, text=True)
+            if proc.returncode != 0:
+                sys.stderr.write(proc.stderr)
+                raise SystemExit(f"[{nombre}] la medición falló")
+            tiempos = json.loads(proc.stdout.strip().splitlines()[-1])
+        salida["escalas"][nombre] = {"parametros": asdict(escala), "filas": filas, "tiempos": tiempos}
+        for caso, r in tiempos.items():
+            print(f"[{nombre}] {caso:<42} {r['mediana_ms']:>10.2f} ms")
+    return salida
+
+
+def comparar(antes: Path, despues: Path):
+    a = json.loads(Path(antes).read_text(encoding="utf-8"))
+    d = json.loads(Path(despues).read_text(encoding="utf-8"))
+    print(f"{a['commit']} -> {d['commit']} (mediana, ms)")
+    for escala in d["escalas"]:
+        if escala not in a["escalas"]:
+            continue
+        ta, td = a["escalas"][escala]["tiempos"], d["escalas"][escala]["tiempos"]
+        for caso in td:
+            if caso not in ta:
+                continue
+            x, y = ta[caso]["mediana_ms"], td[caso]["mediana_ms"]
+            cambio = f"{(y - x) / x * 100:+.1f}%" if x else "—"
+            print(f"[{escala}] {caso:<42} {x:>10.2f} {y:>10.2f} {cambio:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de RedisTour sobre datos sintéticos")
+    ap.add_argument("--escalas", nargs="+", default=["pequeña", "actual", "media"], choices=list(ESCALAS))
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--salida", type=Path, help="fichero JSON (por defecto resultados/<fecha>_<commit>.json)")
+    ap.add_argument("--comparar", nargs=2, type=Path, metavar=("ANTES", "DESPUES"))
+    ap.add_argument("--medir", action="store_true", help=argparse.SUPPRESS)  # proceso hijo de cada escala
+    args = ap.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+    if args.medir:
+        print(json.dumps(medir(args.repeticiones), ensure_ascii=False))
+        return
+
+    salida = ejecutar(args.escalas, args.repeticiones)
+    ruta = args.salida or RESULTADOS / f"{datetime.now():%Y%m%d_%H%M%S}_{salida['commit']}.json"
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_text(json.dumps(salida, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Resultados en {ruta}")
+
+
+if __name__ == "__main__":
+    main()
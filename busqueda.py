@@ -0,0 +1,216 @@
+# Proyecto RedisTour
+# Búsqueda de texto libre sobre las descripciones y las opiniones de cada zona.
+# Un documento por zona (descripción + opiniones), vectorizado con TF-IDF una vez por
+# generación de datos; una consulta es un producto matriz dispersa × vector. La SVD del
+# mismo TF-IDF da un perfil denso por zona que el recomendador combina con sus atributos.
+
+import os
+import re
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from datos import entrenar_pipeline, generacion_actual, _sin_acentos, _cargar_descripciones_y_datazt, \
+    _cargar_opiniones_zt, _mapa_descripciones
+from instrumentacion import importar, medido
+
+# la descripción pesa como varias opiniones: es corta pero la escribe quien conoce la zona
+PESO_DESCRIPCION = 3
+# resultados por defecto de IndiceTexto.buscar (None = todas las coincidencias)
+MAX_CANDIDATOS_TEXTO = 50
+# en "Encuentra tu destino" con filtros de atributos: peso de la relevancia del texto frente a la
+# similitud con los filtros al ordenar (sin filtros solo cuenta el texto)
+PESO_RELEVANCIA_TEXTO = 0.7
+
+STOPWORDS_ES = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bajo bien cada casi como con
+contra cual cuando de del desde donde dos e el ella ellas ellos en entre era es esa esas ese eso esos
+esta estaba estan estar este esto estos fue fueron ha habia han hasta hay la las le les lo los mas me
+mi mientras mismo mucho muy nada ni no nos o otra otras otro otros para pero poco por porque que quien
+se sea segun ser si sin sobre solo son su sus tambien tan tanto te tiene tienen todo todos tu un una
+unas uno unos y ya yo
+""".split())
+
+_TOKEN = re.compile(r"[a-zñ0-9]+")
+
+
+def plegar(texto: str) -> str:
+    """Minúsculas y sin tildes (misma regla que `_normalize_zone_colnames`)."""
+    return _sin_acentos(str(texto).lower()).replace("ü", "u")
+
+
+def _raiz(token: str) -> str:
+    # raíz ligera: plural y género (playas/playa, tranquilos/tranquila -> play, tranquil)
+    for suf in ("es", "s"):
+        if token.endswith(suf) and len(token) - len(suf) >= 4:
+            token = token[:-len(suf)]
+            break
+    if token[-1] in "ao" and len(token) > 4:
+        token = token[:-1]
+    return token
+
+
+def analizar(texto: str) -> list[str]:
+    """Tokens plegados, sin palabras vacías y reducidos a su raíz."""
+    return [_raiz(t) for t in _TOKEN.findall(plegar(texto)) if t not in STOPWORDS_ES and len(t) > 1]
+
+
+@dataclass(frozen=True)
+class IndiceTexto:
+    """Matriz TF-IDF (zonas × términos, filas con norma L2) y su vectorizador."""
+    zonas: list[str]
+    vectorizador: object
+    matriz: object
+
+    def buscar(self, consulta: str, n: int | None = MAX_CANDIDATOS_TEXTO) -> list[tuple[str, float]]:
+        """Zonas con alguna coincidencia, de mayor a menor similitud coseno con la consulta."""
+        q = self.vectorizador.transform([consulta])
+        if not q.nnz:
+            return []
+        puntos = (self.matriz @ q.T).toarray().ravel()
+        idx = np.flatnonzero(puntos > 0)
+        if n is not None and len(idx) > n:
+            idx = idx[np.argpartition(-puntos[idx], n - 1)[:n]]
+        idx = idx[np.lexsort((idx, -puntos[idx]))]
+        return [(self.zonas[i], float(puntos[i])) for i in idx]
+
+
+@medido("Índice de texto", filas=lambda r: len(r.zonas),
+        cache=st.cache_resource(show_spinner=False, max_entries=2))
+def _indice_texto(generacion: int) -> IndiceTexto:
+    TfidfVectorizer = importar("sklearn.feature_extraction.text").TfidfVectorizer
+    descripciones = _mapa_descripciones(generacion)
+    opiniones = _cargar_opiniones_zt(generacion)[0]
+    zonas = sorted(set(descripciones) | set(opiniones))
+    docs = [" ".join([descripciones.get(z, "")] * PESO_DESCRIPCION + [str(o) for o in opiniones.get(z, [])])
+            for z in zonas]
+    vectorizador = TfidfVectorizer(analyzer=analizar, sublinear_tf=True, min_df=1, dtype=np.float32)
+    matriz = vectorizador.fit_transform(docs).tocsr()
+    return IndiceTexto(zonas, vectorizador, matriz)
+
+
+def indice_texto() -> IndiceTexto:
+    return _indice_texto(generacion_actual())
+
+
+# =========================
+# PERFIL DE TEXTO (recomendador)
+# =========================
+# dimensiones del perfil denso de cada zona (SVD truncada del TF-IDF)
+DIM_PERFIL_TEXTO = 64
+# peso por defecto de la similitud de textos frente a la de atributos en el "Destino alternativo"
+PESO_TEXTO = float(os.environ.get("REDISTOUR_PESO_TEXTO", 0.3))
+
+
+def _normalizar_filas(X: np.ndarray) -> np.ndarray:
+    X = np.asarray(X, dtype=np.float32)
+    normas = np.linalg.norm(X, axis=1, keepdims=True)
+    return np.divide(X, normas, out=np.zeros_like(X), where=normas > 0)
+
+
+def perfil_texto(indice: IndiceTexto, zonas: list[str]) -> np.ndarray:
+    """Perfil denso (filas con norma L2, ceros si la zona no tiene textos) en el orden de `zonas`."""
+    TruncatedSVD = importar("sklearn.decomposition").TruncatedSVD
+    n_comp = min(DIM_PERFIL_TEXTO, indice.matriz.shape[0] - 1, indice.matriz.shape[1] - 1)
+    if n_comp >= 1:
+        Z = TruncatedSVD(n_components=n_comp, random_state=0).fit_transform(indice.matriz)
+    else:
+        Z = indice.matriz.toarray()
+    Z = _normalizar_filas(Z)
+    pos = {z: i for i, z in enumerate(indice.zonas)}
+    out = np.zeros((len(zonas), Z.shape[1]), dtype=np.float32)
+    filas = [(k, pos[z]) for k, z in enumerate(zonas) if z in pos]
+    if filas:
+        dst, src = map(list, zip(*filas))
+        out[dst] = Z[src]
+    return out
+
+
+@dataclass(frozen=True)
+class PerfilesZona:
+    """Features codificadas del kNN y perfil de textos por zona, ambos con filas de norma L2.
+
+    La distancia combinada es (1 - peso)·coseno(atributos) + peso·coseno(textos); para los
+    pares en que alguna zona no tiene textos se usa solo la de atributos.
+    """
+    zonas: list[str]
+    estructura: np.ndarray
+    texto: np.ndarray
+
+    def distancias(self, i: int, peso: float) -> np.ndarray:
+        return self.matriz_distancias(np.array([i]), peso)[0]
+
+    def matriz_distancias(self, filas: np.ndarray, peso: float) -> np.ndarray:
+        """Distancias combinadas de las zonas `filas` a todas las zonas (una fila por zona de `filas`)."""
+        d = 1.0 - self.estructura[filas] @ self.estructura.T
+        if peso <= 0:
+            return d
+        con_texto = self.texto.any(axis=1)
+        ambas = con_texto[filas][:, None] & con_texto[None, :]
+        d_txt = 1.0 - self.texto[filas] @ self.texto.T
+        return np.where(ambas, (1.0 - peso) * d + peso * d_txt, d)
+
+    def vecinos(self, zona: str, n: int, peso: float) -> list[tuple[str, float]] | None:
+        """Las `n` zonas más cercanas a `zona` (incluida ella misma) con la distancia combinada."""
+        if zona not in self.zonas:
+            return None
+        i = self.zonas.index(zona)
+        d = self.distancias(i, peso)
+        d[i] = -np.inf  # la propia zona siempre primero, como en el kNN
+        n = min(n, len(d))
+        idx = np.argpartition(d, n - 1)[:n] if n < len(d) else np.arange(len(d))
+        idx = idx[np.lexsort((idx, d[idx]))]
+        return [(self.zonas[j], 0.0 if j == i else float(max(d[j], 0.0))) for j in idx]
+
+
+@medido("Perfiles de zona", filas=lambda r: len(r.zonas),
+        cache=st.cache_resource(show_spinner=False, max_entries=2))
+def _perfiles_zona(generacion: int) -> PerfilesZona:
+    df_zt = _cargar_descripciones_y_datazt(generacion)[0]
+    pipe, df_knn, _ = entrenar_pipeline(df_zt.copy())
+    Xt = pipe.named_steps["preprocessor"].transform(df_knn)
+    zonas = df_zt["ZONA_TURISTICA"].astype(str).tolist()
+    return PerfilesZona(
+        zonas=zonas,
+        estructura=_normalizar_filas(Xt.toarray() if hasattr(Xt, "toarray") else Xt),
+        texto=perfil_texto(_indice_texto(generacion), zonas),
+    )
+
+
+def perfiles_zona() -> PerfilesZona:
+    return _perfiles_zona(generacion_actual())
+
+
+# =========================
+# PUNTUACIÓN DEL RECOMENDADOR
+# =========================
+# con la penalización por saturación activada, puntos de similitud (0-100) que resta cada punto del
+# índice (0-100): un destino 20 puntos más saturado necesita 10 puntos más de similitud para ir delante
+PESO_SATURACION_RANKING = 0.5
+# puntos que suma cada unidad de tono medio de las opiniones (-1 a 1): el tono mueve a un candidato
+# como mucho 2 puntos de similitud, así que solo reordena destinos casi igual de parecidos
+PESO_TONO_RANKING = 2.0
+
+
+def puntuar_alternativas(df: pd.DataFrame, zona_objetivo: str, penalizar_saturacion: bool = False) -> pd.DataFrame:
+    """Candidatos del "Destino alternativo" ordenados por PUNTUACION (mayor primero) y, a igualdad, por
+    menor OCC_MEDIA.
+
+    La puntuación es la similitud más un premio por el tono de las opiniones; con `penalizar_saturacion`
+    se le resta el índice de saturación del destino, que ya incluye su ocupación prevista (por eso la
+    ocupación queda solo como desempate). A un candidato sin índice o sin tono se le asigna la media
+    del resto. La zona de partida va siempre primero.
+    """
+    def _col(c):
+        v = df[c].astype(float)
+        return v.fillna(v.mean()).fillna(0.0)
+
+    puntos = df["Similitud_num"].astype(float) + PESO_TONO_RANKING * _col("TONO")
+    if penalizar_saturacion:
+        puntos = puntos - PESO_SATURACION_RANKING * _col("SATURACION")
+    out = df.assign(PUNTUACION=puntos, _origen=df["Zona"].astype(str) != str(zona_objetivo))
+    return (out.sort_values(["_origen", "PUNTUACION", "OCC_MEDIA", "Zona"], ascending=[True, False, True, True],
+                            na_position="last", kind="stable")
+            .drop(columns="_origen").reset_index(drop=True))
@@ -0,0 +1,94 @@
+# Proyecto RedisTour
+# Caché de resultados de los recomendadores, compartida por todas las sesiones del proceso.
+# La clave es la versión de los datos más la consulta normalizada; las entradas se expulsan
+# por LRU cuando el tamaño total supera el límite. Las de versiones anteriores ya no se piden
+# y envejecen solas: durante una recarga, las sesiones que siguen en la versión anterior y
+# las que ya ven la nueva conviven sin borrarse la caché unas a otras.
+
+import os
+import threading
+from collections import OrderedDict
+
+import metricas
+
+# límite de memoria de la caché (MB)
+MAX_MB_CONSULTAS = float(os.environ.get("REDISTOUR_CACHE_CONSULTAS_MB", 64))
+
+
+def normalizar(valor):
+    """Forma canónica y hashable de un valor de la consulta (listas de multiselect sin orden)."""
+    if isinstance(valor, (list, set, frozenset)):
+        return tuple(sorted(map(str, valor)))
+    if isinstance(valor, tuple):
+        return tuple(normalizar(v) for v in valor)
+    if hasattr(valor, "item"):  # escalares de numpy
+        return valor.item()
+    return valor
+
+
+class CacheConsultas:
+    """LRU acotada por bytes, segura entre hilos, con la versión de los datos como parte de la clave."""
+
+    def __init__(self, max_bytes: int, nombre: str = "Consultas recomendador"):
+        self.max_bytes = max_bytes
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self._entradas: OrderedDict[tuple, tuple[object, int]] = OrderedDict()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave: tuple, version):
+        """Resultado guardado para la consulta o None."""
+        clave = (normalizar(version), normalizar(clave))
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+            else:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+        metricas.incrementar("redistour_cache_fallos_total" if entrada is None else "redistour_cache_aciertos_total",
+                             funcion=self.nombre)
+        return None if entrada is None else entrada[0]
+
+    def guardar(self, clave: tuple, version, valor):
+        clave = (normalizar(version), normalizar(clave))
+        tamaño = metricas.tamaño_bytes(valor)
+        if tamaño > self.max_bytes:
+            return
+        with self._lock:
+            previa = self._entradas.pop(clave, None)
+            if previa is not None:
+                self.bytes -= previa[1]
+            self._entradas[clave] = (valor, tamaño)
+            self.bytes += tamaño
+            while self.bytes > self.max_bytes:
+                _, (_, t) = self._entradas.popitem(last=False)
+                self.bytes -= t
+                self.expulsiones += 1
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "ratio_aciertos": round(self.aciertos / total, 3) if total else None,
+                "expulsiones": self.expulsiones,
+            }
+
+
+CONSULTAS = CacheConsultas(int(MAX_MB_CONSULTAS * 2**20))
+
+
+def _bytes_consultas():
+    est = CONSULTAS.estadisticas()
+    return [({"estado": "ocupado"}, est["bytes"]), ({"estado": "limite"}, est["max_bytes"])]
+
+
+metricas.registrar_medidor("redistour_consultas_cache_bytes", _bytes_consultas)
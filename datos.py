@@ -0,0 +1,617 @@
+# Proyecto RedisTour
+# Carga de datos y modelo de la app. Nada se carga al importar el módulo:
+# cada sección pide solo lo que necesita y las cachés de Streamlit hacen el resto.
+
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+import metricas
+import pronostico
+from instrumentacion import importar, medido
+from historico import MotorAcumulados, RankingZonas
+
+log = logging.getLogger("redistour.datos")
+
+# =========================
+# RUTAS (robustas)
+# =========================
+BASE = Path(__file__).resolve().parent
+# REDISTOUR_DATA_DIR / REDISTOUR_FORECASTS permiten apuntar a otros datos (p. ej. los sintéticos de benchmarks/)
+DATA_DIR = Path(os.environ.get("REDISTOUR_DATA_DIR", BASE / "Data_Dataestur"))
+FORECASTS_XLSX = Path(os.environ.get("REDISTOUR_FORECASTS", BASE / "Forecasts_2025_2026_2027.xlsx"))
+# con "1", forecasts ausentes u obsoletos se regeneran desde el histórico (ver pronostico.py); por
+# defecto se sirven siempre los del Excel, que están revisados
+REGENERAR_FORECASTS = os.environ.get("REDISTOUR_REGENERAR_FORECASTS", "0") == "1"
+# Almacén Parquet generado por ingesta.py; si existe, sustituye a la hoja "Total"
+ALMACEN_MANIFIESTO = DATA_DIR / "almacen" / "manifest.json"
+# primer año que la app lee del almacén (vacío = todos): las particiones anteriores no se abren.
+# Todas las secciones comparten una sola instantánea en memoria (las comparaciones interanuales
+# necesitan los años previos), así que la poda por vista solo se usa fuera de la app (leer_almacen).
+AÑO_DESDE_ALMACEN = int(os.environ["REDISTOUR_ALMACEN_DESDE"]) if os.environ.get("REDISTOUR_ALMACEN_DESDE") else None
+
+# =========================
+# GENERACIÓN DE CACHÉ
+# =========================
+# Los loaders se cachean por "generación". Para refrescar antes de que venza el TTL
+# se calcula la generación siguiente en segundo plano y después se cambia el puntero,
+# de modo que ninguna sesión encuentra la caché fría (ver precarga.py).
+TTL_CACHE = 3600
+
+_lock_gen = threading.Lock()
+_generacion = 0
+
+def generacion_actual() -> int:
+    return _generacion
+
+def publicar_generacion(gen: int):
+    """Hace visible `gen` a todas las sesiones (sus cachés ya deben estar calientes)."""
+    global _generacion
+    with _lock_gen:
+        _generacion = max(_generacion, gen)
+
+def _salt_excel() -> float:
+    """mtime más reciente de DATA_TOTAL.xlsx y del manifiesto del almacén (0 si no existen),
+    para detectar cambios sin leer los ficheros."""
+    rutas = [DATA_DIR / "DATA_TOTAL.xlsx", ALMACEN_MANIFIESTO]
+    return max((p.stat().st_mtime for p in rutas if p.exists()), default=0.0)
+
+
+# =========================
+# CARGA DE DATOS (mapa) – Excel
+# =========================
+REQ_COLS_TOTAL = ["ZONA_TURISTICA", "AÑO", "MES",
+                  "VIAJEROS_EOH", "VIAJEROS_EOTR", "VIAJEROS_EOAP", "VIAJEROS_EOAC"]
+REQ_COLS_COORDS = ["ZONA_TURISTICA", "lat", "long"]
+
+def _coerce_numeric(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    for c in cols:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
+
+def _sin_acentos(s: str) -> str:
+    return (s.replace("Í","I").replace("í","i")
+             .replace("Ú","U").replace("ú","u")
+             .replace("Á","A").replace("á","a")
+             .replace("É","E").replace("é","e")
+             .replace("Ó","O").replace("ó","o"))
+
+def _normalize_zone_colnames(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza nombres de columnas eliminando acentos, espacios y mayúsculas/minúsculas.
+       Mapea a: ZONA_TURISTICA, DESCRIPCION, Comunidad_Autonoma, Provincia
+    """
+    ren = {}
+    for c in df.columns:
+        norm = _sin_acentos(c).strip().replace(" ", "_").upper()
+        mapping = {
+            "ZONA_TURISTICA": "ZONA_TURISTICA",
+            "DESCRIPCION": "DESCRIPCION",
+            "COMUNIDAD_AUTONOMA": "Comunidad_Autonoma",
+            "PROVINCIA": "Provincia",
+        }
+        if norm in mapping:
+            ren[c] = mapping[norm]
+    if ren:
+        df = df.rename(columns=ren)
+    if "ZONA_TURISTICA" in df.columns:
+        df["ZONA_TURISTICA"] = df["ZONA_TURISTICA"].astype(str).str.strip()
+    return df
+
+VIAJEROS_COLS = ["VIAJEROS_EOH", "VIAJEROS_EOTR", "VIAJEROS_EOAP", "VIAJEROS_EOAC"]
+OCUPACION_COLS = ["GRADO_OCUPA_PLAZAS_EOH", "GRADO_OCUPA_PLAZAS_EOTR",
+                  "GRADO_OCUPA_PLAZAS_EOAP", "GRADO_OCUPA_PARCELAS_EOAC"]
+CLAVE_FILA = ["ZONA_TURISTICA", "AÑO", "MES"]
+
+def _leer_total_y_coords() -> tuple[pd.DataFrame, pd.DataFrame, float]:
+    """Lee y valida las hojas "Total" y "Coordenadas ZT". Lanza ValueError con el motivo si no se puede.
+
+    Si hay almacén de ingesta (ver ingesta.py), "Total" se lee de sus particiones Parquet.
+    """
+    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
+    if not total_excel.exists():
+        raise ValueError(f"No se encuentra {total_excel}.")
+    # salt de cache por mtime
+    _salt = _salt_excel()
+    try:
+        if ALMACEN_MANIFIESTO.exists():
+            ingesta = importar("ingesta")
+            años = None
+            if AÑO_DESDE_ALMACEN is not None:
+                particiones = ingesta.leer_manifiesto(ALMACEN_MANIFIESTO.parent)["particiones"]
+                años = [int(a) for a in particiones if int(a) >= AÑO_DESDE_ALMACEN]
+            df_total = ingesta.leer_almacen(ALMACEN_MANIFIESTO.parent, años=años)
+        else:
+            df_total = pd.read_excel(total_excel, sheet_name="Total")
+        df_coords = pd.read_excel(total_excel, sheet_name="Coordenadas ZT")
+    except Exception as e:
+        raise ValueError(f"No se pudo abrir el Excel: {e}") from e
+
+    df_total = _normalize_zone_colnames(df_total)
+    df_coords = _normalize_zone_colnames(df_coords)
+
+    faltan_total = [c for c in REQ_COLS_TOTAL if c not in df_total.columns]
+    faltan_coords = [c for c in REQ_COLS_COORDS if c not in df_coords.columns]
+    if faltan_total:
+        raise ValueError(f"Faltan columnas en DATA_TOTAL: {faltan_total}")
+    if faltan_coords:
+        raise ValueError(f"Faltan columnas en COORDS_ZT: {faltan_coords}")
+
+    df_total = _coerce_numeric(df_total, ["AÑO", "MES"] + VIAJEROS_COLS)
+    df_coords = df_coords.drop_duplicates("ZONA_TURISTICA")
+    return df_total, df_coords, _salt
+
+def _merge_coords(df_total: pd.DataFrame, df_coords: pd.DataFrame) -> pd.DataFrame:
+    return df_total.merge(df_coords[["ZONA_TURISTICA", "lat", "long"]], on="ZONA_TURISTICA", how="left")
+
+
+# =========================
+# VERSIÓN DE DATOS EN MEMORIA (Total + Coordenadas)
+# =========================
+# Todas las sesiones comparten una instantánea inmutable; una recarga construye la
+# siguiente aparte y la publica con una sola asignación, así que cada ejecución del
+# script ve una versión completa (frames y acumulados coherentes entre sí).
+@dataclass(frozen=True)
+class VersionDatos:
+    version: int
+    salt: float
+    df_total: pd.DataFrame
+    df_coords: pd.DataFrame
+    df: pd.DataFrame
+    motor: MotorAcumulados
+
+_lock_datos = threading.Lock()
+_datos_actual: VersionDatos | None = None
+
+def instantanea_datos() -> VersionDatos:
+    """Versión vigente de los datos. La primera llamada del proceso hace la carga completa."""
+    global _datos_actual
+    if _datos_actual is None:
+        with _lock_datos:
+            if _datos_actual is None:
+                with metricas.cronometro("redistour_carga_segundos", funcion="Total + Coordenadas ZT"):
+                    df_total, df_coords, salt = _leer_total_y_coords()
+                df = _merge_coords(df_total, df_coords)
+                # con un paquete vigente (ver paquete.py) los acumulados se mapean de disco
+                paq = importar("paquete").paquete_vigente()
+                motor = paq.motor() if paq is not None else MotorAcumulados(df, VIAJEROS_COLS)
+                _datos_actual = VersionDatos(1, salt, df_total, df_coords, df, motor)
+    return _datos_actual
+
+def _bytes_datos():
+    snap = _datos_actual
+    if snap is None:
+        return []
+    return [({"frame": n}, metricas.tamaño_bytes(getattr(snap, n))) for n in ("df_total", "df_coords", "df")]
+
+metricas.registrar_medidor("redistour_datos_bytes", _bytes_datos)
+
+@medido("Total + Coordenadas ZT", filas=lambda snap: len(snap.df))
+def cargar_datos() -> VersionDatos:
+    """Instantánea vigente para una ejecución del script; si el Excel no es válido muestra el error y para."""
+    try:
+        return instantanea_datos()
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+
+def diferencias_total(df_old: pd.DataFrame, df_new: pd.DataFrame):
+    """Compara dos hojas "Total" por (zona, año, mes).
+
+    Devuelve (altas, cambios_old, cambios_new, bajas) o None si no es comparable por clave
+    (columnas distintas o claves duplicadas), en cuyo caso hay que recargar entero.
+    """
+    if set(df_old.columns) != set(df_new.columns):
+        return None
+    if df_old.duplicated(CLAVE_FILA).any() or df_new.duplicated(CLAVE_FILA).any():
+        return None
+    valores = [c for c in df_new.columns if c not in CLAVE_FILA]
+    m = df_old.merge(df_new, on=CLAVE_FILA, how="outer", suffixes=("__old", ""), indicator=True)
+    altas = m.loc[m["_merge"] == "right_only", CLAVE_FILA + valores]
+    bajas = m.loc[m["_merge"] == "left_only", CLAVE_FILA + [f"{c}__old" for c in valores]]
+    bajas.columns = CLAVE_FILA + valores
+
+    ambos = m[m["_merge"] == "both"]
+    distinto = pd.Series(False, index=ambos.index)
+    for c in valores:
+        a, b = ambos[f"{c}__old"], ambos[c]
+        distinto |= ~((a == b) | (a.isna() & b.isna()))
+    cambiadas = ambos[distinto]
+    cambios_old = cambiadas[CLAVE_FILA + [f"{c}__old" for c in valores]]
+    cambios_old.columns = CLAVE_FILA + valores
+    cambios_new = cambiadas[CLAVE_FILA + valores]
+    return altas, cambios_old, cambios_new, bajas
+
+def _delta_motor(altas, cambios_old, cambios_new, bajas):
+    """Incrementos de valor y de nº de observaciones por celda para `MotorAcumulados.con_delta`."""
+    cols = [c for c in VIAJEROS_COLS]
+    partes, partes_obs = [], []
+    for df_, signo in [(altas, 1), (cambios_new, 1), (cambios_old, -1), (bajas, -1)]:
+        if not len(df_):
+            continue
+        v = df_[CLAVE_FILA].copy()
+        o = df_[CLAVE_FILA].copy()
+        for c in cols:
+            x = pd.to_numeric(df_[c], errors="coerce")
+            v[c] = signo * x.fillna(0.0)
+            o[c] = signo * x.notna().astype(int)
+        partes.append(v)
+        partes_obs.append(o)
+    if not partes:
+        return pd.DataFrame(columns=CLAVE_FILA + cols), pd.DataFrame(columns=CLAVE_FILA + cols)
+    return pd.concat(partes, ignore_index=True), pd.concat(partes_obs, ignore_index=True)
+
+def recargar_si_cambia() -> dict | None:
+    """Si DATA_TOTAL.xlsx ha cambiado, aplica solo las filas nuevas/cambiadas/eliminadas de "Total"
+    a la versión vigente y publica la nueva versión. Devuelve un resumen o None si no había cambios.
+    """
+    global _datos_actual
+    snap = instantanea_datos()
+    if _salt_excel() == snap.salt:
+        return None
+    with metricas.cronometro("redistour_carga_segundos", funcion="Total + Coordenadas ZT"):
+        df_total, df_coords, salt = _leer_total_y_coords()
+
+    dif = diferencias_total(snap.df_total, df_total)
+    coords_iguales = snap.df_coords[REQ_COLS_COORDS].reset_index(drop=True).equals(
+        df_coords[REQ_COLS_COORDS].reset_index(drop=True))
+    motor = None
+    if dif is not None and coords_iguales:
+        altas, cambios_old, cambios_new, bajas = dif
+        tocadas = pd.concat([cambios_new[CLAVE_FILA], bajas[CLAVE_FILA]], ignore_index=True)
+        # frames: se quitan las filas cambiadas/eliminadas y se añaden las nuevas versiones
+        quitar = snap.df_total.set_index(CLAVE_FILA).index.isin(tocadas.set_index(CLAVE_FILA).index)
+        añadir = pd.concat([cambios_new, altas], ignore_index=True)[snap.df_total.columns]
+        new_total = pd.concat([snap.df_total[~quitar], añadir], ignore_index=True)
+        quitar_df = snap.df.set_index(CLAVE_FILA).index.isin(tocadas.set_index(CLAVE_FILA).index)
+        new_df = pd.concat([snap.df[~quitar_df], _merge_coords(añadir, df_coords)], ignore_index=True)
+        motor = snap.motor.con_delta(*_delta_motor(altas, cambios_old, cambios_new, bajas))
+        resumen = {"modo": "incremental", "altas": len(altas), "cambios": len(cambios_new), "bajas": len(bajas)}
+    if motor is None:
+        new_total, new_df = df_total, _merge_coords(df_total, df_coords)
+        motor = MotorAcumulados(new_df, VIAJEROS_COLS)
+        resumen = {"modo": "completa", "filas": len(new_total)}
+
+    nueva = VersionDatos(snap.version + 1, salt, new_total, df_coords, new_df, motor)
+    with _lock_datos:
+        _datos_actual = nueva
+    resumen["version"] = nueva.version
+    return resumen
+
+# =========================
+# DESCRIPCIONES + DATA ZT
+# =========================
+@medido("Data ZT + Descripciones", filas=lambda r: len(r[0]) if r[0] is not None else 0,
+        cache=st.cache_data(ttl=TTL_CACHE, show_spinner=False))
+def _cargar_descripciones_y_datazt(generacion: int):
+    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
+    if not total_excel.exists():
+        st.error(f"No se encuentra {total_excel}.")
+        st.stop()
+    _salt = total_excel.stat().st_mtime
+
+    try:
+        df_zt = pd.read_excel(total_excel, sheet_name="Data ZT")
+    except Exception as e:
+        st.error(f"No se pudo leer la hoja 'Data ZT' en DATA_TOTAL.xlsx: {e}")
+        st.stop()
+    df_zt = _normalize_zone_colnames(df_zt)
+
+    try:
+        df_desc = pd.read_excel(total_excel, sheet_name="Descripciones")
+    except Exception as e:
+        st.warning(f"No se pudo leer la hoja 'Descripciones': {e}")
+        df_desc = pd.DataFrame(columns=["ZONA_TURISTICA", "DESCRIPCION"])
+
+    df_desc = _normalize_zone_colnames(df_desc)
+    if "DESCRIPCION" not in df_desc.columns:
+        if "Descripcion" in df_desc.columns:
+            df_desc = df_desc.rename(columns={"Descripcion": "DESCRIPCION"})
+        else:
+            df_desc["DESCRIPCION"] = ""
+
+    if "ZONA_TURISTICA" in df_desc.columns:
+        df_desc["DESCRIPCION"] = df_desc["DESCRIPCION"].fillna("").astype(str).str.strip()
+        df_desc = df_desc.drop_duplicates(subset=["ZONA_TURISTICA"], keep="first")
+
+    return df_zt, df_desc, _salt
+
+def cargar_descripciones_y_datazt():
+    return _cargar_descripciones_y_datazt(generacion_actual())
+
+def get_desc_dict(df_desc: pd.DataFrame) -> dict:
+    if "ZONA_TURISTICA" not in df_desc.columns or "DESCRIPCION" not in df_desc.columns:
+        return {}
+    keys = df_desc["ZONA_TURISTICA"].astype(str).str.strip()
+    vals = df_desc["DESCRIPCION"].fillna("").astype(str).str.strip()
+    return dict(zip(keys, vals))
+
+def _pick_col(df: pd.DataFrame, candidates: list[str]):
+    for c in candidates:
+        if c in df.columns:
+            return c
+    return None
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _mapa_localizacion(generacion: int) -> dict[str, tuple[str, str]]:
+    df_zt_all = _cargar_descripciones_y_datazt(generacion)[0]
+    ca_col = _pick_col(df_zt_all, ["CCAA", "Comunidad Autónoma", "COMUNIDAD_AUTONOMA", "Comunidad_Autonoma"])
+    pr_col = _pick_col(df_zt_all, ["Provincia", "PROVINCIA"])
+    out = {}
+    if "ZONA_TURISTICA" not in df_zt_all.columns:
+        return out
+    for _, row in df_zt_all.drop_duplicates("ZONA_TURISTICA").iterrows():
+        ca = str(row[ca_col]) if ca_col and pd.notna(row[ca_col]) else "—"
+        pr = str(row[pr_col]) if pr_col and pd.notna(row[pr_col]) else "—"
+        out[str(row["ZONA_TURISTICA"]).strip()] = (ca, pr)
+    return out
+
+def get_loc_info(zona: str):
+    """Intenta devolver (Comunidad, Provincia) desde Data ZT si existen."""
+    return _mapa_localizacion(generacion_actual()).get(str(zona).strip(), ("—", "—"))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _mapa_descripciones(generacion: int) -> dict:
+    return get_desc_dict(_cargar_descripciones_y_datazt(generacion)[1])
+
+def mapa_descripciones() -> dict:
+    """DESC_MAP {zona: descripción}, construido una vez por generación de caché."""
+    return _mapa_descripciones(generacion_actual())
+
+
+# =========================
+# CARGA GLOBAL DE OPINIONES Y FORECASTS 
+# =========================
+@medido("OpinionesZT", filas=lambda r: sum(map(len, r[0].values())),
+        cache=st.cache_data(ttl=TTL_CACHE, show_spinner=False))
+def _cargar_opiniones_zt(generacion: int):
+    total_excel = DATA_DIR / "DATA_TOTAL.xlsx"
+    try:
+        df_op = pd.read_excel(total_excel, sheet_name="OpinionesZT")
+    except Exception as e: 
+        return {}, f"No se pudo leer la hoja 'Opiniones ZT': {e}"
+    df_op = _normalize_zone_colnames(df_op)
+    if "Opiniones" not in df_op.columns:
+        for alt_col in ["OPINIONES", "Opinion", "OPINION", "Reseñas", "Resenas"]:
+            if alt_col in df_op.columns:
+                df_op = df_op.rename(columns={alt_col: "Opiniones"})
+                break
+    if "ZONA_TURISTICA" not in df_op.columns or "Opiniones" not in df_op.columns:
+        return {}, "Faltan columnas en 'Opiniones ZT' (se requieren ZONA_TURISTICA y Opiniones)."
+    df_op["ZONA_TURISTICA"] = df_op["ZONA_TURISTICA"].astype(str).str.strip()
+    df_op["Opiniones"] = df_op["Opiniones"].fillna("").astype(str).str.strip()
+    df_op = df_op[df_op["Opiniones"] != ""]
+    op_map = {str(z): sub["Opiniones"].tolist() for z, sub in df_op.groupby("ZONA_TURISTICA")}
+    return op_map, None
+
+def cargar_opiniones_zt():
+    return _cargar_opiniones_zt(generacion_actual())
+
+@medido("Forecasts", filas=lambda r: len(r[0]) if r[0] is not None else 0,
+        cache=st.cache_data(ttl=TTL_CACHE, show_spinner=False))
+def _cargar_forecasts(generacion: int):
+    fpath = FORECASTS_XLSX
+    try:
+        df_f = pd.read_excel(fpath)
+    except Exception as e:
+        df_f, err = None, f"No se pudo leer el Excel de forecasts: {e}"
+    else:
+        err = None
+        for c in ["AÑO", "MES"]:
+            if c in df_f.columns:
+                df_f[c] = pd.to_numeric(df_f[c], errors="coerce").astype("Int64")
+    df_hist = instantanea_datos().df
+    # si se ha activado, sin Excel o con un histórico que ya cubre sus meses se regeneran desde él (segundos)
+    if REGENERAR_FORECASTS and pronostico.obsoleto(df_f, df_hist):
+        log.info("forecasts %s: se regeneran desde el histórico", "ausentes" if df_f is None else "obsoletos")
+        df_f, err = pronostico.generar(df_hist), None
+    if df_f is not None:
+        # intervalos de predicción (bootstrap de residuos): se calculan una vez, con los forecasts
+        df_f = pronostico.con_intervalos(df_f, df_hist)
+    return df_f, err
+
+def cargar_forecasts():
+    return _cargar_forecasts(generacion_actual())
+
+@st.cache_data(ttl=TTL_CACHE, show_spinner=False, max_entries=2)
+def _forecasts_obsoletos(generacion: int) -> bool:
+    # misma decisión que _cargar_forecasts, leyendo solo AÑO y MES del Excel
+    try:
+        df_f = pd.read_excel(FORECASTS_XLSX, usecols=["AÑO", "MES"])
+    except Exception:
+        df_f = None
+    return pronostico.obsoleto(df_f, instantanea_datos().df)
+
+def forecasts_regenerados() -> bool:
+    """True si los forecasts servidos salen de `pronostico.generar` en lugar del Excel."""
+    return REGENERAR_FORECASTS and _forecasts_obsoletos(generacion_actual())
+
+# === Ocupación por tipo (columnas por defecto para el desglose) ===
+OCC_COLS_DEFAULT = {
+    "Hotel": "GRADO_OCUPA_PLAZAS_EOH",
+    "Turismo rural": "GRADO_OCUPA_PLAZAS_EOTR",
+    "Apartamentos": "GRADO_OCUPA_PLAZAS_EOAP",
+    "Camping": "GRADO_OCUPA_PARCELAS_EOAC",
+}
+
+@medido("attach_occupancy_breakdown", filas=len)
+def attach_occupancy_breakdown(df_fore: pd.DataFrame, zonas_list: list[str], año_sel: int, mes_sel: int) -> dict[str, dict]:
+    """
+    Devuelve {zona: {tipo: valor_float_or_None, ...}} usando OCC_COLS_DEFAULT
+    """
+    out = {z: {} for z in zonas_list}
+    if df_fore is None:
+        return out
+
+    cols_exist = [c for c in OCC_COLS_DEFAULT.values() if c in df_fore.columns]
+    if not cols_exist:
+        return out
+
+    df_mes = df_fore[(df_fore["AÑO"] == año_sel) & (df_fore["MES"] == mes_sel)].copy()
+    if "ZONA_TURISTICA" not in df_mes.columns:
+        return out
+
+    keep_cols = ["ZONA_TURISTICA"] + cols_exist
+    df_mes = df_mes[keep_cols]
+    df_mes["ZONA_TURISTICA"] = df_mes["ZONA_TURISTICA"].astype(str)
+
+    tmp = df_mes.set_index("ZONA_TURISTICA").to_dict(orient="index")
+    for z in zonas_list:
+        zstr = str(z)
+        if zstr in tmp:
+            values = tmp[zstr]
+            for tipo, col in OCC_COLS_DEFAULT.items():
+                out[z].update({tipo: float(values[col]) if (col in values and pd.notna(values[col])) else None})
+        else:
+            for tipo in OCC_COLS_DEFAULT.keys():
+                out[z].update({tipo: None})
+    return out
+
+
+@medido("attach_occupancy_intervals", filas=len)
+def attach_occupancy_intervals(df_fore: pd.DataFrame, zonas_list: list[str], año_sel: int, mes_sel: int) -> dict[str, dict]:
+    """{zona: {tipo: (p10, p90) o None}} con los intervalos de predicción de los forecasts."""
+    out = {z: {tipo: None for tipo in OCC_COLS_DEFAULT} for z in zonas_list}
+    if df_fore is None or "ZONA_TURISTICA" not in df_fore.columns:
+        return out
+    inf, sup = pronostico.SUFIJOS_INTERVALO
+    cols = {tipo: c for tipo, c in OCC_COLS_DEFAULT.items() if c + inf in df_fore.columns}
+    if not cols:
+        return out
+    df_mes = df_fore[(df_fore["AÑO"] == año_sel) & (df_fore["MES"] == mes_sel)]
+    tmp = df_mes.assign(ZONA_TURISTICA=df_mes["ZONA_TURISTICA"].astype(str)).set_index("ZONA_TURISTICA")
+    tmp = tmp[~tmp.index.duplicated(keep="last")]
+    for z in zonas_list:
+        if str(z) not in tmp.index:
+            continue
+        fila = tmp.loc[str(z)]
+        for tipo, c in cols.items():
+            lo, hi = fila[c + inf], fila[c + sup]
+            out[z][tipo] = (float(lo), float(hi)) if pd.notna(lo) and pd.notna(hi) else None
+    return out
+
+
+# =========================
+# RECOMENDADOR k-NN (Destino alternativo)
+# =========================
+FEATURES_KNN = [
+    # Categóricas
+    "Tipo_Ubicación",
+    "Clima_Köppen",
+    "Estacionalidad_Climática",
+    "Nivel_Infraestructura_Turística",
+    "Aeropuerto_mas_cercano",
+    "Tipo_Turismo_Principal",
+    "Actividad principal 1",
+    "Actividad principal 2",
+    "Tipo_entorno_protegido",
+    "Patrimonio_cultural",
+    "Oferta_complementaria",
+
+    # Numéricas continuas
+    "Altitud_Media_msnm",
+    "Distancia_al_mar_km",
+    "Indice_conectividad",
+    "Distancia_aeropuerto_km",
+    "Distancia_estacion_tren_km",
+    "Porcentaje_area_protegida",
+
+    # Binarias 0/1
+    "Actividad_Naturaleza",
+    "Actividad_Historico",
+    "Actividad_Entretenimiento",
+    "Actividad_Montanismo",
+    "Actividad_Deportes_Acuaticos",
+    "Actividad_Gastronomia",
+    "Actividad_Cultural",
+    "Actividad_Ocio",
+    "Actividad_Senderismo",
+    "Actividad_Turismo_rural",
+    "Actividad_Astronomia",
+    "Actividad_Deportes_de_Invierno",
+    "Actividad_Observacion_de_Fauna",
+    "Actividad_Playa",
+    "Actividad_Cicloturismo",
+    "Actividad_Wellness_Termalismo",
+    "Actividad_Compras",
+    "Actividad_Enoturismo",
+    "Actividad_Negocios_MICE",
+    "Actividad_Religioso",
+    "Actividad_Aventura",
+    "Actividad_Turismo_Nautico",
+]
+
+def preparar_datazt_filtros(df_zt: pd.DataFrame) -> pd.DataFrame:
+    """Copia de Data ZT con las categóricas del modelo como texto (la usa "Encuentra tu destino")."""
+    df_zt = df_zt.copy()
+    for col in FEATURES_KNN:
+        if col in df_zt.columns and df_zt[col].dtype == object:
+            df_zt[col] = df_zt[col].astype(str)
+    return df_zt
+
+# dos entradas por generación (Data ZT del "Destino alternativo" y la de filtros de "Encuentra tu destino")
+@medido("entrenar_pipeline", filas=lambda r: len(r[1]), cache=st.cache_resource(show_spinner=False, max_entries=4))
+def entrenar_pipeline(df_zt: pd.DataFrame):
+    # sklearn solo se importa cuando una sección necesita el recomendador
+    OneHotEncoder = importar("sklearn.preprocessing").OneHotEncoder
+    StandardScaler = importar("sklearn.preprocessing").StandardScaler
+    ColumnTransformer = importar("sklearn.compose").ColumnTransformer
+    Pipeline = importar("sklearn.pipeline").Pipeline
+    NearestNeighbors = importar("sklearn.neighbors").NearestNeighbors
+
+    feats = [f for f in FEATURES_KNN if f in df_zt.columns]
+    df_knn = df_zt[feats].copy()
+
+    categorical_cols = df_knn.select_dtypes(include='object').columns.tolist()
+    numerical_cols = [c for c in df_knn.columns if c not in categorical_cols]
+
+    preprocessor = ColumnTransformer(transformers=[
+        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_cols),
+        ('num', StandardScaler(), numerical_cols)
+    ])
+
+    knn_pipeline = Pipeline(steps=[
+        ('preprocessor', preprocessor),
+        ('knn', NearestNeighbors(n_neighbors=10, metric='cosine'))
+    ])
+    knn_pipeline.fit(df_knn)
+    return knn_pipeline, df_knn, feats
+
+
+# =========================
+# AGREGADOS DEL MAPA
+# =========================
+@medido("Agregado mapa", filas=len, cache=st.cache_data(ttl=TTL_CACHE, show_spinner=False, max_entries=256))
+def _agregado_mapa(_df: pd.DataFrame, version: int, año: int | None, mes: int | None, cols: tuple[str, ...]) -> pd.DataFrame:
+    df = _df
+    if año is not None:
+        df = df[df["AÑO"] == año]
+    if mes is not None:
+        df = df[df["MES"] == mes]
+    df = df.copy()
+    if cols:
+        df = _coerce_numeric(df, list(cols))
+        df["viajeros"] = df[list(cols)].sum(axis=1).astype(float)
+    else:
+        df["viajeros"] = 0.0
+    df_grouped = df.groupby(["ZONA_TURISTICA", "lat", "long", "AÑO", "MES"], as_index=False)["viajeros"].sum()
+    return df_grouped[df_grouped["viajeros"] > 0]
+
+def agregado_mapa(snap: VersionDatos, año: int | None, mes: int | None, cols: list[str]) -> pd.DataFrame:
+    """Viajeros por zona y mes para los filtros del mapa (None = todos)."""
+    return _agregado_mapa(snap.df, snap.version, año, mes, tuple(cols))
+
+
+# =========================
+# RANKING (datos históricos)
+# =========================
+@medido("Ranking de zonas", filas=lambda r: len(r.zonas),
+        cache=st.cache_resource(show_spinner=False, max_entries=32))
+def construir_ranking(_df_h: pd.DataFrame, cols_tipo: tuple, version: int, filtros: tuple) -> RankingZonas:
+    """Totales por zona para un estado de filtros; cambiar N, criterio o tipo no los recalcula."""
+    return RankingZonas(_df_h, dict(cols_tipo))
@@ -0,0 +1,154 @@
+# Proyecto RedisTour
+# Exportación masiva (CSV / Parquet) de la selección histórica y de forecasts
+
+import hashlib
+import io
+import json
+import zipfile
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FORMATOS_EXPORTACION = {"csv": "CSV", "parquet": "Parquet"}
+COLS_ID = ["ORIGEN", "ZONA_TURISTICA", "AÑO", "MES"]
+
+
+def parquet_disponible() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def version_datos(rutas: list[Path], etiquetas: list[str] | None = None) -> str:
+    """Huella corta de los ficheros fuente (nombre, tamaño y mtime) para identificar la versión exportada.
+
+    `etiquetas` distingue datos derivados de las mismas fuentes de forma distinta (p. ej. forecasts regenerados).
+    """
+    h = hashlib.sha1()
+    for e in etiquetas or []:
+        h.update(f"[{e}]".encode())
+    for p in rutas:
+        p = Path(p)
+        if p.exists():
+            st_ = p.stat()
+            h.update(f"{p.name}:{st_.st_size}:{st_.st_mtime_ns}".encode())
+        else:
+            h.update(f"{p.name}:missing".encode())
+    return h.hexdigest()[:12]
+
+
+@dataclass
+class FiltroExportacion:
+    """Selección a exportar. `None` significa sin filtro en esa dimensión."""
+    años: tuple[int, int] | None = None
+    meses: list[int] | None = None
+    zonas: list[str] | None = None
+    cols_viajeros: list[str] = field(default_factory=list)
+    incluir_forecast: bool = True
+
+    def mascara(self, df: pd.DataFrame, aplicar_años: bool = True) -> np.ndarray:
+        m = np.ones(len(df), dtype=bool)
+        if aplicar_años and self.años is not None:
+            m &= pd.to_numeric(df["AÑO"], errors="coerce").between(*self.años).to_numpy()
+        if self.meses is not None:
+            m &= pd.to_numeric(df["MES"], errors="coerce").isin(self.meses).to_numpy()
+        if self.zonas is not None:
+            m &= df["ZONA_TURISTICA"].astype(str).isin(self.zonas).to_numpy()
+        return m
+
+
+def _columnas(df_hist: pd.DataFrame, df_fore: pd.DataFrame | None, filtro: FiltroExportacion) -> list[str]:
+    occ_hist = [c for c in df_hist.columns if str(c).startswith("GRADO_OCUPA_")]
+    occ_fore = [c for c in df_fore.columns if str(c).startswith("GRADO_OCUPA_")] \
+        if (df_fore is not None and filtro.incluir_forecast) else []
+    occ = occ_hist + [c for c in occ_fore if c not in occ_hist]
+    return COLS_ID + [c for c in filtro.cols_viajeros if c in df_hist.columns] + occ
+
+
+def iter_bloques(df_hist: pd.DataFrame, df_fore: pd.DataFrame | None, filtro: FiltroExportacion,
+                 filas_por_bloque: int = 50_000):
+    """Recorre histórico y forecasts por bloques de filas con el esquema común de `_columnas`.
+
+    Solo se materializa un bloque cada vez; el filtrado se resuelve con una máscara booleana.
+    """
+    columnas = _columnas(df_hist, df_fore, filtro)
+    fuentes = [("historico", df_hist, True)]
+    if filtro.incluir_forecast and df_fore is not None:
+        # los forecasts cubren años posteriores al histórico: no se les aplica el rango de años
+        fuentes.append(("forecast", df_fore, False))
+
+    for origen, df_src, aplicar_años in fuentes:
+        pos = np.flatnonzero(filtro.mascara(df_src, aplicar_años))
+        for i in range(0, len(pos), filas_por_bloque):
+            bloque = df_src.iloc[pos[i:i + filas_por_bloque]].reindex(columns=columnas)
+            bloque["ORIGEN"] = origen
+            bloque["ZONA_TURISTICA"] = bloque["ZONA_TURISTICA"].astype(str)
+            for c in ["AÑO", "MES"]:
+                bloque[c] = pd.to_numeric(bloque[c], errors="coerce").astype("Int32")
+            for c in columnas[len(COLS_ID):]:
+                bloque[c] = pd.to_numeric(bloque[c], errors="coerce").astype("float64")
+            yield bloque
+
+
+def exportar(destino, df_hist: pd.DataFrame, df_fore: pd.DataFrame | None, filtro: FiltroExportacion,
+             formato: str = "csv", version: str = "", filas_por_bloque: int = 50_000) -> dict:
+    """Escribe en `destino` (ruta o fichero binario) un ZIP con los datos y un `manifest.json`.
+
+    Los bloques se comprimen según se generan: la selección no se materializa en un único DataFrame.
+    Devuelve el manifiesto.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    if formato == "parquet" and not parquet_disponible():
+        raise RuntimeError("La exportación a Parquet requiere pyarrow.")
+
+    columnas = _columnas(df_hist, df_fore, filtro)
+    filas = {"historico": 0, "forecast": 0}
+    nombre = f"datos.{formato}"
+
+    with zipfile.ZipFile(destino, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(nombre, "w", force_zip64=True) as fh:
+            if formato == "csv":
+                fh.write((",".join(columnas) + "\n").encode("utf-8"))
+                for bloque in iter_bloques(df_hist, df_fore, filtro, filas_por_bloque):
+                    filas[bloque["ORIGEN"].iat[0]] += len(bloque)
+                    fh.write(bloque.to_csv(index=False, header=False).encode("utf-8"))
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                schema = pa.schema(
+                    [("ORIGEN", pa.string()), ("ZONA_TURISTICA", pa.string()),
+                     ("AÑO", pa.int32()), ("MES", pa.int32())]
+                    + [(c, pa.float64()) for c in columnas[len(COLS_ID):]]
+                )
+                with pq.ParquetWriter(fh, schema) as writer:
+                    for bloque in iter_bloques(df_hist, df_fore, filtro, filas_por_bloque):
+                        filas[bloque["ORIGEN"].iat[0]] += len(bloque)
+                        writer.write_table(pa.Table.from_pandas(bloque, schema=schema, preserve_index=False))
+
+        manifest = {
+            "version_datos": version,
+            "generado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "formato": formato,
+            "fichero": nombre,
+            "filtros": asdict(filtro),
+            "columnas": columnas,
+            "filas": filas,
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2, default=str))
+    return manifest
+
+
+def exportar_a_bytes(df_hist, df_fore, filtro: FiltroExportacion, formato: str = "csv",
+                     version: str = "") -> bytes:
+    """ZIP de `exportar` en memoria (para `st.download_button`)."""
+    buf = io.BytesIO()
+    exportar(buf, df_hist, df_fore, filtro, formato=formato, version=version)
+    return buf.getvalue()
@@ -0,0 +1,458 @@
+# Proyecto RedisTour
+# Motores de cálculo para la sección "Consultar datos históricos"
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+MESES_CORTO = {
+    1: "Ene", 2: "Feb", 3: "Mar", 4: "Abr", 5: "May", 6: "Jun",
+    7: "Jul", 8: "Ago", 9: "Sep", 10: "Oct", 11: "Nov", 12: "Dic"
+}
+
+
+# =========================
+# ACUMULADOS (YTD / YoY)
+# =========================
+# Ventanas de comparación interanual: clave -> (etiqueta, nº de meses o None si es YTD)
+VENTANAS_COMPARACION = {
+    "YTD": ("Acumulado del año (YTD)", None),
+    "R12": ("Últimos 12 meses", 12),
+    "T3M": ("Últimos 3 meses", 3),
+    "MES": ("Mismo mes del año anterior", 1),
+}
+
+
+@dataclass(frozen=True)
+class Comparacion:
+    """Resultado de una comparación interanual. `aviso` explica por qué no hay variación o por qué es dudosa."""
+    ventana: str
+    periodo_actual: str
+    periodo_anterior: str
+    actual: float | None
+    anterior: float | None
+    variacion: float | None
+    aviso: str | None = None
+
+    @property
+    def texto(self) -> str:
+        return f"{self.variacion:+.1f}%" if self.variacion is not None else "N/D"
+
+
+def _mes_label(año: int, mes: int) -> str:
+    return f"{MESES_CORTO.get(mes, mes)} {año}"
+
+
+def _rango_label(año0: int, mes0: int, año1: int, mes1: int) -> str:
+    if (año0, mes0) == (año1, mes1):
+        return _mes_label(año1, mes1)
+    return f"{_mes_label(año0, mes0)} – {_mes_label(año1, mes1)}"
+
+
+class MotorAcumulados:
+    """Sumas acumuladas por zona y tipo a lo largo del eje mensual.
+
+    Cualquier total de un rango de meses para un subconjunto de zonas se resuelve
+    con dos lecturas del acumulado (fin - inicio), sin volver a filtrar el DataFrame.
+    """
+
+    def __init__(self, df: pd.DataFrame, cols_tipo: list[str]):
+        cols = [c for c in cols_tipo if c in df.columns]
+        base = df[["ZONA_TURISTICA", "AÑO", "MES"] + cols].copy()
+        for c in ["AÑO", "MES"] + cols:
+            base[c] = pd.to_numeric(base[c], errors="coerce")
+        base = base.dropna(subset=["ZONA_TURISTICA", "AÑO", "MES"])
+        base = base[base["MES"].between(1, 12)]
+
+        self.cols = cols
+        self._col_idx = {c: k for k, c in enumerate(cols)}
+        self.zonas = sorted(base["ZONA_TURISTICA"].astype(str).unique().tolist())
+        self._zona_idx = {z: i for i, z in enumerate(self.zonas)}
+
+        if len(base):
+            t_abs = base["AÑO"].astype(int) * 12 + base["MES"].astype(int) - 1
+            self._t0 = int(t_abs.min())
+            n_t = int(t_abs.max()) - self._t0 + 1
+        else:
+            t_abs = pd.Series([], dtype=int)
+            self._t0, n_t = 0, 0
+        self.n_meses = n_t
+
+        vals = np.zeros((len(self.zonas), n_t, len(cols)))
+        obs = np.zeros((len(self.zonas), n_t, len(cols)), dtype=np.int32)
+        if len(base):
+            zi = base["ZONA_TURISTICA"].astype(str).map(self._zona_idx).to_numpy()
+            ti = (t_abs - self._t0).to_numpy()
+            x = base[cols].to_numpy(dtype=float)
+            present = ~np.isnan(x)
+            # np.add.at agrega filas duplicadas (zona, mes) igual que un groupby().sum()
+            np.add.at(vals, (zi, ti), np.where(present, x, 0.0))
+            np.add.at(obs, (zi, ti), present.astype(np.int32))
+
+        # Acumulados con un cero inicial: total[a..b] = cum[b + 1] - cum[a]
+        pad = ((0, 0), (1, 0), (0, 0))
+        self._cum = np.pad(np.cumsum(vals, axis=1), pad)
+        self._cum_obs = np.pad(np.cumsum(obs, axis=1), pad)
+        self._cum_todas = self._cum.sum(axis=0)
+        self._cum_obs_todas = self._cum_obs.sum(axis=0)
+
+    @classmethod
+    def desde_acumulados(cls, zonas: list[str], cols: list[str], t0: int,
+                         cum: np.ndarray, cum_obs: np.ndarray) -> "MotorAcumulados":
+        """Motor sobre acumulados ya calculados (p. ej. arrays de solo lectura mapeados de disco)."""
+        motor = object.__new__(cls)
+        motor.cols = list(cols)
+        motor._col_idx = {c: k for k, c in enumerate(motor.cols)}
+        motor.zonas = list(zonas)
+        motor._zona_idx = {z: i for i, z in enumerate(motor.zonas)}
+        motor._t0 = int(t0)
+        motor.n_meses = cum.shape[1] - 1
+        motor._cum, motor._cum_obs = cum, cum_obs
+        motor._cum_todas = cum.sum(axis=0)
+        motor._cum_obs_todas = cum_obs.sum(axis=0)
+        return motor
+
+    def acumulados(self, zonas: list[str] | None = None) -> tuple[list[str], list[str], int, np.ndarray, np.ndarray]:
+        """Inverso de `desde_acumulados`: (zonas, cols, t0, cum, cum_obs).
+
+        Con `zonas`, las filas siguen ese orden y se omiten las zonas que no están en el motor.
+        """
+        zonas = self.zonas if zonas is None else [z for z in zonas if z in self._zona_idx]
+        filas = [self._zona_idx[z] for z in zonas]
+        return list(zonas), list(self.cols), self._t0, self._cum[filas], self._cum_obs[filas]
+
+    def con_delta(self, delta: pd.DataFrame, delta_obs: pd.DataFrame) -> "MotorAcumulados | None":
+        """Nuevo motor con `delta` (incrementos por ZONA_TURISTICA/AÑO/MES y columna de tipo) aplicado.
+
+        `delta_obs` tiene la misma forma e indica altas (+1) o bajas (-1) de celdas con dato.
+        Solo se recalculan los acumulados desde el primer mes afectado. Devuelve None si el
+        delta introduce zonas nuevas o meses anteriores al inicio (hay que reconstruir).
+        """
+        if not len(delta):
+            return self
+        año = pd.to_numeric(delta["AÑO"], errors="coerce")
+        mes = pd.to_numeric(delta["MES"], errors="coerce")
+        zi = delta["ZONA_TURISTICA"].astype(str).map(self._zona_idx)
+        if zi.isna().any() or año.isna().any() or not mes.between(1, 12).all():
+            return None
+        t_abs = año.astype(int) * 12 + mes.astype(int) - 1
+        if int(t_abs.min()) < self._t0:
+            return None
+        zi = zi.astype(int).to_numpy()
+        ti = (t_abs - self._t0).to_numpy()
+        n_t = max(self.n_meses, int(ti.max()) + 1)
+
+        nuevo = object.__new__(MotorAcumulados)
+        nuevo.__dict__.update(self.__dict__)
+        nuevo.n_meses = n_t
+
+        # valores mensuales a partir del acumulado, ampliados si el delta trae meses nuevos
+        ext = ((0, 0), (0, n_t - self.n_meses), (0, 0))
+        vals = np.pad(np.diff(self._cum, axis=1), ext)
+        obs = np.pad(np.diff(self._cum_obs, axis=1), ext)
+        np.add.at(vals, (zi, ti), np.nan_to_num(delta[self.cols].to_numpy(dtype=float)))
+        np.add.at(obs, (zi, ti), delta_obs[self.cols].to_numpy(dtype=np.int32))
+
+        t_min = int(ti.min())
+        cum = np.pad(self._cum, ext, mode="edge")
+        cum_obs = np.pad(self._cum_obs, ext, mode="edge")
+        cum[:, t_min + 1:] = cum[:, [t_min]] + np.cumsum(vals[:, t_min:], axis=1)
+        cum_obs[:, t_min + 1:] = cum_obs[:, [t_min]] + np.cumsum(obs[:, t_min:], axis=1)
+        nuevo._cum, nuevo._cum_obs = cum, cum_obs
+        nuevo._cum_todas = cum.sum(axis=0)
+        nuevo._cum_obs_todas = cum_obs.sum(axis=0)
+        return nuevo
+
+    # --- índices ---
+    def _t(self, año: int, mes: int) -> int:
+        return int(año) * 12 + int(mes) - 1 - self._t0
+
+    def _año_mes(self, t: int) -> tuple[int, int]:
+        a, m = divmod(t + self._t0, 12)
+        return a, m + 1
+
+    def _sel(self, zonas: list[str] | None, tipos: list[str] | None):
+        kidx = [self._col_idx[c] for c in (tipos or self.cols) if c in self._col_idx]
+        if zonas is None or len(zonas) == len(self.zonas):
+            return None, kidx
+        zidx = [self._zona_idx[str(z)] for z in zonas if str(z) in self._zona_idx]
+        return zidx, kidx
+
+    def _leer(self, cum_todas, cum, zidx, kidx, t_lo: int, t_hi: int) -> float:
+        """Suma del rango de meses [t_lo, t_hi] (índices internos, inclusivos)."""
+        t_lo = max(t_lo, 0)
+        t_hi = min(t_hi, self.n_meses - 1)
+        if t_hi < t_lo or not kidx:
+            return 0.0
+        if zidx is None:
+            fila = cum_todas[[t_lo, t_hi + 1]][:, kidx].sum(axis=1)
+        else:
+            fila = cum[np.ix_(zidx, [t_lo, t_hi + 1], kidx)].sum(axis=(0, 2))
+        return float(fila[1] - fila[0])
+
+    # --- API ---
+    def total(self, zonas, tipos, desde: tuple[int, int], hasta: tuple[int, int]) -> float:
+        """Total de viajeros entre dos (año, mes) inclusive."""
+        zidx, kidx = self._sel(zonas, tipos)
+        if zidx == []:
+            return 0.0
+        return self._leer(self._cum_todas, self._cum, zidx, kidx, self._t(*desde), self._t(*hasta))
+
+    def observaciones(self, zonas, tipos, desde: tuple[int, int], hasta: tuple[int, int]) -> int:
+        """Nº de celdas zona×mes×tipo con dato (no nulo) entre dos (año, mes) inclusive."""
+        zidx, kidx = self._sel(zonas, tipos)
+        if zidx == []:
+            return 0
+        return int(self._leer(self._cum_obs_todas, self._cum_obs, zidx, kidx, self._t(*desde), self._t(*hasta)))
+
+    def ultimo_mes(self, zonas=None, tipos=None, hasta_año: int | None = None) -> tuple[int, int] | None:
+        """Último (año, mes) con algún dato para la selección, opcionalmente limitado a un año máximo."""
+        zidx, kidx = self._sel(zonas, tipos)
+        if zidx == [] or not kidx or not self.n_meses:
+            return None
+        if zidx is None:
+            cum = self._cum_obs_todas[:, kidx].sum(axis=1)
+        else:
+            cum = self._cum_obs[zidx][:, :, kidx].sum(axis=(0, 2))
+        t_max = self.n_meses - 1
+        if hasta_año is not None:
+            t_max = min(t_max, self._t(hasta_año, 12))
+        if t_max < 0:
+            return None
+        # último t con incremento del acumulado de observaciones
+        hay = np.flatnonzero(np.diff(cum[: t_max + 2]) > 0)
+        return self._año_mes(int(hay[-1])) if len(hay) else None
+
+    def comparar(self, ventana: str, zonas=None, tipos=None,
+                 referencia: tuple[int, int] | None = None, hasta_año: int | None = None) -> Comparacion:
+        """Compara la ventana que termina en `referencia` con la misma ventana un año antes.
+
+        Si no se indica `referencia` se usa el último mes con datos de la selección.
+        Los casos ambiguos (sin histórico, cobertura desigual, base cero) se devuelven en `aviso`.
+        """
+        if ventana not in VENTANAS_COMPARACION:
+            raise ValueError(f"Ventana desconocida: {ventana}")
+        etiqueta, n = VENTANAS_COMPARACION[ventana]
+
+        if referencia is None:
+            referencia = self.ultimo_mes(zonas, tipos, hasta_año)
+        if referencia is None:
+            return Comparacion(etiqueta, "—", "—", None, None, None, "Sin datos para la selección.")
+
+        año_ref, mes_ref = referencia
+        if n is None:
+            ini = (año_ref, 1)
+        else:
+            ini = self._año_mes(self._t(año_ref, mes_ref) - n + 1)
+        ini_ant, fin_ant = (ini[0] - 1, ini[1]), (año_ref - 1, mes_ref)
+
+        per_act = _rango_label(*ini, año_ref, mes_ref)
+        per_ant = _rango_label(*ini_ant, *fin_ant)
+
+        actual = self.total(zonas, tipos, ini, referencia)
+        if self._t(*ini_ant) < 0:
+            return Comparacion(etiqueta, per_act, per_ant, actual, None, None,
+                               f"No hay histórico completo para {per_ant}.")
+
+        anterior = self.total(zonas, tipos, ini_ant, fin_ant)
+        obs_act = self.observaciones(zonas, tipos, ini, referencia)
+        obs_ant = self.observaciones(zonas, tipos, ini_ant, fin_ant)
+
+        if obs_ant == 0:
+            return Comparacion(etiqueta, per_act, per_ant, actual, None, None,
+                               f"No hay datos para {per_ant}.")
+        if anterior <= 0:
+            return Comparacion(etiqueta, per_act, per_ant, actual, anterior, None,
+                               f"{per_ant} suma 0 viajeros; la variación no está definida.")
+
+        variacion = (actual / anterior - 1) * 100
+        aviso = None
+        if obs_act != obs_ant:
+            aviso = (f"Cobertura desigual: {obs_act} registros zona-mes-tipo en {per_act} "
+                     f"frente a {obs_ant} en {per_ant}.")
+        return Comparacion(etiqueta, per_act, per_ant, actual, anterior, variacion, aviso)
+
+
+# =========================
+# RANKING DE ZONAS (Top N)
+# =========================
+# criterio -> (etiqueta, formato para tooltip/tabla)
+CRITERIOS_RANKING = {
+    "volumen": ("Volumen de viajeros", ",.0f"),
+    "crecimiento": ("Crecimiento interanual (%)", "+.1f"),
+    "estacionalidad": ("Concentración estacional (% en los 3 meses punta)", ".1f"),
+}
+
+
+class RankingZonas:
+    """Totales por zona, año, mes y tipo calculados una vez por estado de filtros.
+
+    A partir de ese cubo se puntúa cualquier criterio y se extrae el Top N con
+    `np.argpartition`, sin volver a agrupar ni ordenar todas las zonas.
+    """
+
+    def __init__(self, df_h: pd.DataFrame, cols_tipo: dict[str, str]):
+        self.tipos = {t: c for t, c in cols_tipo.items() if c in df_h.columns}
+        cols = list(self.tipos.values())
+        self._col_idx = {c: k for k, c in enumerate(cols)}
+
+        base = df_h[["ZONA_TURISTICA", "AÑO", "MES"] + cols].dropna(subset=["ZONA_TURISTICA", "AÑO", "MES"])
+        base = base[pd.to_numeric(base["MES"], errors="coerce").between(1, 12)]
+        zi, zonas = pd.factorize(base["ZONA_TURISTICA"].astype(str), sort=True)
+        ai, años = pd.factorize(base["AÑO"].astype(int), sort=True)
+        mi = base["MES"].astype(int).to_numpy() - 1
+
+        self.zonas = np.asarray(zonas, dtype=object)
+        self.años = [int(a) for a in años]
+        x = base[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+        cubo = np.zeros((len(self.zonas), len(self.años), 12, len(cols)))
+        np.add.at(cubo, (zi, ai, mi), np.nan_to_num(x, nan=0.0))
+        self._cubo = cubo
+        # meses con algún dato en cada año y tipo (para comparar el último año parcial con el mismo tramo
+        # del anterior): (año, mes, tipo)
+        self._meses_con_dato = cubo.sum(axis=0) > 0
+
+    def _k(self, tipo: str | None) -> list[int]:
+        if tipo is None:
+            return list(range(len(self._col_idx)))
+        return [self._col_idx[self.tipos[tipo]]]
+
+    def volumen(self, tipo: str | None = None) -> np.ndarray:
+        return self._cubo[..., self._k(tipo)].sum(axis=(1, 2, 3))
+
+    def puntuaciones(self, criterio: str = "volumen", tipo: str | None = None) -> np.ndarray:
+        """Puntuación por zona (alineada con `self.zonas`); NaN si el criterio no es calculable."""
+        if criterio not in CRITERIOS_RANKING:
+            raise ValueError(f"Criterio de ranking desconocido: {criterio}")
+        sub = self._cubo[..., self._k(tipo)].sum(axis=3)  # (Z, Y, 12)
+
+        if criterio == "volumen":
+            return sub.sum(axis=(1, 2))
+
+        if criterio == "crecimiento":
+            if len(self.años) < 2:
+                return np.full(len(self.zonas), np.nan)
+            meses = self._meses_con_dato[-1][:, self._k(tipo)].any(axis=1)
+            ult = sub[:, -1, meses].sum(axis=1)
+            ant = sub[:, -2, meses].sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(ant > 0, (ult / ant - 1) * 100, np.nan)
+
+        perfil = sub.sum(axis=1)  # (Z, 12)
+        total = perfil.sum(axis=1)
+        # tres meses punta sin ordenar los doce
+        punta = np.partition(perfil, 9, axis=1)[:, 9:].sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(total > 0, punta / total * 100, np.nan)
+
+    def _orden(self, scores: np.ndarray, n: int | None) -> np.ndarray:
+        validos = np.flatnonzero(np.isfinite(scores))
+        if n is not None and n <= 0:
+            return validos[:0]
+        if n is not None and n < len(validos):
+            # n-ésima mayor puntuación sin ordenar todas; se conservan todos los empatados con ella
+            # para que el corte lo decida el nombre de zona y no la posición en el array
+            s = scores[validos]
+            corte = -np.partition(-s, n - 1)[n - 1]
+            validos = validos[s >= corte]
+        # orden estable: puntuación descendente y, a igualdad, nombre de zona
+        orden = validos[np.lexsort((self.zonas[validos], -scores[validos]))]
+        return orden if n is None else orden[:n]
+
+    def top(self, n: int | None = 10, criterio: str = "volumen", tipo: str | None = None) -> pd.DataFrame:
+        """Top N zonas (todas si n es None) con columnas ZONA_TURISTICA, VIAJEROS_SEL, PUNTUACION y POSICION."""
+        scores = self.puntuaciones(criterio, tipo)
+        idx = self._orden(scores, n)
+        return pd.DataFrame({
+            "POSICION": np.arange(1, len(idx) + 1),
+            "ZONA_TURISTICA": self.zonas[idx],
+            "VIAJEROS_SEL": self.volumen(tipo)[idx],
+            "PUNTUACION": scores[idx],
+        })
+
+    def iter_csv(self, criterio: str = "volumen", tipo: str | None = None, filas_por_bloque: int = 5000):
+        """Ranking completo en CSV (UTF-8), por bloques: cada bloque se construye solo a partir de su tramo del orden."""
+        scores = self.puntuaciones(criterio, tipo)
+        idx = self._orden(scores, None)
+        volumen = self.volumen(tipo)
+        for i in range(0, max(len(idx), 1), filas_por_bloque):
+            tramo = idx[i:i + filas_por_bloque]
+            bloque = pd.DataFrame({
+                "POSICION": np.arange(i + 1, i + len(tramo) + 1),
+                "ZONA_TURISTICA": self.zonas[tramo],
+                "VIAJEROS_SEL": volumen[tramo],
+                "PUNTUACION": scores[tramo],
+            })
+            yield bloque.to_csv(index=False, header=(i == 0)).encode("utf-8")
+
+    def csv(self, criterio: str = "volumen", tipo: str | None = None) -> bytes:
+        """Ranking completo en CSV (UTF-8) para `st.download_button`."""
+        return b"".join(self.iter_csv(criterio, tipo))
+
+
+# =========================
+# SUBMUESTREO DE SERIES (LTTB)
+# =========================
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: índices de los `n_out` puntos que mejor conservan la forma de la serie.
+
+    `x` debe venir ordenado. Se conservan siempre el primer y el último punto.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # n - 2 puntos interiores repartidos en n_out - 2 cubos
+    bordes = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = bordes[i], bordes[i + 1]
+        # media del cubo siguiente (o el último punto si es el final)
+        if i + 2 < len(bordes):
+            nlo, nhi = bordes[i + 1], bordes[i + 2]
+            cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def presupuesto_puntos(n_series: int, ancho_px: int = 1200, px_por_punto: int = 4,
+                       max_total: int = 4000, min_por_serie: int = 12) -> int:
+    """Puntos por serie para que el gráfico completo no supere ni la resolución horizontal ni `max_total`."""
+    n_series = max(1, n_series)
+    por_ancho = ancho_px // px_por_punto
+    por_total = max_total // n_series
+    return max(min_por_serie, min(por_ancho, por_total))
+
+
+def submuestrear_series(df: pd.DataFrame, x_col: str, y_col: str, serie_col: str, n_por_serie: int) -> pd.DataFrame:
+    """Aplica LTTB a cada serie de `df` (agrupada por `serie_col`) antes de enviarla al navegador."""
+    if not len(df):
+        return df
+    partes = []
+    for _, sub in df.groupby(serie_col, sort=False):
+        sub = sub.sort_values(x_col)
+        if len(sub) <= n_por_serie:
+            partes.append(sub)
+            continue
+        xv = sub[x_col]
+        if pd.api.types.is_datetime64_any_dtype(xv):
+            xn = xv.astype("int64").to_numpy(dtype=float)
+        elif pd.api.types.is_numeric_dtype(xv):
+            xn = xv.to_numpy(dtype=float)
+        else:
+            # etiquetas ordenables (p. ej. trimestres "2024Q1"): se usa la posición
+            xn = np.arange(len(sub), dtype=float)
+        idx = lttb_indices(xn, sub[y_col].fillna(0).to_numpy(dtype=float), n_por_serie)
+        partes.append(sub.iloc[idx])
+    return pd.concat(partes, ignore_index=True)
@@ -0,0 +1,220 @@
+# Proyecto RedisTour
+# Ingesta de las descargas en bruto de Dataestur (EOH, EOTR, EOAP, EOAC) en un almacén
+# local en Parquet particionado por año, con un manifiesto de versión.
+#
+# Uso: python ingesta.py CARPETA_CSV [--destino Data_Dataestur/almacen] [--filas-por-bloque 200000]
+#
+# Cada encuesta se lee por bloques y se agrega por (zona, año, mes) sobre la marcha, así que
+# la memoria depende del nº de zonas x meses y no del tamaño de las descargas.
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from datos import CLAVE_FILA, DATA_DIR, _normalize_zone_colnames, _sin_acentos
+from exportacion import parquet_disponible, version_datos
+
+log = logging.getLogger("redistour.ingesta")
+
+ALMACEN_DIR = DATA_DIR / "almacen"
+MANIFIESTO = "manifest.json"
+
+# encuesta -> columna de ocupación con la que aparece en la hoja "Total"
+ENCUESTAS = {
+    "EOH": "GRADO_OCUPA_PLAZAS_EOH",
+    "EOTR": "GRADO_OCUPA_PLAZAS_EOTR",
+    "EOAP": "GRADO_OCUPA_PLAZAS_EOAP",
+    "EOAC": "GRADO_OCUPA_PARCELAS_EOAC",
+}
+
+
+def _nombre_columna(c) -> str:
+    return _sin_acentos(str(c)).strip().replace(" ", "_").upper()
+
+
+def _ficheros_encuesta(carpeta: Path, encuesta: str) -> list[Path]:
+    """CSV de la carpeta cuyo nombre contiene el código de la encuesta (p. ej. `eoh_2015_2024.csv`)."""
+    return sorted(p for p in carpeta.glob("*.csv") if encuesta in re.split(r"[^A-Z]+", p.stem.upper()))
+
+
+def _formato_csv(ruta: Path) -> dict:
+    """Separador, decimal y codificación de una descarga (Dataestur exporta con `;` y coma decimal)."""
+    crudo = ruta.open("rb").readline()
+    try:
+        cabecera, encoding = crudo.decode("utf-8-sig"), "utf-8-sig"
+    except UnicodeDecodeError:
+        cabecera, encoding = crudo.decode("latin-1"), "latin-1"
+    if cabecera.count(";") > cabecera.count(","):
+        return {"sep": ";", "decimal": ",", "encoding": encoding}
+    return {"sep": ",", "decimal": ".", "encoding": encoding}
+
+
+def _agregar_bloque(bloque: pd.DataFrame, encuesta: str) -> pd.DataFrame | None:
+    """Normaliza columnas y zona y reduce el bloque a sumas por (zona, año, mes).
+
+    Viajeros se suma; la ocupación se guarda como suma y nº de valores para promediar al final.
+    """
+    bloque = _normalize_zone_colnames(bloque)
+    bloque.columns = [c if c == "ZONA_TURISTICA" else _nombre_columna(c) for c in bloque.columns]
+    if not set(CLAVE_FILA + ["VIAJEROS"]) <= set(bloque.columns):
+        return None
+    ocupa = next((c for c in bloque.columns if c.startswith("GRADO_OCUPA_")), None)
+
+    out = pd.DataFrame({
+        "ZONA_TURISTICA": bloque["ZONA_TURISTICA"],
+        "AÑO": pd.to_numeric(bloque["AÑO"], errors="coerce"),
+        "MES": pd.to_numeric(bloque["MES"], errors="coerce"),
+        f"VIAJEROS_{encuesta}": pd.to_numeric(bloque["VIAJEROS"], errors="coerce"),
+    })
+    if ocupa is not None:
+        occ = pd.to_numeric(bloque[ocupa], errors="coerce")
+        out["_ocupa_suma"] = occ
+        out["_ocupa_n"] = occ.notna().astype(int)
+    out = out.dropna(subset=["AÑO", "MES"])
+    out = out[out["MES"].between(1, 12) & ~out["ZONA_TURISTICA"].isin(["", "nan"])]
+    return out.groupby(CLAVE_FILA, as_index=False).sum(min_count=1)
+
+
+def leer_encuesta(rutas: list[Path], encuesta: str, filas_por_bloque: int = 200_000) -> tuple[pd.DataFrame, int]:
+    """Agrega todas las descargas de una encuesta. Devuelve (frame por zona/año/mes, filas leídas)."""
+    parciales, leidas = [], 0
+    for ruta in rutas:
+        fmt = _formato_csv(ruta)
+        for bloque in pd.read_csv(ruta, chunksize=filas_por_bloque, **fmt):
+            leidas += len(bloque)
+            agg = _agregar_bloque(bloque, encuesta)
+            if agg is None:
+                raise ValueError(f"{ruta.name}: faltan columnas {CLAVE_FILA + ['VIAJEROS']}")
+            parciales.append(agg)
+    if not parciales:
+        return pd.DataFrame(columns=CLAVE_FILA), leidas
+
+    # un mismo mes puede venir repartido entre bloques o ficheros: se vuelve a agregar
+    df = pd.concat(parciales, ignore_index=True).groupby(CLAVE_FILA, as_index=False).sum(min_count=1)
+    if "_ocupa_suma" in df.columns:
+        df[ENCUESTAS[encuesta]] = df["_ocupa_suma"] / df["_ocupa_n"].where(df["_ocupa_n"] > 0)
+        df = df.drop(columns=["_ocupa_suma", "_ocupa_n"])
+    return df, leidas
+
+
+def _escribir_json(ruta: Path, datos: dict):
+    tmp = ruta.with_suffix(".tmp")
+    tmp.write_text(json.dumps(datos, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, ruta)
+
+
+def ingerir(carpeta: Path, destino: Path = ALMACEN_DIR, filas_por_bloque: int = 200_000) -> dict:
+    """Construye una versión nueva del almacén a partir de las descargas de `carpeta`.
+
+    Si la versión (huella de los CSV de origen) ya existe no se reescribe nada. La versión
+    vigente solo cambia al reemplazar el manifiesto, una vez escritas todas las particiones.
+    Devuelve el manifiesto.
+    """
+    if not parquet_disponible():
+        raise RuntimeError("La ingesta requiere pyarrow.")
+    carpeta, destino = Path(carpeta), Path(destino)
+    fuentes = {e: _ficheros_encuesta(carpeta, e) for e in ENCUESTAS}
+    if not any(fuentes.values()):
+        raise ValueError(f"No hay CSV de {', '.join(ENCUESTAS)} en {carpeta}")
+
+    version = version_datos([p for rutas in fuentes.values() for p in rutas])
+    actual = leer_manifiesto(destino)
+    if actual is not None and actual["version"] == version:
+        log.info("ingesta: la versión %s ya está publicada", version)
+        return actual
+
+    total, filas_leidas = None, {}
+    for encuesta, rutas in fuentes.items():
+        if not rutas:
+            log.warning("ingesta: sin descargas de %s", encuesta)
+            continue
+        df_e, filas_leidas[encuesta] = leer_encuesta(rutas, encuesta, filas_por_bloque)
+        log.info("ingesta %-5s %d ficheros, %d filas -> %d zona/mes", encuesta, len(rutas),
+                 filas_leidas[encuesta], len(df_e))
+        total = df_e if total is None else total.merge(df_e, on=CLAVE_FILA, how="outer")
+
+    # mismas columnas que la hoja "Total", aunque falte alguna encuesta
+    columnas = CLAVE_FILA + [f"VIAJEROS_{e}" for e in ENCUESTAS] + list(ENCUESTAS.values())
+    total = total.reindex(columns=columnas)
+    total["AÑO"] = total["AÑO"].astype(int)
+    total["MES"] = total["MES"].astype(int)
+    total = total.sort_values(CLAVE_FILA, ignore_index=True)
+
+    dir_version = destino / f"v_{version}"
+    tmp = destino / f".v_{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    particiones = {}
+    for año, parte in total.groupby("AÑO"):
+        ruta = tmp / f"AÑO={año}" / "part-0.parquet"
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        parte.to_parquet(ruta, index=False)
+        particiones[str(año)] = {"fichero": str(ruta.relative_to(tmp)), "filas": len(parte)}
+    shutil.rmtree(dir_version, ignore_errors=True)
+    os.replace(tmp, dir_version)
+
+    manifest = {
+        "version": version,
+        "generado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "directorio": dir_version.name,
+        "fuentes": {e: [p.name for p in rutas] for e, rutas in fuentes.items()},
+        "filas_leidas": filas_leidas,
+        "columnas": columnas,
+        "zonas": int(total["ZONA_TURISTICA"].nunique()),
+        "particiones": particiones,
+    }
+    _escribir_json(destino / MANIFIESTO, manifest)
+    # se conserva la versión anterior por si algún proceso leyó el manifiesto viejo justo antes
+    conservar = {dir_version.name} | ({actual["directorio"]} if actual is not None else set())
+    for viejo in destino.glob("v_*"):
+        if viejo.name not in conservar:
+            shutil.rmtree(viejo, ignore_errors=True)
+    log.info("ingesta: publicada versión %s (%d filas, %d años)", version, len(total), len(particiones))
+    return manifest
+
+
+def leer_manifiesto(destino: Path = ALMACEN_DIR) -> dict | None:
+    ruta = Path(destino) / MANIFIESTO
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+def leer_almacen(destino: Path = ALMACEN_DIR, años: list[int] | None = None,
+                 columnas: list[str] | None = None) -> pd.DataFrame:
+    """Hoja "Total" desde el almacén, leyendo solo las particiones de `años` y las `columnas` pedidas."""
+    destino = Path(destino)
+    manifest = leer_manifiesto(destino)
+    if manifest is None:
+        raise ValueError(f"No hay almacén en {destino}.")
+    cols = None if columnas is None else list(dict.fromkeys(CLAVE_FILA + list(columnas)))
+    partes = []
+    for año, info in sorted(manifest["particiones"].items()):
+        if años is not None and int(año) not in años:
+            continue
+        parte = pd.read_parquet(destino / manifest["directorio"] / info["fichero"], columns=cols)
+        partes.append(parte)
+    if not partes:
+        return pd.DataFrame(columns=cols or manifest["columnas"])
+    return pd.concat(partes, ignore_index=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingesta de descargas Dataestur en el almacén Parquet.")
+    ap.add_argument("carpeta", type=Path, help="carpeta con los CSV de EOH, EOTR, EOAP y EOAC")
+    ap.add_argument("--destino", type=Path, default=ALMACEN_DIR)
+    ap.add_argument("--filas-por-bloque", type=int, default=200_000)
+    args = ap.parse_args()
+    manifest = ingerir(args.carpeta, args.destino, args.filas_por_bloque)
+    print(json.dumps({k: manifest[k] for k in ["version", "directorio", "filas_leidas", "zonas"]},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# Proyecto RedisTour
+# Tiempos de arranque (imports perezosos y primer pintado de cada sección) y perfil de
+# las rutas calientes: tiempo, filas y acierto/fallo de caché por función instrumentada.
+
+import functools
+import importlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import metricas
+
+log = logging.getLogger("redistour")
+if not log.handlers:
+    _h = logging.StreamHandler()
+    _h.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log.addHandler(_h)
+    log.setLevel(logging.INFO)
+
+_lock = threading.Lock()
+# modulo -> segundos que tardó su primer import en este proceso
+TIEMPOS_IMPORT: dict[str, float] = {}
+# seccion -> {"primer_pintado_s", "ultimo_s", "ejecuciones"}
+TIEMPOS_SECCION: dict[str, dict] = {}
+
+# Perfil: con REDISTOUR_PERFIL=1 se perfilan todas las ejecuciones del script; si no,
+# solo las de las sesiones que abren el panel (?tiempos=1, si REDISTOUR_PANEL_TIEMPOS=1). Cada ejecución perfilada
+# añade sus mediciones como una línea JSON a LOG_PERFIL.
+PERFIL_GLOBAL = os.environ.get("REDISTOUR_PERFIL", "0") == "1"
+LOG_PERFIL = Path(os.environ.get("REDISTOUR_PERFIL_LOG", Path(__file__).resolve().parent / "perfil.jsonl"))
+# nombre -> {"llamadas", "total_ms", "max_ms", "filas", "aciertos", "fallos"} (acumulado del proceso)
+PERFIL_AGREGADO: dict[str, dict] = {}
+# estado de la ejecución en curso: cada sesión ejecuta el script en su propio hilo
+_local = threading.local()
+
+
+def importar(modulo: str):
+    """`importlib.import_module` que registra cuánto costó la primera importación del módulo."""
+    if modulo in sys.modules:
+        return sys.modules[modulo]
+    t0 = time.perf_counter()
+    mod = importlib.import_module(modulo)
+    dt = time.perf_counter() - t0
+    with _lock:
+        TIEMPOS_IMPORT.setdefault(modulo, dt)
+    log.info("import %s: %.1f ms", modulo, dt * 1000)
+    return mod
+
+
+def registrar_seccion(seccion: str, t_inicio: float):
+    """Anota el tiempo desde el inicio del script hasta terminar de pintar `seccion`.
+
+    La primera ejecución de cada sección en el proceso queda como "primer pintado" (incluye
+    imports y cargas en frío); las siguientes actualizan el último valor.
+    """
+    dt = time.perf_counter() - t_inicio
+    with _lock:
+        reg = TIEMPOS_SECCION.get(seccion)
+        if reg is None:
+            TIEMPOS_SECCION[seccion] = {"primer_pintado_s": dt, "ultimo_s": dt, "ejecuciones": 1}
+            log.info("primer pintado de '%s': %.1f ms", seccion, dt * 1000)
+        else:
+            reg["ultimo_s"] = dt
+            reg["ejecuciones"] += 1
+
+
+def informe_tiempos() -> dict:
+    """Copia de los tiempos registrados, en milisegundos."""
+    with _lock:
+        return {
+            "imports_ms": {m: round(t * 1000, 1) for m, t in TIEMPOS_IMPORT.items()},
+            "secciones_ms": {
+                s: {"primer_pintado": round(r["primer_pintado_s"] * 1000, 1),
+                    "ultimo": round(r["ultimo_s"] * 1000, 1),
+                    "ejecuciones": r["ejecuciones"]}
+                for s, r in TIEMPOS_SECCION.items()
+            },
+        }
+
+
+# =========================
+# PERFIL DE RUTAS CALIENTES
+# =========================
+def iniciar_perfil(activo: bool):
+    """Abre el perfil de una ejecución del script (se llama al principio del script)."""
+    _local.activo = activo or PERFIL_GLOBAL
+    _local.eventos = []
+    _local.nivel = 0
+
+
+def perfil_activo() -> bool:
+    return getattr(_local, "activo", False)
+
+
+def _registrar(nombre: str, ms: float, filas: int | None, cache: str | None, nivel: int):
+    _local.eventos.append({"nombre": nombre, "ms": round(ms, 2), "filas": filas, "cache": cache, "nivel": nivel})
+    with _lock:
+        agg = PERFIL_AGREGADO.setdefault(
+            nombre, {"llamadas": 0, "total_ms": 0.0, "max_ms": 0.0, "filas": 0, "aciertos": 0, "fallos": 0})
+        agg["llamadas"] += 1
+        agg["total_ms"] += ms
+        agg["max_ms"] = max(agg["max_ms"], ms)
+        agg["filas"] += filas or 0
+        if cache == "acierto":
+            agg["aciertos"] += 1
+        elif cache == "fallo":
+            agg["fallos"] += 1
+
+
+@contextmanager
+def medir(nombre: str, filas: int | None = None):
+    """Mide un bloque. Devuelve un dict en el que el bloque puede anotar `filas` al terminar.
+
+    Sin perfil activo solo cuesta la comprobación del flag.
+    """
+    if not perfil_activo():
+        yield {}
+        return
+    anot = {"filas": filas}
+    _local.nivel += 1
+    t0 = time.perf_counter()
+    try:
+        yield anot
+    finally:
+        _local.nivel -= 1
+        _registrar(nombre, (time.perf_counter() - t0) * 1000, anot["filas"], None, _local.nivel)
+
+
+def medido(nombre: str, filas=None, cache=None):
+    """Decorador que mide cada llamada de la función.
+
+    `filas`: función resultado -> nº de filas procesadas. `cache`: decorador de Streamlit
+    (`st.cache_data(...)`/`st.cache_resource(...)`) que se aplica por debajo de la medición;
+    el cuerpo solo se ejecuta en un fallo, así que se distingue acierto de fallo de caché.
+    Los aciertos/fallos y la duración de los cálculos van siempre a `metricas`; el resto
+    solo con el perfil activo.
+    """
+    def deco(fn):
+        llamar = fn
+        if cache is not None:
+            @functools.wraps(fn)
+            def cuerpo(*args, **kwargs):
+                _local.fallo = True
+                t0 = time.perf_counter()
+                out = fn(*args, **kwargs)
+                metricas.observar("redistour_carga_segundos", time.perf_counter() - t0, funcion=nombre)
+                metricas.incrementar("redistour_cache_fallos_total", funcion=nombre)
+                metricas.fijar("redistour_cache_entrada_bytes", metricas.tamaño_bytes(out), funcion=nombre)
+                return out
+            llamar = cache(cuerpo)
+
+        @functools.wraps(fn)
+        def envoltura(*args, **kwargs):
+            activo = perfil_activo()
+            if not activo and cache is None:
+                return llamar(*args, **kwargs)
+            # una función cacheada puede llamar a otra: se guarda el flag de la de fuera
+            fallo_previo = getattr(_local, "fallo", False)
+            _local.fallo = False
+            if activo:
+                _local.nivel += 1
+            t0 = time.perf_counter()
+            try:
+                out = llamar(*args, **kwargs)
+            finally:
+                if activo:
+                    _local.nivel -= 1
+            ms = (time.perf_counter() - t0) * 1000
+            fallo, _local.fallo = _local.fallo, fallo_previo
+            if cache is not None and not fallo:
+                metricas.incrementar("redistour_cache_aciertos_total", funcion=nombre)
+            if not activo:
+                return out
+            estado = None if cache is None else ("fallo" if fallo else "acierto")
+            try:
+                n = filas(out) if filas is not None else None
+            except Exception:
+                n = None
+            _registrar(nombre, ms, n, estado, _local.nivel)
+            return out
+
+        if cache is not None:
+            envoltura.clear = llamar.clear
+        return envoltura
+    return deco
+
+
+def eventos_perfil() -> list[dict]:
+    """Mediciones de la ejecución en curso, en orden de finalización."""
+    return list(getattr(_local, "eventos", []))
+
+
+def cerrar_perfil(seccion: str, t_inicio: float):
+    """Anota la sección completa y añade la ejecución al log de perfil (si está activo)."""
+    if not perfil_activo():
+        return
+    _registrar(f"Sección: {seccion}", (time.perf_counter() - t_inicio) * 1000, None, None, 0)
+    linea = json.dumps({
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "seccion": seccion,
+        "eventos": _local.eventos,
+    }, ensure_ascii=False)
+    try:
+        with _lock, LOG_PERFIL.open("a", encoding="utf-8") as fh:
+            fh.write(linea + "\n")
+    except OSError as e:
+        log.warning("no se pudo escribir el log de perfil: %s", e)
+
+
+def informe_perfil() -> list[dict]:
+    """Agregado del proceso por función, ordenado por tiempo total."""
+    with _lock:
+        filas = [{"nombre": n, **a, "total_ms": round(a["total_ms"], 1), "max_ms": round(a["max_ms"], 1),
+                  "media_ms": round(a["total_ms"] / a["llamadas"], 2)}
+                 for n, a in PERFIL_AGREGADO.items()]
+    return sorted(filas, key=lambda r: -r["total_ms"])
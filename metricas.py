@@ -0,0 +1,203 @@
+# Proyecto RedisTour
+# Métricas de operación (contadores, histogramas y medidores) en el formato de texto de
+# Prometheus. Se acumulan en memoria del proceso; un hilo aparte las vuelca cada
+# INTERVALO_METRICAS segundos a un fichero para el textfile collector de node_exporter
+# (REDISTOUR_METRICAS_FICHERO) y/o las sirve en http://127.0.0.1:<puerto>/metrics
+# (REDISTOUR_METRICAS_PUERTO). En la ejecución del script solo se suman números.
+
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+log = logging.getLogger("redistour.metricas")
+
+INTERVALO_METRICAS = 15
+BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# nombre -> (tipo, ayuda)
+METRICAS = {
+    "redistour_consulta_recomendacion_segundos": (
+        "histogram", "Duración de la ejecución del script que resuelve una búsqueda del recomendador."),
+    "redistour_mapa_segundos": (
+        "histogram", "Duración de la ejecución del script que reconstruye el mapa de saturación."),
+    "redistour_carga_segundos": (
+        "histogram", "Duración de los loaders y cálculos cacheados cuando se ejecutan (fallo de caché)."),
+    "redistour_cache_aciertos_total": ("counter", "Llamadas a funciones cacheadas servidas desde la caché."),
+    "redistour_cache_fallos_total": ("counter", "Llamadas a funciones cacheadas que tuvieron que calcular."),
+    "redistour_cache_entrada_bytes": (
+        "gauge", "Tamaño estimado de la última entrada calculada de cada función cacheada."),
+    "redistour_datos_bytes": ("gauge", "Tamaño de los frames de la versión de datos en memoria."),
+    "redistour_consultas_cache_bytes": ("gauge", "Memoria ocupada y límite de la caché de resultados de búsquedas."),
+    "redistour_sesiones_activas": ("gauge", "Sesiones de Streamlit abiertas en el proceso."),
+}
+
+_lock = threading.Lock()
+# (nombre, etiquetas) -> valor | [cuentas por bucket..., suma, nº]
+_valores: dict[tuple[str, tuple], float | list] = {}
+# medidores calculados al exportar: nombre -> fn() -> [(etiquetas, valor)]
+_medidores: dict[str, callable] = {}
+
+
+def _clave(nombre: str, etiquetas: dict) -> tuple[str, tuple]:
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+def incrementar(nombre: str, valor: float = 1, **etiquetas):
+    k = _clave(nombre, etiquetas)
+    with _lock:
+        _valores[k] = _valores.get(k, 0) + valor
+
+
+def fijar(nombre: str, valor: float, **etiquetas):
+    with _lock:
+        _valores[_clave(nombre, etiquetas)] = valor
+
+
+def observar(nombre: str, segundos: float, **etiquetas):
+    k = _clave(nombre, etiquetas)
+    i = int(np.searchsorted(BUCKETS_S, segundos))
+    with _lock:
+        h = _valores.get(k)
+        if h is None:
+            h = _valores[k] = [0] * (len(BUCKETS_S) + 1) + [0.0, 0]
+        h[i] += 1
+        h[-2] += segundos
+        h[-1] += 1
+
+
+@contextmanager
+def cronometro(nombre: str, **etiquetas):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, time.perf_counter() - t0, **etiquetas)
+
+
+def registrar_medidor(nombre: str, fn):
+    """`fn()` devuelve [(etiquetas, valor)]; se evalúa en el hilo de exportación, no en las sesiones."""
+    _medidores[nombre] = fn
+
+
+def tamaño_bytes(obj, _nivel: int = 0) -> int:
+    """Estimación del tamaño en memoria de un resultado cacheado (frames, arrays y contenedores)."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if _nivel < 3 and isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(tamaño_bytes(x, _nivel + 1) for x in obj)
+    if _nivel < 3 and isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(tamaño_bytes(v, _nivel + 1) for v in obj.values())
+    return sys.getsizeof(obj)
+
+
+def _sesiones_activas():
+    # el gestor de sesiones no es API pública: si cambia, la métrica simplemente no se publica
+    from streamlit import runtime
+    if not runtime.exists():
+        return []
+    return [({}, len(runtime.get_instance()._session_mgr.list_active_sessions()))]
+
+
+registrar_medidor("redistour_sesiones_activas", _sesiones_activas)
+
+
+def _etiquetas(items) -> str:
+    if not items:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+def exposicion() -> str:
+    """Todas las métricas en el formato de texto de Prometheus."""
+    muestras = {}
+    with _lock:
+        for (nombre, etq), v in _valores.items():
+            muestras.setdefault(nombre, []).append((etq, list(v) if isinstance(v, list) else v))
+    for nombre, fn in list(_medidores.items()):
+        try:
+            muestras[nombre] = [(tuple(sorted(e.items())), v) for e, v in fn()]
+        except Exception as e:
+            log.debug("medidor %s no disponible: %s", nombre, e)
+
+    lineas = []
+    for nombre, (tipo, ayuda) in METRICAS.items():
+        if not muestras.get(nombre):
+            continue
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        for etq, v in sorted(muestras[nombre]):
+            if tipo != "histogram":
+                lineas.append(f"{nombre}{_etiquetas(etq)} {int(v) if float(v).is_integer() else float(v)!r}")
+                continue
+            acum = 0
+            for limite, n in zip(BUCKETS_S + (float("inf"),), v[:-2]):
+                acum += n
+                le = "+Inf" if limite == float("inf") else f"{limite:g}"
+                lineas.append(f"{nombre}_bucket{_etiquetas(etq + (('le', le),))} {acum}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etq)} {v[-2]:.6f}")
+            lineas.append(f"{nombre}_count{_etiquetas(etq)} {v[-1]}")
+    return "\n".join(lineas) + "\n"
+
+
+def escribir_fichero(ruta: Path):
+    """Escritura atómica (el collector nunca lee un fichero a medias)."""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+    tmp.write_text(exposicion(), encoding="utf-8")
+    os.replace(tmp, ruta)
+
+
+def _bucle_fichero(ruta: Path):
+    while True:
+        try:
+            escribir_fichero(ruta)
+        except OSError as e:
+            log.warning("no se pudo escribir %s: %s", ruta, e)
+        time.sleep(INTERVALO_METRICAS)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        cuerpo = exposicion().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_metricas() -> list[threading.Thread]:
+    """Arranca (una vez por proceso) la exportación configurada por variables de entorno."""
+    hilos = []
+    ruta = os.environ.get("REDISTOUR_METRICAS_FICHERO")
+    if ruta:
+        hilos.append(threading.Thread(target=_bucle_fichero, args=(Path(ruta),),
+                                      name="redistour-metricas", daemon=True))
+    puerto = os.environ.get("REDISTOUR_METRICAS_PUERTO")
+    if puerto:
+        servidor = ThreadingHTTPServer(("127.0.0.1", int(puerto)), _Manejador)
+        hilos.append(threading.Thread(target=servidor.serve_forever, name="redistour-metricas-http", daemon=True))
+    for h in hilos:
+        h.start()
+    if hilos:
+        log.info("métricas: fichero=%s puerto=%s", ruta, puerto)
+    return hilos
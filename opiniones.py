@@ -0,0 +1,223 @@
+# Proyecto RedisTour
+# Resumen de las opiniones de viajeros por zona: nº de opiniones, distribución de su
+# longitud, palabras clave distintivas y un tono (positivo/negativo) por léxico.
+#
+# Uso: python opiniones.py [--procesos N]
+#
+# Se calcula una vez por versión de DATA_TOTAL.xlsx, repartiendo las zonas entre procesos,
+# y se guarda como tabla (Parquet, o CSV sin pyarrow) junto a los datos. La app la lee de
+# disco si existe para la versión actual; si no, la calcula en su propio proceso (sin pool)
+# y la deja en su caché.
+
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import datos
+from busqueda import STOPWORDS_ES, _raiz, plegar
+from exportacion import parquet_disponible, version_datos
+from instrumentacion import medido
+
+log = logging.getLogger("redistour.opiniones")
+
+RESUMEN_DIR = datos.DATA_DIR / "opiniones"
+# palabras clave por zona y términos frecuentes que cada zona aporta al cálculo de distintividad
+N_PALABRAS_CLAVE = 5
+N_TERMINOS_ZONA = 200
+# por debajo de este nº total de opiniones arrancar procesos cuesta más de lo que ahorra
+MIN_OPINIONES_PROCESOS = 20_000
+
+LEXICO_POSITIVO = frozenset(_raiz(p) for p in """
+agradable amable autentico bonito bonita bueno buena encantador encanto encantar espectacular estupendo
+excelente fantastico genial ideal impresionante increible limpio magnifico maravilloso mejor perfecto
+precioso preciosa recomendable recomendado relajante tranquilo tranquila unico unica disfrutar gusto gusta
+encanta
+""".split())
+LEXICO_NEGATIVO = frozenset(_raiz(p) for p in """
+abandonado abarrotado aglomeracion caro cara carisimo decepcion decepcionante descuidado desastre feo
+fea horrible incomodo lamentable malo mala masificado masificada mediocre peligroso peor pesimo ruido
+ruidoso saturado saturada sucio sucia terrible
+""".split())
+NEGACIONES = frozenset({"no", "nunca", "ni", "sin", "tampoco", "nada"})
+# una negación afecta a la primera palabra con polaridad de las siguientes, sin pasar de un signo
+# de puntuación ("no me gustó, horrible"): una positiva negada cuenta como negativa y una negativa
+# negada no cuenta ("no es caro" no es un elogio)
+ALCANCE_NEGACION = 3
+
+_TOKEN = re.compile(r"[a-zñ]+")
+# para el tono la puntuación también es token: cierra el alcance de una negación
+_TOKEN_TONO = re.compile(r"[a-zñ]+|[.,;:!?¡¿()]")
+
+COLUMNAS_RESUMEN = ["ZONA_TURISTICA", "N_OPINIONES", "PALABRAS_P25", "PALABRAS_P50", "PALABRAS_P75",
+                    "PALABRAS_MEDIA", "TONO", "PCT_POSITIVAS", "PCT_NEGATIVAS", "PALABRAS_CLAVE"]
+
+
+def tono(texto: str) -> float:
+    """(positivas - negativas) / (positivas + negativas) de una opinión, en [-1, 1]; 0 si no hay ninguna."""
+    pos = neg = 0
+    negar = 0
+    for t in _TOKEN_TONO.findall(plegar(texto)):
+        if not t[0].isalpha():
+            negar = 0
+            continue
+        if t in NEGACIONES:
+            negar = ALCANCE_NEGACION
+            continue
+        r = _raiz(t)
+        signo = (r in LEXICO_POSITIVO) - (r in LEXICO_NEGATIVO)
+        if negar:
+            signo, negar = min(-signo, 0), (0 if signo else negar - 1)
+        pos += signo > 0
+        neg += signo < 0
+    return (pos - neg) / (pos + neg) if pos + neg else 0.0
+
+
+def _resumir_zona(item: tuple[str, list[str]]) -> tuple[dict, Counter]:
+    """Estadísticas de una zona y sus términos más frecuentes (en nº de opiniones que los usan)."""
+    zona, textos = item
+    palabras = np.array([len(t.split()) for t in textos], dtype=np.int32)
+    tonos = np.array([tono(t) for t in textos], dtype=np.float32)
+    terminos = Counter()
+    for t in textos:
+        terminos.update({w for w in _TOKEN.findall(plegar(t)) if len(w) > 3 and w not in STOPWORDS_ES})
+    p25, p50, p75 = np.percentile(palabras, [25, 50, 75]) if len(textos) else (0, 0, 0)
+    fila = {
+        "ZONA_TURISTICA": zona,
+        "N_OPINIONES": len(textos),
+        "PALABRAS_P25": float(p25),
+        "PALABRAS_P50": float(p50),
+        "PALABRAS_P75": float(p75),
+        "PALABRAS_MEDIA": float(palabras.mean()) if len(textos) else 0.0,
+        "TONO": float(tonos.mean()) if len(textos) else 0.0,
+        "PCT_POSITIVAS": float((tonos > 0).mean() * 100) if len(textos) else 0.0,
+        "PCT_NEGATIVAS": float((tonos < 0).mean() * 100) if len(textos) else 0.0,
+    }
+    return fila, Counter(dict(terminos.most_common(N_TERMINOS_ZONA)))
+
+
+def _palabras_clave(terminos: dict[str, Counter], n_opiniones: dict[str, int]) -> dict[str, str]:
+    """Términos con más peso frecuencia-en-la-zona × rareza-entre-zonas (TF-IDF a nivel de zona,
+    con la IDF suavizada de sklearn: un término común a todas las zonas pesa solo por frecuencia)."""
+    df = Counter()
+    for c in terminos.values():
+        df.update(c.keys())
+    n_zonas = len(terminos)
+    out = {}
+    for zona, c in terminos.items():
+        n = max(n_opiniones[zona], 1)
+        peso = {w: (k / n) * (math.log((1 + n_zonas) / (1 + df[w])) + 1) for w, k in c.items()}
+        top = sorted(peso, key=lambda w: (-peso[w], w))[:N_PALABRAS_CLAVE]
+        out[zona] = ", ".join(top)
+    return out
+
+
+def calcular(op_map: dict[str, list[str]], procesos: int = 1) -> pd.DataFrame:
+    """Tabla resumen (una fila por zona) de {zona: [opiniones]}; con `procesos` > 1 reparte las zonas
+    entre procesos (solo en la construcción offline: en la app arrancarlos cuesta más que tokenizar)."""
+    items = sorted(op_map.items(), key=lambda kv: -len(kv[1]))  # las zonas grandes primero
+    if procesos > 1 and sum(len(v) for _, v in items) >= MIN_OPINIONES_PROCESOS:
+        # "spawn": fork no es seguro si quien llama ya tiene hilos
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+            res = list(pool.map(_resumir_zona, items, chunksize=max(1, len(items) // (4 * procesos))))
+    else:
+        res = [_resumir_zona(it) for it in items]
+
+    filas = [f for f, _ in res]
+    claves = _palabras_clave({f["ZONA_TURISTICA"]: c for f, c in res},
+                             {f["ZONA_TURISTICA"]: f["N_OPINIONES"] for f in filas})
+    df = pd.DataFrame(filas, columns=COLUMNAS_RESUMEN[:-1])
+    df["PALABRAS_CLAVE"] = df["ZONA_TURISTICA"].map(claves).fillna("")
+    df = df.astype({"N_OPINIONES": "int32", **{c: "float32" for c in COLUMNAS_RESUMEN[2:-1]}})
+    return df.sort_values("ZONA_TURISTICA", ignore_index=True)
+
+
+# =========================
+# PERSISTENCIA
+# =========================
+def version_fuentes() -> str:
+    return version_datos([datos.DATA_DIR / "DATA_TOTAL.xlsx"])
+
+
+def _ruta(version: str) -> Path:
+    return RESUMEN_DIR / f"resumen_{version}.{'parquet' if parquet_disponible() else 'csv'}"
+
+
+def leer(version: str) -> pd.DataFrame | None:
+    ruta = _ruta(version)
+    if not ruta.exists():
+        return None
+    df = pd.read_parquet(ruta) if ruta.suffix == ".parquet" else pd.read_csv(ruta, keep_default_na=False)
+    return df[COLUMNAS_RESUMEN]
+
+
+def construir(procesos: int | None = None) -> Path:
+    """Calcula y guarda el resumen de la versión actual de los datos (si no está ya)."""
+    version = version_fuentes()
+    ruta = _ruta(version)
+    if ruta.exists():
+        log.info("opiniones: el resumen %s ya existe", ruta.name)
+        return ruta
+    op_map, err = datos._cargar_opiniones_zt.__wrapped__(datos.generacion_actual())
+    if err:
+        raise ValueError(err)
+    df = calcular(op_map, procesos or os.cpu_count() or 1)
+    RESUMEN_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.tmp")
+    if ruta.suffix == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, ruta)
+    for viejo in RESUMEN_DIR.glob("resumen_*"):
+        if viejo != ruta:
+            viejo.unlink(missing_ok=True)
+    log.info("opiniones: resumen de %d zonas en %s", len(df), ruta.name)
+    return ruta
+
+
+@medido("Resumen de opiniones", filas=len, cache=st.cache_data(ttl=datos.TTL_CACHE, show_spinner=False))
+def _resumen_opiniones(generacion: int) -> pd.DataFrame:
+    df = leer(version_fuentes())
+    if df is None:
+        # sin resumen construido (python opiniones.py) se calcula aquí, en este proceso
+        df = calcular(datos._cargar_opiniones_zt(generacion)[0])
+    return df
+
+
+def resumen_opiniones() -> pd.DataFrame:
+    return _resumen_opiniones(datos.generacion_actual())
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _resumen_por_zona(generacion: int) -> dict[str, dict]:
+    return _resumen_opiniones(generacion).set_index("ZONA_TURISTICA").to_dict(orient="index")
+
+
+def resumen_por_zona() -> dict[str, dict]:
+    """{zona: fila del resumen} para consultas O(1) desde tarjetas, mapa y ranking."""
+    return _resumen_por_zona(datos.generacion_actual())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumen por zona de las opiniones de viajeros (hoja OpinionesZT).")
+    ap.add_argument("--procesos", type=int, default=None, help="procesos en paralelo (por defecto, nº de núcleos)")
+    args = ap.parse_args()
+    ruta = construir(args.procesos)
+    df = leer(version_fuentes())
+    print(json.dumps({"ruta": str(ruta), "zonas": len(df), "opiniones": int(df["N_OPINIONES"].sum())},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# Proyecto RedisTour
+# Paquete de datos derivados en disco, compartido entre réplicas de la app.
+#
+# Uso: python paquete.py
+#
+# El paquete se escribe y se lee en REDISTOUR_PAQUETE_DIR (por defecto Data_Dataestur/paquete):
+# el constructor y la app resuelven el directorio de la misma variable.
+#
+# El paso de construcción calcula una vez los arrays que cada proceso de Streamlit
+# rehacía por su cuenta (registro de zonas, acumulados de viajeros, cubo de ocupación
+# de los forecasts, matriz de features codificada, tabla de vecinos del kNN, perfil
+# de textos e índice de saturación de cada zona) y los guarda como .npy. La app los
+# abre con np.load(mmap_mode="r"): todas las réplicas del mismo host comparten las
+# páginas físicas a través de la caché de páginas del sistema.
+
+import argparse
+import json
+import logging
+import os
+import shutil
+from dataclasses import dataclass, field
+from functools import cached_property
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import datos
+import pronostico
+import saturacion
+from busqueda import PerfilesZona, indice_texto, perfil_texto, _normalizar_filas
+from exportacion import version_datos
+from historico import MotorAcumulados
+
+log = logging.getLogger("redistour.paquete")
+
+PAQUETE_DIR = Path(os.environ.get("REDISTOUR_PAQUETE_DIR", datos.DATA_DIR / "paquete"))
+MANIFIESTO = "paquete.json"
+# vecinos guardados por zona; el recomendador pide como mucho 12 + la propia zona
+K_VECINOS = 32
+
+
+def version_fuentes() -> str:
+    """Huella de los ficheros de los que se deriva el paquete; si cambia, el paquete está obsoleto.
+
+    Con la regeneración de forecasts activada, los mismos ficheros pueden dar otros forecasts,
+    así que el modo entra en la huella (se llama mientras se cargan los datos: no puede leerlos).
+    """
+    return version_datos([datos.DATA_DIR / "DATA_TOTAL.xlsx", datos.FORECASTS_XLSX, datos.ALMACEN_MANIFIESTO],
+                         ["regenerar forecasts"] if datos.REGENERAR_FORECASTS else None)
+
+
+def _cubo_ocupacion(df_fore: pd.DataFrame, zonas: list[str], sufijo: str = "") -> tuple[np.ndarray, int]:
+    """(zona, mes, tipo) con el % de ocupación previsto (NaN si no hay dato) y el mes inicial.
+
+    Con `sufijo` ("_P10", "_P90") se leen las columnas del intervalo de predicción.
+    """
+    idx = {z: i for i, z in enumerate(zonas)}
+    f = df_fore[df_fore["ZONA_TURISTICA"].astype(str).isin(idx)]
+    t_abs = f["AÑO"].astype(int) * 12 + f["MES"].astype(int) - 1
+    t0 = int(t_abs.min()) if len(f) else 0
+    n_t = int(t_abs.max()) - t0 + 1 if len(f) else 0
+    cubo = np.full((len(zonas), n_t, len(datos.OCUPACION_COLS)), np.nan, dtype=np.float64)
+    zi = f["ZONA_TURISTICA"].astype(str).map(idx).to_numpy()
+    for k, c in enumerate(datos.OCUPACION_COLS):
+        c += sufijo
+        if c in f.columns:
+            # con filas repetidas gana la última, igual que el to_dict() de la app
+            cubo[zi, (t_abs - t0).to_numpy(), k] = pd.to_numeric(f[c], errors="coerce").to_numpy()
+    return cubo, t0
+
+
+def construir() -> dict:
+    """Escribe una versión nueva del paquete en PAQUETE_DIR si las fuentes han cambiado. Devuelve el manifiesto."""
+    destino = PAQUETE_DIR
+    version = version_fuentes()
+    actual = leer_manifiesto(destino)
+    if actual is not None and actual["version"] == version:
+        log.info("paquete: la versión %s ya está construida", version)
+        return actual
+
+    snap = datos.instantanea_datos()
+    df_zt = datos.cargar_descripciones_y_datazt()[0]
+    df_fore, err = datos.cargar_forecasts()
+    if err:
+        raise ValueError(err)
+
+    # kNN del "Destino alternativo": features codificadas y vecinos de cada zona de Data ZT
+    pipe, df_knn, _ = datos.entrenar_pipeline(df_zt.copy())
+    Xt = pipe.named_steps["preprocessor"].transform(df_knn)
+    dist, vec = pipe.named_steps["knn"].kneighbors(Xt, n_neighbors=min(K_VECINOS, len(df_knn)))
+    X = np.asarray(Xt.toarray() if hasattr(Xt, "toarray") else Xt, dtype=np.float32)
+
+    zonas_knn = df_zt["ZONA_TURISTICA"].astype(str).tolist()
+    registro = sorted(set(zonas_knn) | set(snap.motor.zonas) | set(df_fore["ZONA_TURISTICA"].astype(str)))
+    pos = {z: i for i, z in enumerate(registro)}
+    ocupacion, t0_fore = _cubo_ocupacion(df_fore, registro)
+    inf, sup = (_cubo_ocupacion(df_fore, registro, s)[0] for s in pronostico.SUFIJOS_INTERVALO)
+    indice = saturacion.calcular(snap.df, df_fore)
+
+    # los acumulados se guardan en el orden del registro para no duplicar listas de zonas
+    zonas_motor, cols_viajeros, t0_viajeros, cum, cum_obs = snap.motor.acumulados(registro)
+    filas_motor = np.array([pos[z] for z in zonas_motor], dtype=np.int32)
+
+    arrays = {
+        "zonas": np.array(registro, dtype=str),
+        "viajeros_acum": cum,
+        "obs_acum": cum_obs,
+        "filas_motor": filas_motor,
+        "ocupacion": ocupacion,
+        "ocupacion_inf": inf,
+        "ocupacion_sup": sup,
+        "features": X,
+        "filas_knn": np.array([pos[z] for z in zonas_knn], dtype=np.int32),
+        "vecinos": vec.astype(np.int32),
+        "distancias": dist.astype(np.float32),
+        "perfil_texto": perfil_texto(indice_texto(), zonas_knn),
+        "filas_saturacion": np.array([pos[z] for z in indice.zonas], dtype=np.int32),
+        "saturacion_valores": indice.valores,
+        "saturacion_componentes": indice.componentes,
+        "saturacion_viajeros": indice.viajeros,
+    }
+
+    dir_version = destino / f"v_{version}"
+    tmp = destino / f".v_{version}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for nombre, arr in arrays.items():
+        np.save(tmp / f"{nombre}.npy", np.ascontiguousarray(arr))
+    shutil.rmtree(dir_version, ignore_errors=True)
+    os.replace(tmp, dir_version)
+
+    manifest = {
+        "version": version,
+        "generado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "directorio": dir_version.name,
+        "t0_viajeros": t0_viajeros,
+        "cols_viajeros": cols_viajeros,
+        "t0_ocupacion": t0_fore,
+        "cols_ocupacion": datos.OCUPACION_COLS,
+        "forecasts": "regenerados" if datos.forecasts_regenerados() else "excel",
+        "t0_saturacion": indice.t0,
+        "ultimo_historico_saturacion": indice.ultimo_historico,
+        "arrays": {n: {"shape": list(a.shape), "dtype": str(a.dtype)} for n, a in arrays.items()},
+    }
+    ruta = destino / MANIFIESTO
+    ruta.with_suffix(".tmp").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(ruta.with_suffix(".tmp"), ruta)
+    # se conserva la versión anterior: otras réplicas pueden tenerla abierta todavía
+    conservar = {dir_version.name} | ({actual["directorio"]} if actual is not None else set())
+    for viejo in destino.glob("v_*"):
+        if viejo.name not in conservar:
+            shutil.rmtree(viejo, ignore_errors=True)
+    log.info("paquete: construida versión %s (%.1f MB)", version,
+             sum(a.nbytes for a in arrays.values()) / 1e6)
+    return manifest
+
+
+def leer_manifiesto(destino: Path | None = None) -> dict | None:
+    ruta = Path(destino or PAQUETE_DIR) / MANIFIESTO
+    if not ruta.exists():
+        return None
+    return json.loads(ruta.read_text(encoding="utf-8"))
+
+
+@dataclass(frozen=True)
+class Paquete:
+    """Vista de solo lectura sobre una versión del paquete (arrays mapeados en memoria)."""
+    version: str
+    manifest: dict = field(repr=False)
+    arrays: dict = field(repr=False)
+
+    @cached_property
+    def zonas_knn(self) -> list[str]:
+        """Zonas en el orden de filas de Data ZT (el del selector del recomendador)."""
+        zonas = self.arrays["zonas"]
+        return [str(zonas[i]) for i in self.arrays["filas_knn"]]
+
+    @cached_property
+    def _pos(self) -> dict[str, int]:
+        return {str(z): i for i, z in enumerate(self.arrays["zonas"])}
+
+    def vecinos(self, zona: str, n: int) -> list[tuple[str, float]] | None:
+        """Las `n` zonas más cercanas a `zona` (incluida ella misma) con su distancia coseno.
+
+        None si la zona no está en el kNN o se piden más vecinos de los guardados.
+        """
+        nombres = self.zonas_knn
+        if zona not in nombres or n > self.arrays["vecinos"].shape[1]:
+            return None
+        i = nombres.index(zona)
+        return [(nombres[j], float(d)) for j, d in zip(self.arrays["vecinos"][i, :n],
+                                                       self.arrays["distancias"][i, :n])]
+
+    @cached_property
+    def perfiles(self) -> PerfilesZona | None:
+        """Perfiles para la distancia combinada atributos + textos (None en paquetes sin perfil de textos)."""
+        if "perfil_texto" not in self.arrays:
+            return None
+        return PerfilesZona(self.zonas_knn, _normalizar_filas(self.arrays["features"]),
+                            np.asarray(self.arrays["perfil_texto"]))
+
+    @cached_property
+    def indice_saturacion(self) -> saturacion.IndiceSaturacion | None:
+        """Índice de saturación sobre los arrays mapeados (None en paquetes construidos sin él)."""
+        if "saturacion_valores" not in self.arrays:
+            return None
+        zonas = self.arrays["zonas"]
+        return saturacion.IndiceSaturacion(
+            [str(zonas[i]) for i in self.arrays["filas_saturacion"]], self.manifest["t0_saturacion"],
+            self.arrays["saturacion_valores"], self.arrays["saturacion_componentes"],
+            self.arrays["saturacion_viajeros"], self.manifest["ultimo_historico_saturacion"])
+
+    def ocupacion(self, zonas: list[str], año: int, mes: int) -> dict[str, dict[str, float | None]]:
+        """{zona: {columna de ocupación: valor o None}} de los forecasts para un mes."""
+        cubo = self.arrays["ocupacion"]
+        cols = self.manifest["cols_ocupacion"]
+        t = int(año) * 12 + int(mes) - 1 - self.manifest["t0_ocupacion"]
+        out = {}
+        for z in zonas:
+            i = self._pos.get(str(z))
+            if i is None or not 0 <= t < cubo.shape[1]:
+                out[z] = {c: None for c in cols}
+            else:
+                out[z] = {c: (None if np.isnan(v) else float(v)) for c, v in zip(cols, cubo[i, t])}
+        return out
+
+    def intervalos(self, zonas: list[str], año: int, mes: int) -> dict[str, dict[str, tuple[float, float] | None]]:
+        """{zona: {columna de ocupación: (p10, p90) o None}} del intervalo de predicción de un mes."""
+        if "ocupacion_inf" not in self.arrays:
+            return {z: {c: None for c in self.manifest["cols_ocupacion"]} for z in zonas}
+        inf, sup = self.arrays["ocupacion_inf"], self.arrays["ocupacion_sup"]
+        t = int(año) * 12 + int(mes) - 1 - self.manifest["t0_ocupacion"]
+        out = {}
+        for z in zonas:
+            i = self._pos.get(str(z))
+            out[z] = {}
+            for k, c in enumerate(self.manifest["cols_ocupacion"]):
+                ok = i is not None and 0 <= t < inf.shape[1] and not np.isnan(inf[i, t, k])
+                out[z][c] = (float(inf[i, t, k]), float(sup[i, t, k])) if ok else None
+        return out
+
+    def motor(self) -> MotorAcumulados:
+        """Motor de acumulados del histórico sobre los arrays mapeados (sin copiarlos)."""
+        zonas = self.arrays["zonas"]
+        return MotorAcumulados.desde_acumulados(
+            [str(zonas[i]) for i in self.arrays["filas_motor"]], self.manifest["cols_viajeros"],
+            self.manifest["t0_viajeros"], self.arrays["viajeros_acum"], self.arrays["obs_acum"])
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _abrir(version: str) -> Paquete | None:
+    manifest = leer_manifiesto()
+    if manifest is None or manifest["version"] != version:
+        return None
+    d = PAQUETE_DIR / manifest["directorio"]
+    arrays = {n: np.load(d / f"{n}.npy", mmap_mode="r") for n in manifest["arrays"]}
+    log.info("paquete: abierta versión %s", version)
+    return Paquete(version, manifest, arrays)
+
+
+def paquete_vigente() -> Paquete | None:
+    """Paquete construido a partir de las fuentes actuales, o None si no existe o está obsoleto."""
+    if not (PAQUETE_DIR / MANIFIESTO).exists():
+        return None
+    return _abrir(version_fuentes())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Construye el paquete de datos derivados compartido entre réplicas "
+                                             "(en REDISTOUR_PAQUETE_DIR).")
+    ap.parse_args()
+    manifest = construir()
+    print(json.dumps({k: manifest[k] for k in ["version", "directorio", "arrays"]}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Proyecto RedisTour
+# Portada: carrusel de imágenes del inicio
+
+import html
+import time
+
+import streamlit as st
+
+# Segundos entre imágenes del carrusel
+INTERVALO_CARRUSEL = 4
+
+# =========================
+# IMAGENES HERO
+# =========================
+imagenes = [
+    {"url":"https://images.unsplash.com/photo-1605654464243-3668a4c0de3d?q=80&w=1700&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Alhambra, Granada"},
+    {"url":"https://images.unsplash.com/photo-1655405927893-96a5b68490c1?q=80&w=1548&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Benidorm, Alicante"},
+    {"url":"https://images.unsplash.com/photo-1536075597888-91fe9f9cacd7?q=80&w=1740&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Mirador del Cap de la Barra, Costa Brava"},
+    {"url":"https://images.unsplash.com/photo-1677939217436-01d7c0b8738e?q=80&w=1740&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Torre del Oro, Sevilla"},
+    {"url":"https://cdn.pixabay.com/photo/2020/05/08/22/51/national-park-5147616_1280.jpg","ciudad":"Aigüestortes, Lleida"},
+    {"url":"https://images.unsplash.com/photo-1665157809094-02fc338305f5?q=80&w=2064&auto=format&fit=crop&ixlib=rb-4.1.0","ciudad":"Alt Pirineu, Lleida"},
+    {"url":"https://multimedia.comunitatvalenciana.com/B5B34B4AEFC64B248A719A3B64306FD9/img/E991F48A7CEC482AA06F299319096C07/costa_de_azahar.jpg?responsive","ciudad":"Costa Azahar, Comunitat Valenciana"},
+    {"url":"https://cdn.pixabay.com/photo/2022/11/18/16/53/spain-7600551_1280.jpg","ciudad":"Los Alcornocales, Cádiz"},
+    {"url":"https://mediaim.expedia.com/destination/1/f8e3b5569445fd06122bf4f0bbee0806.jpg","ciudad":"Cadí-Moixeró, Barcelona"},
+    {"url":"https://www.barcelo.com/guia-turismo/wp-content/uploads/ok-costa-vizcaina.jpg","ciudad":"Costa Bizkaia, País Vasco"},
+    {"url":"https://www.andaluciasimple.com/wp-content/uploads/2020/11/AdobeStock_132882206-scaled.jpeg","ciudad":"Costa del Sol (Málaga), Andalucía"}
+]
+
+
+# =========================
+# CARRUSEL (fragmento)
+# =========================
+def _mover(paso: int):
+    st.session_state.imagen_idx = (st.session_state.get("imagen_idx", 0) + paso) % len(imagenes)
+    st.session_state.imagen_ts = time.monotonic()
+
+def avanzar(): _mover(1)
+def retroceder(): _mover(-1)
+
+
+@st.fragment(run_every=INTERVALO_CARRUSEL)
+def carrusel_hero():
+    """Imagen hero con avance automático.
+
+    Al ser un fragmento, el temporizador y los botones ◀/▶ solo re-ejecutan esta función,
+    no el script completo (cargas, CSS, menú...).
+    """
+    ahora = time.monotonic()
+    if "imagen_idx" not in st.session_state:
+        st.session_state.imagen_idx = 0
+        st.session_state.imagen_ts = ahora
+    # Se avanza por tiempo transcurrido y no por ejecución: un clic manual o un rerun
+    # completo de la página no provocan un salto doble.
+    elif ahora - st.session_state.get("imagen_ts", 0.0) >= INTERVALO_CARRUSEL - 0.5:
+        avanzar()
+
+    imagen_actual = imagenes[st.session_state.imagen_idx]
+    st.markdown(f"""
+        <div class="img-wrapper">
+            <img src="{imagen_actual['url']}" alt="{html.escape(imagen_actual['ciudad'])}">
+            <div class="city-label">{imagen_actual['ciudad']}</div>
+        </div>
+    """, unsafe_allow_html=True)
+
+    # Controles hero
+    col1b, col2b, col3b = st.columns([1, 30, 1])
+    with col1b:
+        st.button("◀", key="hero_prev", use_container_width=True, on_click=retroceder, help="Imagen anterior")
+    with col3b:
+        st.button("▶", key="hero_next", use_container_width=True, on_click=avanzar, help="Imagen siguiente")
@@ -0,0 +1,124 @@
+# Proyecto RedisTour
+# Precalentamiento de cachés en segundo plano al arrancar el proceso del servidor,
+# refresco anticipado antes de que venza el TTL de los loaders y recarga en caliente
+# de DATA_TOTAL.xlsx cuando cambia en disco.
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+import busqueda
+import datos
+import opiniones
+import saturacion
+
+log = logging.getLogger("redistour.precarga")
+
+# Segundos antes del vencimiento del TTL en que se recalcula la siguiente generación
+MARGEN_REFRESCO = 300
+# Cada cuántos segundos se comprueba si DATA_TOTAL.xlsx ha cambiado
+INTERVALO_VIGILANCIA = 30
+
+_lock_gen = threading.Lock()
+
+
+def _medir(nombre: str, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        out = fn(*args)
+        log.info("precarga %-28s %7.0f ms", nombre, (time.perf_counter() - t0) * 1000)
+        return out
+    except Exception as e:  # una hoja ausente no debe tumbar el resto de la precarga
+        log.warning("precarga %-28s falló: %s", nombre, e)
+        return None
+
+
+def precalentar(generacion: int, max_workers: int = 4) -> float:
+    """Rellena todas las cachés de la generación indicada. Devuelve la duración en segundos."""
+    t0 = time.perf_counter()
+    log.info("precarga: inicio (generación %d)", generacion)
+
+    # 1) hojas del Excel y forecasts en paralelo
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precarga") as pool:
+        f_datos = pool.submit(_medir, "Total + Coordenadas ZT", datos.instantanea_datos)
+        f_zt = pool.submit(_medir, "Data ZT + Descripciones", datos._cargar_descripciones_y_datazt, generacion)
+        pool.submit(_medir, "OpinionesZT", datos._cargar_opiniones_zt, generacion)
+        pool.submit(_medir, "Forecasts", datos._cargar_forecasts, generacion)
+        res_datos, res_zt = f_datos.result(), f_zt.result()
+
+    # 2) derivados: recomendador (las dos variantes de Data ZT que usan las secciones)
+    #    y mapa con los filtros por defecto (los acumulados del histórico van en la instantánea)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precarga") as pool:
+        if res_zt is not None:
+            df_zt = res_zt[0]
+            if "ZONA_TURISTICA" in df_zt.columns:
+                pool.submit(_medir, "kNN (Destino alternativo)", datos.entrenar_pipeline, df_zt.copy())
+                pool.submit(_medir, "kNN (Encuentra tu destino)", datos.entrenar_pipeline,
+                            datos.preparar_datazt_filtros(df_zt))
+        if res_datos is not None:
+            pool.submit(_medir, "Agregado mapa", datos.agregado_mapa, res_datos, None, None, datos.VIAJEROS_COLS)
+        pool.submit(_medir, "Descripciones / localización", lambda: (datos._mapa_descripciones(generacion),
+                                                                      datos._mapa_localizacion(generacion)))
+
+    # 3) índice de texto y perfiles de zona (dependen del kNN y de las opiniones ya cargados)
+    if res_zt is not None and "ZONA_TURISTICA" in res_zt[0].columns:
+        _medir("Índice de texto + perfiles", busqueda._perfiles_zona, generacion)
+    _medir("Resumen de opiniones", opiniones._resumen_por_zona, generacion)
+    if res_datos is not None and saturacion._del_paquete() is None:
+        _medir("Índice de saturación", saturacion._indice_saturacion, res_datos.df, res_datos.version, generacion)
+
+    dt = time.perf_counter() - t0
+    log.info("precarga: fin (generación %d) en %.1f s", generacion, dt)
+    return dt
+
+
+def _publicar_siguiente(motivo: str):
+    """Precalienta la generación siguiente y la publica cuando está lista."""
+    with _lock_gen:
+        gen = datos.generacion_actual() + 1
+        precalentar(gen)
+        datos.publicar_generacion(gen)
+    log.info("precarga: publicada generación %d (%s)", gen, motivo)
+
+
+def _bucle_refresco():
+    precalentar(datos.generacion_actual())
+    while True:
+        # recalcular la generación siguiente antes de que venza la actual y publicarla ya caliente
+        time.sleep(max(60, datos.TTL_CACHE - MARGEN_REFRESCO))
+        _publicar_siguiente("TTL")
+
+
+def _bucle_vigilancia():
+    while True:
+        time.sleep(INTERVALO_VIGILANCIA)
+        try:
+            resumen = datos.recargar_si_cambia()
+        except Exception as e:  # p. ej. el Excel se está copiando todavía: se reintenta en la siguiente vuelta
+            log.warning("recarga de DATA_TOTAL.xlsx fallida: %s", e)
+            continue
+        if resumen is None:
+            continue
+        log.info("recarga de DATA_TOTAL.xlsx: %s", resumen)
+        # el resto de hojas (Data ZT, Descripciones, OpinionesZT) se releen en una generación nueva
+        _publicar_siguiente("cambio en DATA_TOTAL.xlsx")
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_precarga() -> list[threading.Thread]:
+    """Arranca (una vez por proceso) los hilos de precarga/refresco y de vigilancia del Excel.
+
+    Se desactivan con REDISTOUR_PRECARGA=0 y REDISTOUR_RECARGA=0 (p. ej. en benchmarks o pruebas).
+    """
+    hilos = []
+    if os.environ.get("REDISTOUR_PRECARGA", "1") != "0":
+        hilos.append(threading.Thread(target=_bucle_refresco, name="redistour-precarga", daemon=True))
+    if os.environ.get("REDISTOUR_RECARGA", "1") != "0":
+        hilos.append(threading.Thread(target=_bucle_vigilancia, name="redistour-recarga", daemon=True))
+    for h in hilos:
+        h.start()
+    return hilos
@@ -0,0 +1,372 @@
+# Proyecto RedisTour
+# Previsión de los grados de ocupación (GRADO_OCUPA_*) por zona y mes a partir del histórico,
+# con el mismo esquema que Forecasts_2025_2026_2027.xlsx (AÑO, MES, ZONA_TURISTICA, GRADO_OCUPA_*).
+#
+# Uso: python pronostico.py [--años 3] [--salida Forecasts_2025_2026_2027.xlsx] [--evaluar 12]
+#
+# Modelo: Holt-Winters aditivo con tendencia amortiguada. Todas las series (zona x métrica)
+# se ajustan a la vez: el bucle es sobre los meses y cada paso opera sobre una matriz
+# (combinación de parámetros x serie), así que una rejilla de parámetros completa cuesta
+# lo mismo que un puñado de operaciones de NumPy por mes. Las series cortas usan el
+# ingenuo estacional (último valor observado del mismo mes). Los intervalos de predicción
+# salen de un bootstrap de los residuos a un paso, simulado también para todas las series
+# a la vez.
+
+import argparse
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PERIODO = 12
+# años que se prevén tras el último año del histórico
+HORIZONTE_AÑOS = 3
+# rejilla de (alpha, beta, gamma); se elige por serie la de menor error a un paso
+ALPHAS = (0.05, 0.2, 0.4, 0.6)
+BETAS = (0.0, 0.05, 0.15)
+GAMMAS = (0.05, 0.2, 0.4)
+AMORTIGUACION = 0.95
+# observaciones mínimas para ajustar Holt-Winters (dos ciclos completos)
+MIN_OBS_HW = 2 * PERIODO
+
+
+def columnas_ocupacion(df: pd.DataFrame) -> list[str]:
+    return [c for c in df.columns if str(c).startswith("GRADO_OCUPA_")]
+
+
+@dataclass(frozen=True)
+class CuboSeries:
+    """Histórico como cubo (zona, mes, métrica) con NaN donde no hay dato."""
+    zonas: list[str]
+    cols: list[str]
+    t0: int  # año * 12 + mes - 1 del primer mes
+    valores: np.ndarray
+
+    @property
+    def n_meses(self) -> int:
+        return self.valores.shape[1]
+
+
+def cubo_historico(df: pd.DataFrame, cols: list[str] | None = None) -> CuboSeries:
+    cols = cols or columnas_ocupacion(df)
+    base = df[["ZONA_TURISTICA", "AÑO", "MES"] + cols].copy()
+    for c in ["AÑO", "MES"] + cols:
+        base[c] = pd.to_numeric(base[c], errors="coerce")
+    base = base.dropna(subset=["AÑO", "MES"])
+    base = base[base["MES"].between(1, 12)]
+    zonas = sorted(base["ZONA_TURISTICA"].astype(str).unique().tolist())
+    t_abs = (base["AÑO"].astype(int) * 12 + base["MES"].astype(int) - 1).to_numpy()
+    t0 = int(t_abs.min()) if len(base) else 0
+    n_t = int(t_abs.max()) - t0 + 1 if len(base) else 0
+    zi = base["ZONA_TURISTICA"].astype(str).map({z: i for i, z in enumerate(zonas)}).to_numpy()
+    # varias filas por (zona, mes) se promedian
+    suma = np.zeros((len(zonas), n_t, len(cols)))
+    n = np.zeros_like(suma)
+    for k, c in enumerate(cols):
+        v = base[c].to_numpy(dtype=float)
+        ok = ~np.isnan(v)
+        np.add.at(suma[:, :, k], (zi[ok], t_abs[ok] - t0), v[ok])
+        np.add.at(n[:, :, k], (zi[ok], t_abs[ok] - t0), 1)
+    valores = np.where(n > 0, suma / np.maximum(n, 1), np.nan)
+    return CuboSeries(zonas, cols, t0, valores)
+
+
+# =========================
+# MODELOS (vectorizados sobre series)
+# =========================
+def _media_filas(Y: np.ndarray) -> np.ndarray:
+    """Media de cada fila ignorando NaN (NaN si la fila no tiene ningún dato)."""
+    n_ok = (~np.isnan(Y)).sum(axis=1)
+    return np.where(n_ok > 0, np.nansum(Y, axis=1) / np.maximum(n_ok, 1), np.nan)
+
+
+def ingenuo_estacional(Y: np.ndarray, horizonte: int) -> np.ndarray:
+    """(series, horizonte): último valor observado de cada mes del año; media de la serie si no lo hay."""
+    n, T = Y.shape
+    ultimo = np.full((n, PERIODO), np.nan)
+    for t in range(T):  # el último observado de cada mes queda encima
+        ok = ~np.isnan(Y[:, t])
+        ultimo[ok, t % PERIODO] = Y[ok, t]
+    ultimo = np.where(np.isnan(ultimo), _media_filas(Y)[:, None], ultimo)
+    meses = (T + np.arange(horizonte)) % PERIODO
+    return ultimo[:, meses]
+
+
+def _estado_inicial(Y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Nivel, tendencia y estacionalidad iniciales con los dos primeros ciclos."""
+    primero = Y[:, :PERIODO]
+    nivel0 = _media_filas(primero)
+    segundo = _media_filas(Y[:, PERIODO:2 * PERIODO])
+    nivel0 = np.where(np.isnan(nivel0), _media_filas(Y), nivel0)
+    tend0 = np.where(np.isnan(segundo), 0.0, (segundo - nivel0) / PERIODO)
+    est0 = np.where(np.isnan(primero), 0.0, primero - nivel0[:, None])
+    return nivel0, tend0, est0
+
+
+def _filtrar(Y: np.ndarray, a, b, g, residuos: bool = False):
+    """Recorre el histórico actualizando el estado. `a`, `b`, `g` son (C, 1) para evaluar una
+    rejilla sobre todas las series o (series,) con los parámetros ya elegidos de cada una.
+    Los meses sin dato no corrigen el estado (se sustituyen por su propia previsión)."""
+    n, T = Y.shape
+    nivel0, tend0, est0 = _estado_inicial(Y)
+    forma = np.broadcast_shapes(np.shape(a), (n,))
+    nivel = np.broadcast_to(nivel0, forma).copy()
+    tend = np.broadcast_to(tend0, forma).copy()
+    est = np.broadcast_to(est0, forma + (PERIODO,)).copy()
+    sse = np.zeros(forma)
+    nobs = np.zeros(n)
+    res = np.full((n, T), np.nan) if residuos else None
+    phi = AMORTIGUACION
+    for t in range(PERIODO, T):
+        m = t % PERIODO
+        pred = nivel + phi * tend + est[..., m]
+        y = Y[:, t]
+        ok = ~np.isnan(y)
+        y = np.where(ok, y, pred)
+        sse += np.where(ok, (y - pred) ** 2, 0.0)
+        nobs += ok
+        if residuos:
+            res[ok, t] = (y - pred)[ok]
+        nivel_ant = nivel
+        nivel = a * (y - est[..., m]) + (1 - a) * (nivel + phi * tend)
+        tend = b * (nivel - nivel_ant) + (1 - b) * phi * tend
+        est[..., m] = g * (y - nivel) + (1 - g) * est[..., m]
+    return nivel, tend, est, sse / np.maximum(nobs, 1), res
+
+
+@dataclass(frozen=True)
+class AjusteHW:
+    """Estado final de Holt-Winters por serie, con sus parámetros y residuos a un paso."""
+    nivel: np.ndarray
+    tend: np.ndarray
+    est: np.ndarray  # (series, PERIODO)
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    ecm: np.ndarray
+    residuos: np.ndarray  # (series, meses), NaN donde no hay dato
+    n_meses: int
+
+    def proyectar(self, horizonte: int) -> np.ndarray:
+        """Previsión puntual (series, horizonte)."""
+        h = np.arange(1, horizonte + 1)
+        amort = np.cumsum(AMORTIGUACION ** h)  # phi + phi^2 + ... + phi^h
+        meses = (self.n_meses + h - 1) % PERIODO
+        return self.nivel[:, None] + amort[None, :] * self.tend[:, None] + self.est[:, meses]
+
+
+def ajustar_hw(Y: np.ndarray) -> AjusteHW:
+    """Holt-Winters aditivo amortiguado para todas las filas de `Y` (series, meses) a la vez.
+
+    La rejilla completa de parámetros se evalúa en una sola pasada; cada serie se queda con
+    la combinación de menor error cuadrático medio a un paso.
+    """
+    rejilla = np.array(list(itertools.product(ALPHAS, BETAS, GAMMAS)))  # (C, 3)
+    ecm = _filtrar(Y, *(rejilla[:, k, None] for k in range(3)))[3]
+    a, b, g = rejilla[np.argmin(ecm, axis=0)].T
+    nivel, tend, est, ecm, res = _filtrar(Y, a, b, g, residuos=True)
+    return AjusteHW(nivel, tend, est, a, b, g, ecm, res, Y.shape[1])
+
+
+def holt_winters(Y: np.ndarray, horizonte: int) -> tuple[np.ndarray, np.ndarray]:
+    """Previsión (series, horizonte) y error cuadrático medio a un paso de cada serie."""
+    ajuste = ajustar_hw(Y)
+    return ajuste.proyectar(horizonte), ajuste.ecm
+
+
+def prever(cubo: CuboSeries, horizonte: int) -> np.ndarray:
+    """Previsión (zona, horizonte, métrica) acotada a [0, 100]."""
+    S, T, M = cubo.valores.shape
+    Y = cubo.valores.transpose(0, 2, 1).reshape(S * M, T)
+    pred = ingenuo_estacional(Y, horizonte)
+    largas = (~np.isnan(Y)).sum(axis=1) >= MIN_OBS_HW
+    if largas.any() and T > PERIODO:
+        pred[largas] = holt_winters(Y[largas], horizonte)[0]
+    return np.clip(pred, 0, 100).reshape(S, M, horizonte).transpose(0, 2, 1)
+
+
+def generar(df_hist: pd.DataFrame, años: int = HORIZONTE_AÑOS, cols: list[str] | None = None) -> pd.DataFrame:
+    """Forecasts desde el mes siguiente al histórico hasta diciembre de `años` años después,
+    con el esquema de Forecasts_2025_2026_2027.xlsx."""
+    cubo = cubo_historico(df_hist, cols)
+    fin = cubo.t0 + cubo.n_meses  # primer mes a prever
+    horizonte = ((fin - 1) // 12 + años) * 12 + 12 - fin
+    pred = prever(cubo, horizonte)
+    t = fin + np.arange(horizonte)
+    S = len(cubo.zonas)
+    out = pd.DataFrame({
+        "AÑO": np.tile(t // 12, S).astype("int64"),
+        "MES": np.tile(t % 12 + 1, S).astype("int64"),
+        "ZONA_TURISTICA": np.repeat(cubo.zonas, horizonte),
+    })
+    for k, c in enumerate(cubo.cols):
+        out[c] = pred[:, :, k].reshape(-1)
+    out = out.dropna(subset=cubo.cols, how="all")
+    for c in ["AÑO", "MES"]:
+        out[c] = out[c].astype("Int64")
+    return out.reset_index(drop=True)
+
+
+# =========================
+# INTERVALOS (bootstrap de residuos)
+# =========================
+# cuantiles del intervalo de predicción y sufijo de sus columnas en los forecasts
+CUANTILES_INTERVALO = (0.1, 0.9)
+SUFIJOS_INTERVALO = ("_P10", "_P90")
+N_BOOTSTRAP = 200
+# series que se simulan a la vez: acota la memoria a N_BOOTSTRAP x BLOQUE_SERIES x PERIODO
+BLOQUE_SERIES = 1024
+
+
+def _compactar(res: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Residuos de cada serie al principio de su fila (sin NaN) y cuántos hay; 0 si no hay ninguno."""
+    orden = np.argsort(np.isnan(res), axis=1, kind="stable")
+    r = np.take_along_axis(res, orden, axis=1)
+    k = (~np.isnan(res)).sum(axis=1)
+    r[k == 0, 0] = 0.0
+    return r, np.maximum(k, 1)
+
+
+def _muestras(r: np.ndarray, k: np.ndarray, forma: tuple, rng: np.random.Generator) -> np.ndarray:
+    """Residuos remuestreados con reemplazo: `forma` = (..., series)."""
+    return r[np.arange(len(k)), (rng.random(forma) * k).astype(np.int64)]
+
+
+def simular_hw(ajuste: AjusteHW, horizonte: int, n_sim: int, rng: np.random.Generator) -> np.ndarray:
+    """Trayectorias futuras (n_sim, series, horizonte): cada mes se suma un residuo remuestreado
+    y el estado se actualiza con él, así la incertidumbre crece con el horizonte."""
+    r, k = _compactar(ajuste.residuos)
+    a, b, g = ajuste.alpha, ajuste.beta, ajuste.gamma
+    n = len(k)
+    nivel = np.broadcast_to(ajuste.nivel, (n_sim, n)).copy()
+    tend = np.broadcast_to(ajuste.tend, (n_sim, n)).copy()
+    est = np.broadcast_to(ajuste.est, (n_sim, n, PERIODO)).copy()
+    out = np.empty((n_sim, n, horizonte))
+    phi = AMORTIGUACION
+    for h in range(horizonte):
+        m = (ajuste.n_meses + h) % PERIODO
+        y = nivel + phi * tend + est[..., m] + _muestras(r, k, (n_sim, n), rng)
+        out[..., h] = y
+        nivel_ant = nivel
+        nivel = a * (y - est[..., m]) + (1 - a) * (nivel + phi * tend)
+        tend = b * (nivel - nivel_ant) + (1 - b) * phi * tend
+        est[..., m] = g * (y - nivel) + (1 - g) * est[..., m]
+    return out
+
+
+def _desviaciones_ingenuo(Y: np.ndarray, horizonte: int, n_sim: int, rng: np.random.Generator) -> np.ndarray:
+    """Cuantiles (2, series, horizonte) del error del ingenuo estacional: paseo aleatorio de
+    diferencias interanuales remuestreadas, un paso por cada ciclo transcurrido."""
+    r, k = _compactar(Y[:, PERIODO:] - Y[:, :-PERIODO])
+    ciclos = np.cumsum(_muestras(r, k, (n_sim, -(-horizonte // PERIODO), len(k)), rng), axis=1)
+    sim = ciclos[:, np.arange(horizonte) // PERIODO, :].transpose(0, 2, 1)
+    return np.quantile(sim, CUANTILES_INTERVALO, axis=0)
+
+
+def desviaciones(cubo: CuboSeries, horizonte: int, n_sim: int = N_BOOTSTRAP, semilla: int = 0) -> np.ndarray:
+    """Desvíos (2, zona, horizonte, métrica) de los cuantiles del intervalo respecto a la
+    previsión puntual, para todas las series a la vez (por bloques de BLOQUE_SERIES)."""
+    rng = np.random.default_rng(semilla)
+    S, T, M = cubo.valores.shape
+    Y = cubo.valores.transpose(0, 2, 1).reshape(S * M, T)
+    out = np.full((2, S * M, horizonte), np.nan)
+    if T > PERIODO:
+        out[:] = _desviaciones_ingenuo(Y, horizonte, n_sim, rng)
+        largas = np.flatnonzero((~np.isnan(Y)).sum(axis=1) >= MIN_OBS_HW)
+        for i in range(0, len(largas), BLOQUE_SERIES):
+            filas = largas[i:i + BLOQUE_SERIES]
+            ajuste = ajustar_hw(Y[filas])
+            sim = simular_hw(ajuste, horizonte, n_sim, rng)
+            out[:, filas] = np.quantile(sim, CUANTILES_INTERVALO, axis=0) - ajuste.proyectar(horizonte)
+    return out.reshape(2, S, M, horizonte).transpose(0, 1, 3, 2)
+
+
+def con_intervalos(df_fore: pd.DataFrame, df_hist: pd.DataFrame, n_sim: int = N_BOOTSTRAP,
+                   semilla: int = 0) -> pd.DataFrame:
+    """Copia de los forecasts con `<col>_P10` / `<col>_P90` para cada métrica que también está
+    en el histórico. Los desvíos del bootstrap se aplican sobre el valor previsto de la tabla,
+    venga del Excel o de `generar`."""
+    cols = [c for c in columnas_ocupacion(df_hist) if c in df_fore.columns]
+    out = df_fore.copy()
+    if not cols or not len(df_fore):
+        return out
+    cubo = cubo_historico(df_hist, cols)
+    fin = cubo.t0 + cubo.n_meses
+    h = (pd.to_numeric(df_fore["AÑO"]) * 12 + pd.to_numeric(df_fore["MES"]) - 1 - fin).to_numpy(dtype=float)
+    zi = df_fore["ZONA_TURISTICA"].astype(str).map({z: i for i, z in enumerate(cubo.zonas)}).to_numpy(dtype=float)
+    validas = ~np.isnan(h) & ~np.isnan(zi) & (h >= 0)
+    if not validas.any():
+        return out
+    h_max = int(h[validas].max()) + 1
+    desv = desviaciones(cubo, h_max, n_sim, semilla)
+    zi, h = zi[validas].astype(int), h[validas].astype(int)
+    for k, c in enumerate(cols):
+        punto = pd.to_numeric(df_fore[c], errors="coerce").to_numpy(dtype=float)
+        for j, sufijo in enumerate(SUFIJOS_INTERVALO):
+            v = np.full(len(df_fore), np.nan)
+            v[validas] = punto[validas] + desv[j, zi, h, k]
+            # el intervalo siempre contiene al valor previsto y está en [0, 100]
+            v = np.minimum(v, punto) if j == 0 else np.maximum(v, punto)
+            out[c + sufijo] = np.clip(v, 0, 100)
+    return out
+
+
+def obsoleto(df_fore: pd.DataFrame, df_hist: pd.DataFrame) -> bool:
+    """True si el histórico ya llega al primer mes previsto (los forecasts son de una versión anterior)
+    o si los forecasts no tienen ningún mes válido. Ignora las filas con AÑO o MES vacíos."""
+    def meses(df):
+        if not {"AÑO", "MES"} <= set(df.columns):
+            return pd.Series(dtype=float)
+        return (pd.to_numeric(df["AÑO"], errors="coerce") * 12 + pd.to_numeric(df["MES"], errors="coerce")).dropna()
+
+    t_fore = meses(df_fore) if df_fore is not None else pd.Series(dtype=float)
+    if not len(t_fore):
+        return True
+    t_hist = meses(df_hist)
+    return bool(len(t_hist)) and t_hist.max() >= t_fore.min()
+
+
+def evaluar(cubo: CuboSeries, meses: int = 12) -> dict:
+    """Error absoluto medio de Holt-Winters y del ingenuo estacional reservando los últimos `meses`."""
+    S, T, M = cubo.valores.shape
+    Y = cubo.valores.transpose(0, 2, 1).reshape(S * M, T)
+    ajuste, real = Y[:, :T - meses], Y[:, T - meses:]
+    largas = (~np.isnan(ajuste)).sum(axis=1) >= MIN_OBS_HW
+    hw = holt_winters(ajuste[largas], meses)[0]
+    ing = ingenuo_estacional(ajuste[largas], meses)
+    mae = lambda p: float(np.nanmean(np.abs(np.clip(p, 0, 100) - real[largas])))
+    return {"series": int(largas.sum()), "meses": meses, "mae_holt_winters": round(mae(hw), 3),
+            "mae_ingenuo_estacional": round(mae(ing), 3)}
+
+
+def main():
+    import datos
+
+    ap = argparse.ArgumentParser(description="Regenera los forecasts de ocupación a partir del histórico.")
+    ap.add_argument("--años", type=int, default=HORIZONTE_AÑOS, help="años previstos tras el último del histórico")
+    ap.add_argument("--salida", type=Path, default=datos.FORECASTS_XLSX)
+    ap.add_argument("--evaluar", type=int, metavar="MESES", help="solo mide el error reservando los últimos MESES")
+    args = ap.parse_args()
+
+    df_hist = datos.instantanea_datos().df
+    if args.evaluar:
+        print(json.dumps(evaluar(cubo_historico(df_hist), args.evaluar), ensure_ascii=False, indent=2))
+        return
+    t0 = time.perf_counter()
+    df = generar(df_hist, args.años)
+    dt = time.perf_counter() - t0
+    tmp = args.salida.with_name(f".{args.salida.stem}.tmp.xlsx")
+    df.to_excel(tmp, index=False)
+    os.replace(tmp, args.salida)
+    print(json.dumps({"salida": str(args.salida), "filas": len(df), "zonas": int(df["ZONA_TURISTICA"].nunique()),
+                      "desde": f"{df['AÑO'].min()}-{df['MES'].iloc[0]:02d}", "hasta": int(df["AÑO"].max()),
+                      "segundos": round(dt, 2)}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
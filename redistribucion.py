@@ -0,0 +1,163 @@
+# Proyecto RedisTour
+# Plan de redistribución de un mes: reparte el exceso de viajeros de todas las zonas
+# saturadas entre zonas parecidas con margen de ocupación.
+#
+# Es un problema de transporte resuelto como programa lineal (HiGHS, vía scipy):
+#   - oferta: exceso de cada zona con índice de saturación > umbral, es decir, la parte de
+#     sus viajeros que sobra para bajar el índice hasta el umbral;
+#   - capacidad: margen de cada zona no saturada hasta la ocupación objetivo, suponiendo
+#     que sus plazas son las que implican sus viajeros y su ocupación actuales;
+#   - aristas: de cada zona saturada a sus k vecinos más parecidos entre las zonas con
+#     margen, con coste = distancia combinada atributos + textos del recomendador.
+# Cada origen tiene además una variable "sin destino" con un coste mayor que cualquier
+# distancia, así que el problema siempre es factible y se reubica todo lo que cabe.
+
+import io
+import json
+import time
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from busqueda import PerfilesZona
+from instrumentacion import importar, medido
+from saturacion import IndiceSaturacion, UMBRAL_SATURACION
+
+# ocupación (%) hasta la que se considera que una zona puede recibir viajeros
+OCUPACION_OBJETIVO = 70.0
+# destinos candidatos de cada zona saturada
+VECINOS_REDISTRIBUCION = 10
+# coste por viajero que se queda sin destino: mayor que la distancia coseno máxima (2)
+PENALIZACION_SIN_DESTINO = 3.0
+# flujos por debajo de este nº de viajeros se descartan del plan
+MIN_VIAJEROS_FLUJO = 1.0
+
+COLUMNAS_FLUJOS = ["ORIGEN", "DESTINO", "VIAJEROS", "SIMILITUD", "SATURACION_ORIGEN", "SATURACION_DESTINO",
+                   "OCUPACION_DESTINO", "OCUPACION_DESTINO_TRAS"]
+COLUMNAS_ORIGENES = ["ZONA_TURISTICA", "SATURACION", "VIAJEROS", "EXCESO", "REUBICADO", "SIN_DESTINO"]
+
+
+@dataclass(frozen=True)
+class PlanRedistribucion:
+    """Resultado del optimizador para un mes: flujos origen → destino y balance por zona saturada."""
+    año: int
+    mes: int
+    parametros: dict
+    flujos: pd.DataFrame
+    origenes: pd.DataFrame
+    estado: str
+    segundos: float
+    generado: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="seconds"))
+
+    def resumen(self) -> dict:
+        exceso = float(self.origenes["EXCESO"].sum())
+        reubicado = float(self.origenes["REUBICADO"].sum())
+        return {
+            "zonas_saturadas": len(self.origenes),
+            "destinos": int(self.flujos["DESTINO"].nunique()),
+            "exceso": exceso,
+            "reubicado": reubicado,
+            "pct_reubicado": 100.0 * reubicado / exceso if exceso else 0.0,
+            "similitud_media": float(np.average(self.flujos["SIMILITUD"], weights=self.flujos["VIAJEROS"]))
+            if len(self.flujos) else None,
+        }
+
+
+def _vacio(año: int, mes: int, parametros: dict, origenes: pd.DataFrame, estado: str, t0: float):
+    return PlanRedistribucion(año, mes, parametros, pd.DataFrame(columns=COLUMNAS_FLUJOS),
+                              origenes, estado, time.perf_counter() - t0)
+
+
+@medido("Plan de redistribución", filas=lambda r: len(r.origenes))
+def planificar(indice: IndiceSaturacion, perfiles: PerfilesZona, año: int, mes: int,
+               umbral: float = UMBRAL_SATURACION, ocupacion_objetivo: float = OCUPACION_OBJETIVO,
+               peso_texto: float = 0.0, k: int = VECINOS_REDISTRIBUCION) -> PlanRedistribucion:
+    """Plan óptimo de un mes para todas las zonas con índice de saturación > `umbral`."""
+    t0 = time.perf_counter()
+    parametros = {"umbral": float(umbral), "ocupacion_objetivo": float(ocupacion_objetivo),
+                  "peso_texto": float(peso_texto), "vecinos": int(k)}
+    # solo zonas del recomendador (tienen perfil de similitud) con índice, ocupación y viajeros ese mes
+    corte = indice.corte(año, mes).reindex(perfiles.zonas)
+    s, o, v = (corte[c].to_numpy() for c in ["SATURACION", "OCUPACION", "VIAJEROS"])
+    valida = np.isfinite(s) & np.isfinite(v) & (v > 0)
+
+    es_origen = valida & (s > umbral)
+    es_destino = valida & (s < umbral) & np.isfinite(o) & (o > 0) & (o < ocupacion_objetivo)
+    orig, dest = np.flatnonzero(es_origen), np.flatnonzero(es_destino)
+    exceso = v[orig] * (s[orig] - umbral) / s[orig]
+    margen = v[dest] * (ocupacion_objetivo - o[dest]) / o[dest]
+
+    origenes = pd.DataFrame({
+        "ZONA_TURISTICA": [perfiles.zonas[i] for i in orig],
+        "SATURACION": s[orig], "VIAJEROS": v[orig], "EXCESO": exceso,
+        "REUBICADO": 0.0, "SIN_DESTINO": exceso,
+    }, columns=COLUMNAS_ORIGENES)
+    if not len(orig):
+        return _vacio(año, mes, parametros, origenes, "No hay zonas por encima del umbral", t0)
+    if not len(dest):
+        return _vacio(año, mes, parametros, origenes, "No hay zonas con margen de ocupación", t0)
+
+    # aristas: los k destinos con margen más parecidos a cada origen (coste = distancia combinada)
+    D = np.clip(perfiles.matriz_distancias(orig, peso_texto)[:, dest], 0.0, 2.0)
+    k = min(k, len(dest))
+    cand = np.argpartition(D, k - 1, axis=1)[:, :k] if k < len(dest) else np.tile(np.arange(len(dest)), (len(orig), 1))
+    a_orig = np.repeat(np.arange(len(orig)), k)
+    a_dest = cand.ravel()
+    coste = D[a_orig, a_dest]
+
+    # variables: [flujo de cada arista | viajeros sin destino de cada origen]
+    n_a, n_o = len(a_orig), len(orig)
+    sparse = importar("scipy.sparse")
+    A_eq = sparse.hstack([sparse.csr_matrix((np.ones(n_a), (a_orig, np.arange(n_a))), shape=(n_o, n_a)),
+                          sparse.identity(n_o, format="csr")], format="csr")
+    A_ub = sparse.hstack([sparse.csr_matrix((np.ones(n_a), (a_dest, np.arange(n_a))), shape=(len(dest), n_a)),
+                          sparse.csr_matrix((len(dest), n_o))], format="csr")
+    # en miles de viajeros para que el solver trabaje con magnitudes parecidas
+    escala = 1000.0
+    res = importar("scipy.optimize").linprog(
+        np.concatenate([coste, np.full(n_o, PENALIZACION_SIN_DESTINO)]),
+        A_ub=A_ub, b_ub=margen / escala, A_eq=A_eq, b_eq=exceso / escala,
+        bounds=(0, None), method="highs")
+    if res.status != 0:
+        return _vacio(año, mes, parametros, origenes, f"Sin solución: {res.message}", t0)
+
+    x = res.x[:n_a] * escala
+    origenes["SIN_DESTINO"] = res.x[n_a:] * escala
+    origenes["REUBICADO"] = origenes["EXCESO"] - origenes["SIN_DESTINO"]
+    usados = x >= MIN_VIAJEROS_FLUJO
+    llegan = np.bincount(a_dest[usados], weights=x[usados], minlength=len(dest))
+    di = a_dest[usados]
+    flujos = pd.DataFrame({
+        "ORIGEN": [perfiles.zonas[orig[i]] for i in a_orig[usados]],
+        "DESTINO": [perfiles.zonas[dest[j]] for j in di],
+        "VIAJEROS": x[usados],
+        "SIMILITUD": 100.0 * (1.0 - coste[usados]),
+        "SATURACION_ORIGEN": s[orig[a_orig[usados]]],
+        "SATURACION_DESTINO": s[dest[di]],
+        "OCUPACION_DESTINO": o[dest[di]],
+        # la ocupación crece en proporción a los viajeros que llegan (plazas constantes)
+        "OCUPACION_DESTINO_TRAS": o[dest[di]] * (1.0 + llegan[di] / v[dest[di]]),
+    }, columns=COLUMNAS_FLUJOS).sort_values(["ORIGEN", "VIAJEROS"], ascending=[True, False], ignore_index=True)
+    origenes = origenes.sort_values("EXCESO", ascending=False, ignore_index=True)
+    return PlanRedistribucion(año, mes, parametros, flujos, origenes, "Óptimo", time.perf_counter() - t0)
+
+
+def exportar_plan(plan: PlanRedistribucion) -> bytes:
+    """ZIP con los flujos y el balance por zona (CSV) y un manifest.json con los parámetros del plan."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("flujos.csv", plan.flujos.round(2).to_csv(index=False))
+        zf.writestr("origenes.csv", plan.origenes.round(2).to_csv(index=False))
+        manifest = {
+            "año": plan.año,
+            "mes": plan.mes,
+            "generado": plan.generado,
+            "parametros": plan.parametros,
+            "estado": plan.estado,
+            "resumen": plan.resumen(),
+        }
+        zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    return buf.getvalue()
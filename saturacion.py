@@ -0,0 +1,184 @@
+# Proyecto RedisTour
+# Índice de saturación por zona y mes (0-100). Combina tres señales, cada una en [0, 1]:
+#   - ocupación: media de los grados de ocupación (histórico y, después, forecasts);
+#   - presión de volumen: viajeros del mes frente a la media mensual de la propia zona
+#     (en los meses previstos, el perfil estacional medio de ese mes), como r / (1 + r);
+#   - concentración estacional: coeficiente de variación del perfil mensual de la zona.
+# Se calcula una vez por versión de datos sobre la rejilla completa zona x mes con
+# operaciones de arrays; mapa, recomendador y KPIs solo hacen lecturas indexadas. Con un
+# paquete vigente (ver paquete.py) la rejilla ya viene calculada y se mapea de disco.
+
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import datos
+from instrumentacion import importar, medido
+
+# peso de cada componente en el índice (los que faltan en una celda se reparten entre el resto)
+PESOS_SATURACION = {"ocupacion": 0.5, "volumen": 0.3, "estacionalidad": 0.2}
+COMPONENTES = list(PESOS_SATURACION)
+# a partir de este índice una zona-mes se considera saturada
+UMBRAL_SATURACION = 55.0
+
+
+def _rejilla(df: pd.DataFrame, cols: list[str], pos: dict[str, int], t0: int, n_t: int,
+             suma: bool) -> np.ndarray:
+    """(zona, mes) con la suma (o la media) por fila de `cols`; NaN si la fila no tiene ningún dato."""
+    out = np.full((len(pos), n_t), np.nan)
+    cols = [c for c in cols if c in df.columns]
+    if not cols or not len(df):
+        return out
+    zi = df["ZONA_TURISTICA"].astype(str).map(pos)
+    t = pd.to_numeric(df["AÑO"], errors="coerce") * 12 + pd.to_numeric(df["MES"], errors="coerce") - 1 - t0
+    vals = df[cols].apply(pd.to_numeric, errors="coerce")
+    fila = vals.sum(axis=1, min_count=1) if suma else vals.mean(axis=1)
+    ok = (zi.notna() & t.notna() & fila.notna()).to_numpy()
+    zi, t, fila = zi.to_numpy()[ok].astype(int), t.to_numpy()[ok].astype(int), fila.to_numpy()[ok]
+    acc = np.zeros_like(out)
+    n = np.zeros_like(out)
+    np.add.at(acc, (zi, t), fila)
+    np.add.at(n, (zi, t), 1)
+    # varias filas del mismo (zona, mes): viajeros se suman, la ocupación se promedia
+    return np.where(n > 0, acc if suma else acc / np.maximum(n, 1), np.nan)
+
+
+def _presion(r: np.ndarray) -> np.ndarray:
+    return r / (1.0 + r)
+
+
+@dataclass(frozen=True)
+class IndiceSaturacion:
+    """Índice (zona, mes) y sus componentes (zona, mes, componente), con NaN donde no hay datos."""
+    zonas: list[str]
+    t0: int  # año * 12 + mes - 1 de la primera columna
+    valores: np.ndarray
+    componentes: np.ndarray
+    viajeros: np.ndarray  # observados o, en meses previstos, media de la zona × perfil estacional
+    ultimo_historico: int  # último mes con datos observados (los siguientes son previsión)
+
+    @cached_property
+    def _pos(self) -> dict[str, int]:
+        return {z: i for i, z in enumerate(self.zonas)}
+
+    def _t(self, año: int, mes: int) -> int:
+        return int(año) * 12 + int(mes) - 1 - self.t0
+
+    def valor(self, zona: str, año: int, mes: int) -> float | None:
+        i, t = self._pos.get(str(zona)), self._t(año, mes)
+        if i is None or not 0 <= t < self.valores.shape[1] or np.isnan(self.valores[i, t]):
+            return None
+        return float(self.valores[i, t])
+
+    def por_zonas(self, zonas: list[str], año: int, mes: int) -> dict[str, float | None]:
+        return {z: self.valor(z, año, mes) for z in zonas}
+
+    def buscar(self, zonas, años, meses) -> np.ndarray:
+        """Índice de muchas celdas a la vez (arrays o Series alineadas); NaN fuera de la rejilla."""
+        i = pd.Series(np.asarray(zonas, dtype=str)).map(self._pos).to_numpy(dtype=float)
+        t = np.asarray(años, dtype=float) * 12 + np.asarray(meses, dtype=float) - 1 - self.t0
+        ok = ~np.isnan(i) & (t >= 0) & (t < self.valores.shape[1])
+        out = np.full(len(i), np.nan)
+        out[ok] = self.valores[i[ok].astype(int), t[ok].astype(int)]
+        return out
+
+    def corte(self, año: int, mes: int) -> pd.DataFrame:
+        """Corte de un mes: índice, ocupación media (%) y viajeros de cada zona (NaN sin datos)."""
+        t = self._t(año, mes)
+        if not 0 <= t < self.valores.shape[1]:
+            return pd.DataFrame(np.nan, index=pd.Index(self.zonas, name="ZONA_TURISTICA"),
+                                columns=["SATURACION", "OCUPACION", "VIAJEROS"])
+        return pd.DataFrame({
+            "SATURACION": self.valores[:, t].astype(float),
+            "OCUPACION": 100.0 * self.componentes[:, t, 0].astype(float),
+            "VIAJEROS": self.viajeros[:, t].astype(float),
+        }, index=pd.Index(self.zonas, name="ZONA_TURISTICA"))
+
+    def media(self, zonas: list[str], años: tuple[int, int], meses: list[int]) -> float | None:
+        """Media del índice en las celdas observadas de un conjunto de zonas y periodo."""
+        filas = [self._pos[z] for z in zonas if z in self._pos]
+        t = np.array([self._t(a, m) for a in range(int(años[0]), int(años[1]) + 1) for m in meses])
+        t = t[(t >= 0) & (t < self.valores.shape[1])]
+        if not filas or not len(t):
+            return None
+        bloque = self.valores[np.ix_(filas, t)]
+        return float(np.nanmean(bloque)) if np.isfinite(bloque).any() else None
+
+
+def calcular(df_hist: pd.DataFrame, df_fore: pd.DataFrame | None) -> IndiceSaturacion:
+    """Índice sobre la rejilla que va del primer mes del histórico al último previsto."""
+    fuentes = [df_hist] + ([df_fore] if df_fore is not None and len(df_fore) else [])
+    zonas = sorted(set().union(*(f["ZONA_TURISTICA"].dropna().astype(str) for f in fuentes)))
+    pos = {z: i for i, z in enumerate(zonas)}
+    t_abs = pd.concat([pd.to_numeric(f["AÑO"], errors="coerce") * 12 + pd.to_numeric(f["MES"], errors="coerce") - 1
+                       for f in fuentes]).dropna()
+    t0 = int(t_abs.min()) if len(t_abs) else 0
+    n_t = int(t_abs.max()) - t0 + 1 if len(t_abs) else 0
+    mes_cal = (t0 + np.arange(n_t)) % 12
+
+    viajeros = _rejilla(df_hist, datos.VIAJEROS_COLS, pos, t0, n_t, suma=True)
+    ocupacion = _rejilla(df_hist, datos.OCUPACION_COLS, pos, t0, n_t, suma=False)
+    observado = ~np.isnan(viajeros) | ~np.isnan(ocupacion)
+    ultimo = int(np.flatnonzero(observado.any(axis=0)).max()) if observado.any() else -1
+    if df_fore is not None:
+        # los forecasts solo rellenan meses posteriores al histórico
+        prevista = _rejilla(df_fore, datos.OCUPACION_COLS, pos, t0, n_t, suma=False)
+        prevista[:, :ultimo + 1] = np.nan
+        ocupacion = np.where(np.isnan(ocupacion), prevista, ocupacion)
+
+    # perfil estacional de cada zona: media de cada mes del calendario / media mensual de la zona
+    base = np.where(np.isnan(viajeros).all(axis=1), np.nan,
+                    np.nansum(viajeros, axis=1) / np.maximum((~np.isnan(viajeros)).sum(axis=1), 1))
+    por_mes = np.full((len(zonas), 12), np.nan)
+    for m in range(12):
+        bloque = viajeros[:, mes_cal == m]
+        n = (~np.isnan(bloque)).sum(axis=1)
+        por_mes[:, m] = np.where(n > 0, np.nansum(bloque, axis=1) / np.maximum(n, 1), np.nan)
+    base_ok = np.where(base > 0, base, np.nan)
+    perfil = por_mes / base_ok[:, None]
+
+    r = viajeros / base_ok[:, None]
+    futuro = np.arange(n_t) > ultimo
+    r[:, futuro] = perfil[:, mes_cal[futuro]]
+    viajeros[:, futuro] = base_ok[:, None] * r[:, futuro]
+    n_perfil = (~np.isnan(perfil)).sum(axis=1)
+    media_perfil = np.nansum(perfil, axis=1) / np.maximum(n_perfil, 1)
+    var = np.nansum((perfil - media_perfil[:, None]) ** 2, axis=1) / np.maximum(n_perfil, 1)
+    cv = np.where(n_perfil >= 2, np.sqrt(var) / np.where(media_perfil > 0, media_perfil, np.nan), np.nan)
+
+    comp = np.stack([
+        np.clip(ocupacion / 100.0, 0, 1),
+        _presion(r),
+        np.broadcast_to(_presion(cv)[:, None], (len(zonas), n_t)),
+    ], axis=-1)
+    pesos = np.array([PESOS_SATURACION[c] for c in COMPONENTES])
+    hay = ~np.isnan(comp)
+    suma_pesos = (hay * pesos).sum(axis=-1)
+    valores = np.where(suma_pesos > 0, 100 * np.nansum(comp * pesos, axis=-1) / np.maximum(suma_pesos, 1e-12), np.nan)
+    # sin ocupación ni volumen (p. ej. meses anteriores a la zona) no hay índice
+    valores[np.isnan(comp[..., 0]) & np.isnan(comp[..., 1])] = np.nan
+    return IndiceSaturacion(zonas, t0, valores.astype(np.float32), comp.astype(np.float32),
+                            viajeros.astype(np.float32), ultimo + t0)
+
+
+@medido("Índice de saturación", filas=lambda r: r.valores.size,
+        cache=st.cache_resource(show_spinner=False, max_entries=2))
+def _indice_saturacion(_df_hist: pd.DataFrame, version: int, generacion: int) -> IndiceSaturacion:
+    return calcular(_df_hist, datos._cargar_forecasts(generacion)[0])
+
+
+def _del_paquete() -> IndiceSaturacion | None:
+    paq = importar("paquete").paquete_vigente()
+    return paq.indice_saturacion if paq is not None else None
+
+
+def indice_saturacion() -> IndiceSaturacion:
+    # del paquete si lo hay: así el proceso no carga los forecasts (ni sus intervalos) solo para el índice
+    indice = _del_paquete()
+    if indice is not None:
+        return indice
+    snap = datos.instantanea_datos()
+    return _indice_saturacion(snap.df, snap.version, datos.generacion_actual())
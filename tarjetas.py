@@ -0,0 +1,267 @@
+# Proyecto RedisTour
+# Tarjetas de resultados de los dos recomendadores. La parte estática de cada zona
+# (título, Comunidad · Provincia, descripción y resumen de opiniones) se genera una vez
+# por generación de datos; en cada búsqueda solo se rellenan los chips de ocupación y la
+# similitud. Las opiniones no viajan con las tarjetas: se sirven por páginas, al
+# desplegarlas, desde un almacén por generación con los textos ya escapados.
+
+import html
+import secrets
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+import streamlit as st
+
+from datos import BASE, generacion_actual, _cargar_opiniones_zt, _mapa_descripciones, _mapa_localizacion
+from instrumentacion import medir
+from opiniones import _resumen_por_zona
+
+LOGOS_DIR = BASE / "Logos"
+
+OCC_LABELS = {
+    "Hotel": "🏨 Hotel",
+    "Turismo rural": "🏡 Rural",
+    "Apartamentos": "🏢 Apart.",
+    "Camping": "⛺ Camping",
+}
+
+CSS_TARJETAS = """
+<style>
+.desc-card{
+  background:#fff;border:1px solid #d9e2ea;border-radius:16px;
+  padding:14px 16px;box-shadow:0 4px 14px rgba(0,0,0,0.06);
+  font-family:Satoshi,system-ui;overflow:visible;margin-bottom:10px;
+}
+.sel{border:2px solid #306388;}
+.header-row{display:flex;justify-content:space-between;align-items:flex-start;gap:8px;margin-bottom:6px;}
+.title-block{display:flex;flex-direction:column;min-width:0;}
+.badges{display:flex;gap:8px;flex-wrap:wrap;margin:0;}
+.badge{background:#e6eaed;color:#224762;border-radius:999px;padding:2px 10px;font-size:.75rem;font-weight:600;}
+.card-title{font-weight:800;color:#224762;margin:0 0 2px 0;font-size:1.05rem;}
+.meta{color:#4a5a67;font-size:.92rem;margin:0;}
+.kpis-head{font-weight:700;color:#224762;font-size:.88rem;margin:4px 0 6px 0;}
+.kpis{display:flex;gap:8px;flex-wrap:wrap;margin:0 0 8px 0;}
+.kpi{background:#f5f7f9;border:1px solid #e5eef5;border-radius:10px;padding:6px 10px;font-size:.86rem;color:#224762;}
+.rango{color:#6b7f8f;font-size:.78rem;}
+.kpi2{background:#e9eff3;border:1px solid #e5eef5;border-radius:3px;padding:6px 10px;font-size:.86rem;color:#224762;}
+.desc-body{color:#3a4b59;margin:0;line-height:1.35;font-size:0.95rem;}
+.reviews-wrap { background:#f7f9fb; border:1px solid #e5eef5; border-radius:10px; padding:8px 10px; margin-bottom:6px; }
+.reviews-list { margin:0 0 0 16px; color:#3a4b59; font-size:0.92rem; }
+.reviews-list li { margin-bottom:6px; }
+</style>
+"""
+
+BADGE_SELECCIONADA = "<span class='badge'>Seleccionada</span>"
+
+# tarjetas por página en listas largas de resultados
+RESULTADOS_POR_PAGINA = 10
+# opiniones por página del panel de cada tarjeta
+OPINIONES_POR_PAGINA = 5
+
+
+def format_pct(x, nan_txt="-"):
+    try:
+        return f"{float(x):.1f}%"
+    except Exception:
+        return nan_txt
+
+
+def _is_num(x):
+    try:
+        return (x is not None) and (not (isinstance(x, float) and np.isnan(x)))
+    except Exception:
+        return False
+
+
+@dataclass(frozen=True)
+class FragmentoZona:
+    """HTML estático de la tarjeta de una zona."""
+    cabecera: str
+    descripcion: str
+    opiniones: str = ""
+
+
+@st.cache_resource(show_spinner=False, max_entries=4096)
+def _fragmento_zona(zona: str, generacion: int) -> FragmentoZona:
+    ca, pr = _mapa_localizacion(generacion).get(zona.strip(), ("—", "—"))
+    desc = _mapa_descripciones(generacion).get(zona, "Sin descripción disponible.")
+    res = _resumen_por_zona(generacion).get(zona)
+    opiniones = ""
+    if res and res["N_OPINIONES"]:
+        claves = html.escape(res["PALABRAS_CLAVE"]) or "—"
+        n_fmt = f"{res['N_OPINIONES']:,}".replace(",", ".")
+        opiniones = ("<div class='kpis-head'>Lo que dicen los viajeros</div><div class='kpis'>"
+                     f"<div class='kpi'>💬 <b>{n_fmt}</b> opiniones</div>"
+                     f"<div class='kpi' title='Tono medio por léxico: {res['TONO']:+.2f} (de -1 a 1)'>"
+                     f"👍 <b>{res['PCT_POSITIVAS']:.0f}%</b> positivas · 👎 {res['PCT_NEGATIVAS']:.0f}%</div>"
+                     f"<div class='kpi'>🔑 {claves}</div></div>")
+    return FragmentoZona(
+        cabecera=(f"<div class='title-block'><div class='card-title'>{zona}</div>"
+                  f"<div class='meta'>{ca} · {pr}</div></div>"),
+        descripcion=f"<p class='desc-body'>{desc}</p>",
+        opiniones=opiniones,
+    )
+
+
+def fragmento_zona(zona: str) -> FragmentoZona:
+    return _fragmento_zona(str(zona), generacion_actual())
+
+
+def _rango(itv) -> str:
+    if not itv:
+        return ""
+    return (f" <span class='rango' title='Intervalo de predicción del 80%'>"
+            f"{itv[0]:.0f}–{itv[1]:.0f}%</span>")
+
+
+def _bloque_ocupacion(r: dict) -> str:
+    si = r.get("similitud") or "No hay datos"
+    oc = r.get("ocups") if isinstance(r.get("ocups"), dict) else {}
+    itv = r.get("intervalos") or {}
+    chips = "".join(f"<div class='kpi'>{OCC_LABELS[t]}: <b>{format_pct(oc[t])}</b>{_rango(itv.get(t))}</div>"
+                    for t in OCC_LABELS if _is_num(oc.get(t)))
+    if not chips:
+        chips = "<div class='kpi'>No hay datos disponibles de ocupación</div>"
+    if _is_num(r.get("saturacion")):
+        chips += (f"<div class='kpi' title='Índice de saturación (0-100): ocupación, volumen y estacionalidad'>"
+                  f"🔥 Saturación: <b>{r['saturacion']:.0f}/100</b></div>")
+    return ("<div class='kpis-head'>Índices de saturación disponibles</div><div class='kpis'>"
+            f"{chips}<div class='kpi2' title='Porcentaje de similitud de perfil'>Similitud: <b>{si}</b></div></div>")
+
+
+# =========================
+# OPINIONES (por páginas)
+# =========================
+@dataclass(frozen=True)
+class AlmacenOpiniones:
+    """Opiniones de todas las zonas, escapadas, en una sola tupla; cada zona es un tramo [ini, fin)."""
+    textos: tuple[str, ...]
+    tramos: dict
+
+    def numero(self, zona: str) -> int:
+        ini, fin = self.tramos.get(zona, (0, 0))
+        return fin - ini
+
+    def pagina(self, zona: str, pagina: int, semilla: int, por_pagina: int = OPINIONES_POR_PAGINA) -> list[str]:
+        """Opiniones de una página en un orden aleatorio fijo para (semilla, zona)."""
+        ini, fin = self.tramos.get(zona, (0, 0))
+        orden = np.random.default_rng([semilla, zlib.crc32(zona.encode("utf-8"))]).permutation(fin - ini)
+        return [self.textos[ini + i] for i in orden[pagina * por_pagina:(pagina + 1) * por_pagina]]
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _almacen_opiniones(generacion: int) -> AlmacenOpiniones:
+    textos, tramos = [], {}
+    for zona, opiniones in _cargar_opiniones_zt(generacion)[0].items():
+        tramos[zona] = (len(textos), len(textos) + len(opiniones))
+        textos.extend(f"<li>{html.escape(str(op))}</li>" for op in opiniones)
+    return AlmacenOpiniones(tuple(textos), tramos)
+
+
+def almacen_opiniones() -> AlmacenOpiniones:
+    return _almacen_opiniones(generacion_actual())
+
+
+def _semilla_sesion() -> int:
+    # cada sesión ve siempre la misma muestra de opiniones de una zona
+    if "semilla_opiniones" not in st.session_state:
+        st.session_state.semilla_opiniones = secrets.randbits(32)
+    return st.session_state.semilla_opiniones
+
+
+def _mover_pagina(clave: str, paso: int, n_paginas: int):
+    st.session_state[clave] = min(max(st.session_state.get(clave, 0) + paso, 0), n_paginas - 1)
+
+
+def _panel_opiniones(zona: str):
+    """Opiniones de una zona, solo si el usuario las despliega."""
+    almacen = almacen_opiniones()
+    n = almacen.numero(zona)
+    if not st.toggle(f"🌟 Opiniones de viajeros ({n})", key=f"op_ver_{zona}"):
+        return
+    n_paginas = -(-n // OPINIONES_POR_PAGINA)
+    clave = f"op_pag_{zona}"
+    pagina = min(st.session_state.get(clave, 0), n_paginas - 1)
+    items = "".join(almacen.pagina(zona, pagina, _semilla_sesion()))
+    st.markdown(f"<div class='reviews-wrap'><ul class='reviews-list'>{items}</ul></div>", unsafe_allow_html=True)
+    if n_paginas > 1:
+        c1, c2, c3 = st.columns([1, 6, 1])
+        c1.button("‹", key=f"op_ant_{zona}", disabled=pagina == 0,
+                  on_click=_mover_pagina, args=(clave, -1, n_paginas), use_container_width=True)
+        c2.caption(f"Página {pagina + 1} de {n_paginas}")
+        c3.button("›", key=f"op_sig_{zona}", disabled=pagina >= n_paginas - 1,
+                  on_click=_mover_pagina, args=(clave, 1, n_paginas), use_container_width=True)
+
+
+# como fragmento, paginar las opiniones re-ejecuta solo el panel. Dentro de otro fragmento se pinta
+# sin envolver: los fragmentos anidados re-ejecutan el exterior y se pierde el aislamiento
+panel_opiniones = st.fragment(_panel_opiniones)
+
+
+def _tarjeta(r: dict) -> str:
+    frag = fragmento_zona(r.get("zona", "—"))
+    sel = bool(r.get("seleccionada"))
+    return (f"<div class='desc-card{' sel' if sel else ''}'><div class='header-row'>{frag.cabecera}"
+            "<div class='badges'><span class='badge'>Zona turística</span>"
+            f"{BADGE_SELECCIONADA if sel else ''}</div></div>"
+            f"{_bloque_ocupacion(r)}{frag.opiniones}{frag.descripcion}</div>")
+
+
+def render_zone_result_cards(rows: list[dict], subtitle: str = "", en_fragmento: bool = False):
+    """Pinta las tarjetas de resultados. `rows`: zona, ocups, intervalos, saturacion, similitud y seleccionada.
+
+    `en_fragmento`: la llamada ya está dentro de un fragmento, así que los paneles de opiniones no lo son.
+    """
+    if not rows:
+        return
+
+    colA, colB, colC = st.columns([9, 13, 3])
+    with colA:
+        st.markdown(f"#### {subtitle}")
+
+    with colC:
+        logo_path = LOGOS_DIR / "TripAdvisor_Logo.svg"
+        if logo_path.exists():
+            st.markdown(
+                "<div style='text-align:left;font-size:0.85rem;color:#6b7280;'>Powered by</div>",
+                unsafe_allow_html=True
+            )
+            st.image(str(logo_path), width=120)
+
+    ordered = [r for r in rows if r.get("seleccionada")] + [r for r in rows if not r.get("seleccionada")]
+
+    with medir("Tarjetas HTML", filas=len(ordered)):
+        st.markdown(CSS_TARJETAS, unsafe_allow_html=True)
+        almacen = almacen_opiniones()
+        panel = _panel_opiniones if en_fragmento else panel_opiniones
+        for r in ordered:
+            st.markdown(_tarjeta(r), unsafe_allow_html=True)
+            # las opiniones se piden al desplegar el panel: la tarjeta solo lleva el recuento
+            if almacen.numero(str(r.get("zona"))):
+                panel(str(r.get("zona")))
+
+
+def _ir_a_pagina(clave: str, pagina: int):
+    st.session_state[clave] = pagina
+
+
+@st.fragment
+def resultados_paginados(rows: list[dict], subtitle: str, completar, por_pagina: int = RESULTADOS_POR_PAGINA):
+    """Lista ordenada de resultados por páginas; `completar(filas)` añade a las filas visibles
+    lo que es caro de calcular (la ocupación). Cambiar de página re-ejecuta solo este fragmento.
+    """
+    n_paginas = max(1, -(-len(rows) // por_pagina))
+    pagina = min(st.session_state.get("pag_resultados", 0), n_paginas - 1)
+    visibles = rows[pagina * por_pagina:(pagina + 1) * por_pagina]
+    with medir("Página de resultados", filas=len(visibles)):
+        visibles = completar(visibles)
+    render_zone_result_cards(visibles, subtitle=subtitle, en_fragmento=True)
+    if n_paginas > 1:
+        c1, c2, c3 = st.columns([1, 6, 1])
+        c1.button("‹ Anteriores", key="pag_resultados_ant", disabled=pagina == 0, use_container_width=True,
+                  on_click=_ir_a_pagina, args=("pag_resultados", pagina - 1))
+        c2.caption(f"Resultados {pagina * por_pagina + 1}–{pagina * por_pagina + len(visibles)} de {len(rows)} "
+                   f"· página {pagina + 1} de {n_paginas}")
+        c3.button("Siguientes ›", key="pag_resultados_sig", disabled=pagina >= n_paginas - 1,
+                  use_container_width=True, on_click=_ir_a_pagina, args=("pag_resultados", pagina + 1))
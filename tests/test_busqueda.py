@@ -0,0 +1,92 @@
+# Proyecto RedisTour
+# Búsqueda por texto y puntuación del "Destino alternativo"
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from busqueda import IndiceTexto, analizar, puntuar_alternativas
+
+
+def _candidatos(**cols):
+    base = {"Zona": ["Origen", "A", "B"], "Similitud_num": [100.0, 80.0, 78.0],
+            "SATURACION": [90.0, 70.0, 30.0], "OCC_MEDIA": [80.0, 60.0, 60.0], "TONO": [0.0, 0.0, 0.0]}
+    return pd.DataFrame({**base, **cols})
+
+
+def test_sin_penalizacion_ordena_por_similitud_y_desempata_por_ocupacion():
+    df = _candidatos(Similitud_num=[100.0, 80.0, 80.0], OCC_MEDIA=[80.0, 65.0, 60.0])
+    assert puntuar_alternativas(df, "Origen")["Zona"].tolist() == ["Origen", "B", "A"]
+    # B es algo menos parecida: aunque esté mucho menos saturada, sin la opción va detrás
+    assert puntuar_alternativas(_candidatos(), "Origen")["Zona"].tolist() == ["Origen", "A", "B"]
+
+
+def test_la_penalizacion_por_saturacion_es_opcional():
+    df = puntuar_alternativas(_candidatos(), "Origen", penalizar_saturacion=True)
+    # 80 - 0.5·70 = 45 frente a 78 - 0.5·30 = 63; la zona de partida sigue primero
+    assert df["Zona"].tolist() == ["Origen", "B", "A"]
+    assert df["PUNTUACION"].tolist() == [55.0, 63.0, 45.0]
+
+
+def test_la_ocupacion_no_se_resta_ademas_de_la_saturacion():
+    # misma saturación y similitud: la ocupación solo desempata, no cambia la puntuación
+    df = puntuar_alternativas(_candidatos(Similitud_num=[100.0, 80.0, 80.0], SATURACION=[90.0, 50.0, 50.0],
+                                          OCC_MEDIA=[80.0, 70.0, 40.0]), "Origen", penalizar_saturacion=True)
+    assert df["Zona"].tolist() == ["Origen", "B", "A"]
+    assert df["PUNTUACION"].tolist() == [55.0, 55.0, 55.0]
+
+
+def test_sin_indice_se_usa_la_media_de_los_candidatos():
+    df = puntuar_alternativas(_candidatos(SATURACION=[90.0, None, 30.0]), "Origen", penalizar_saturacion=True)
+    assert df["PUNTUACION"].notna().all()
+
+
+def test_ordenar_por_p90_cambia_el_ranking():
+    # misma similitud y ocupación prevista, pero la previsión de A es mucho más incierta (P90 más alto)
+    prevista = _candidatos(Similitud_num=[100.0, 80.0, 80.0], OCC_MEDIA=[80.0, 60.0, 61.0])
+    p90 = prevista.assign(OCC_MEDIA=[90.0, 75.0, 66.0])
+    assert puntuar_alternativas(prevista, "Origen")["Zona"].tolist() == ["Origen", "A", "B"]
+    assert puntuar_alternativas(p90, "Origen")["Zona"].tolist() == ["Origen", "B", "A"]
+
+
+def test_el_tono_solo_reordena_destinos_casi_igual_de_parecidos():
+    df = _candidatos(Similitud_num=[100.0, 80.0, 79.5], TONO=[0.0, -0.1, 0.2])
+    assert puntuar_alternativas(df, "Origen")["Zona"].tolist() == ["Origen", "B", "A"]
+    # ni el tono máximo frente al mínimo compensa 5 puntos de similitud
+    df = _candidatos(Similitud_num=[100.0, 80.0, 75.0], TONO=[0.0, -1.0, 1.0])
+    assert puntuar_alternativas(df, "Origen")["Zona"].tolist() == ["Origen", "A", "B"]
+
+
+def _indice_texto(docs: dict[str, str]) -> IndiceTexto:
+    # mismo vectorizador que busqueda._indice_texto
+    vec = TfidfVectorizer(analyzer=analizar, sublinear_tf=True, min_df=1, dtype=np.float32)
+    return IndiceTexto(list(docs), vec, vec.fit_transform(list(docs.values())).tocsr())
+
+
+DOCS = {
+    "Costa Brava": "Calas y playas de arena, pueblos marineros y buceo en aguas cristalinas.",
+    "Pirineo": "Montaña, estaciones de esquí, senderismo y pueblos de piedra.",
+    "Sierra Nevada": "Esquí en la montaña más alta de la península y rutas de senderismo.",
+    "Madrid": "Museos, teatros, gastronomía y vida nocturna en la capital.",
+}
+
+
+def test_la_busqueda_por_texto_devuelve_primero_las_zonas_relevantes():
+    ind = _indice_texto(DOCS)
+    res = ind.buscar("esquí en la montaña")
+    assert {z for z, _ in res[:2]} == {"Pirineo", "Sierra Nevada"}
+    assert "Madrid" not in dict(res)
+    puntos = [p for _, p in res]
+    assert puntos == sorted(puntos, reverse=True) and all(0 < p <= 1 + 1e-6 for p in puntos)
+    # sin acentos ni mayúsculas y con otra forma de la palabra encuentra lo mismo
+    assert ind.buscar("PLAYA")[0][0] == "Costa Brava"
+    assert [z for z, _ in ind.buscar("ESQUI montañas")][:2] == [z for z, _ in res[:2]]
+
+
+def test_la_busqueda_por_texto_sin_coincidencias_o_limitada():
+    ind = _indice_texto(DOCS)
+    assert ind.buscar("") == []
+    assert ind.buscar("de la y en") == []
+    assert ind.buscar("volcanes") == []
+    assert len(ind.buscar("pueblos montaña senderismo museos", n=2)) == 2
+    assert ind.buscar("pueblos montaña senderismo museos", n=2) == ind.buscar("pueblos montaña senderismo museos")[:2]
@@ -0,0 +1,24 @@
+# Proyecto RedisTour
+# Caché de consultas compartida: versiones de datos que conviven durante una recarga
+
+from consultas import CacheConsultas
+
+
+def test_versiones_alternas_no_se_borran_entre_si():
+    cache = CacheConsultas(max_bytes=2**20)
+    cache.guardar(("destino", "A"), (1, None), ["v1"])
+    cache.guardar(("destino", "A"), (2, None), ["v2"])
+    # una sesión aún en la versión 1 y otra ya en la 2 leen cada una lo suyo
+    assert cache.obtener(("destino", "A"), (1, None)) == ["v1"]
+    assert cache.obtener(("destino", "A"), (2, None)) == ["v2"]
+    assert cache.obtener(("destino", "A"), (1, None)) == ["v1"]
+
+
+def test_las_versiones_antiguas_salen_por_lru():
+    valor = ["x" * 1000]
+    cache = CacheConsultas(max_bytes=3 * 1200)
+    for v in range(5):
+        cache.guardar(("q",), v, valor)
+    assert cache.obtener(("q",), 0) is None
+    assert cache.obtener(("q",), 4) == valor
+    assert cache.bytes <= cache.max_bytes
@@ -0,0 +1,39 @@
+# Proyecto RedisTour
+# Exportación de la selección: ZIP aceptado por st.download_button y manifiesto coherente
+
+import io
+import json
+import zipfile
+
+import pandas as pd
+from streamlit.elements.widgets.button import convert_data_to_bytes_and_infer_mime
+
+from exportacion import FiltroExportacion, exportar_a_bytes
+
+
+def _hist():
+    return pd.DataFrame({
+        "ZONA_TURISTICA": ["A", "A", "B", "B"],
+        "AÑO": [2023, 2024, 2023, 2024],
+        "MES": [1, 1, 2, 2],
+        "VIAJEROS_EOH": [10.0, 20.0, 30.0, 40.0],
+        "GRADO_OCUPA_PLAZAS_EOH": [50.0, 60.0, 70.0, 80.0],
+    })
+
+
+def test_el_zip_es_un_dato_valido_para_download_button():
+    datos, _ = convert_data_to_bytes_and_infer_mime(
+        exportar_a_bytes(_hist(), None, FiltroExportacion(cols_viajeros=["VIAJEROS_EOH"])),
+        TypeError("tipo no soportado"))
+    with zipfile.ZipFile(io.BytesIO(datos)) as zf:
+        assert set(zf.namelist()) == {"datos.csv", "manifest.json"}
+        assert len(pd.read_csv(zf.open("datos.csv"))) == 4
+
+
+def test_los_filtros_se_aplican_y_constan_en_el_manifiesto():
+    filtro = FiltroExportacion(años=(2024, 2024), zonas=["B"], cols_viajeros=["VIAJEROS_EOH"])
+    with zipfile.ZipFile(io.BytesIO(exportar_a_bytes(_hist(), None, filtro, version="v1"))) as zf:
+        df = pd.read_csv(zf.open("datos.csv"))
+        manifest = json.loads(zf.read("manifest.json"))
+    assert df[["ZONA_TURISTICA", "AÑO", "VIAJEROS_EOH"]].values.tolist() == [["B", 2024, 40.0]]
+    assert manifest["version_datos"] == "v1" and manifest["filas"]["historico"] == 1
@@ -0,0 +1,46 @@
+# Proyecto RedisTour
+# Ranking de zonas del histórico: corte del Top N con empates y crecimiento por tipo
+
+import pandas as pd
+from streamlit.elements.widgets.button import convert_data_to_bytes_and_infer_mime
+
+from historico import RankingZonas
+
+TIPOS = {"Hotel": "VIAJEROS_EOH", "Rural": "VIAJEROS_EOTR"}
+
+
+def _df(filas):
+    return pd.DataFrame(filas, columns=["ZONA_TURISTICA", "AÑO", "MES", "VIAJEROS_EOH", "VIAJEROS_EOTR"])
+
+
+def test_empates_en_el_corte_se_deciden_por_nombre():
+    # cinco zonas con el mismo volumen, en un orden de filas que no es el alfabético
+    df = _df([(z, 2024, 1, 100.0, 0.0) for z in ["E", "C", "A", "D", "B"]])
+    ranking = RankingZonas(df, TIPOS)
+    assert ranking.top(2)["ZONA_TURISTICA"].tolist() == ["A", "B"]
+    assert ranking.top(3)["ZONA_TURISTICA"].tolist() == ["A", "B", "C"]
+
+
+def test_crecimiento_usa_los_meses_con_dato_del_tipo():
+    # el último año tiene hotel de enero a marzo, pero rural solo en enero
+    filas = []
+    for mes in (1, 2, 3):
+        filas.append(("A", 2023, mes, 100.0, 10.0))
+        filas.append(("A", 2024, mes, 110.0, 20.0 if mes == 1 else None))
+    ranking = RankingZonas(_df(filas), TIPOS)
+    # rural: enero de 2024 frente a enero de 2023 (no frente al primer trimestre)
+    assert ranking.puntuaciones("crecimiento", "Rural")[0] == 100.0
+    assert round(ranking.puntuaciones("crecimiento", "Hotel")[0], 6) == 10.0
+
+
+def test_iter_csv_coincide_con_el_ranking_completo():
+    df = _df([(f"Z{i:03d}", 2024, 1, float(i % 7), 1.0) for i in range(40)])
+    ranking = RankingZonas(df, TIPOS)
+    csv = b"".join(ranking.iter_csv("volumen", filas_por_bloque=6)).decode("utf-8")
+    assert csv == ranking.top(None).to_csv(index=False)
+
+
+def test_csv_es_un_dato_valido_para_download_button():
+    ranking = RankingZonas(_df([(z, 2024, 1, float(i), 0.0) for i, z in enumerate("ABC")]), TIPOS)
+    datos, _ = convert_data_to_bytes_and_infer_mime(ranking.csv(), TypeError("tipo no soportado"))
+    assert datos.decode("utf-8").splitlines()[1].startswith("1,C,")
@@ -0,0 +1,96 @@
+# Proyecto RedisTour
+# Ingesta de descargas en el almacén Parquet: misma hoja "Total" que el Excel, versiones y poda
+
+import pandas as pd
+import pytest
+
+import ingesta
+from datos import CLAVE_FILA, _normalize_zone_colnames
+
+pytest.importorskip("pyarrow")
+
+
+def _descargas(carpeta):
+    """EOH en dos ficheros con `;` y coma decimal (un mes repartido entre ambos) y EOAC con `,`."""
+    (carpeta / "eoh_2022.csv").write_text(
+        "Zona turística;Año;Mes;Viajeros;Grado ocupa plazas\n"
+        "Costa;2022;8;1000;80,5\n"
+        "Costa;2022;8;500;70,5\n"
+        "Interior;2022;8;200;30\n"
+        "Interior;2022;13;999;99\n",
+        encoding="latin-1")
+    (carpeta / "eoh_2023.csv").write_text(
+        "Zona turística;Año;Mes;Viajeros;Grado ocupa plazas\n"
+        "Costa;2022;8;100;60,0\n"
+        "Costa;2023;1;300;40,0\n",
+        encoding="utf-8")
+    (carpeta / "eoac_2015_2024.csv").write_text(
+        "ZONA_TURISTICA,AÑO,MES,VIAJEROS,GRADO_OCUPA_PARCELAS\n"
+        "Costa,2022,8,50,90.0\n"
+        "Sierra,2023,1,20,10.0\n",
+        encoding="utf-8")
+
+
+def _hoja_total():
+    """La hoja "Total" equivalente, tal como se publica en DATA_TOTAL.xlsx."""
+    return pd.DataFrame({
+        "ZONA_TURISTICA": ["Costa", "Costa", "Interior", "Sierra"],
+        "AÑO": [2022, 2023, 2022, 2023],
+        "MES": [8, 1, 8, 1],
+        "VIAJEROS_EOH": [1600.0, 300.0, 200.0, None],
+        "VIAJEROS_EOTR": None, "VIAJEROS_EOAP": None,
+        "VIAJEROS_EOAC": [50.0, None, None, 20.0],
+        "GRADO_OCUPA_PLAZAS_EOH": [(80.5 + 70.5 + 60.0) / 3, 40.0, 30.0, None],
+        "GRADO_OCUPA_PLAZAS_EOTR": None, "GRADO_OCUPA_PLAZAS_EOAP": None,
+        "GRADO_OCUPA_PARCELAS_EOAC": [90.0, None, None, 10.0],
+    })
+
+
+def _comparable(df):
+    df = _normalize_zone_colnames(df).sort_values(CLAVE_FILA, ignore_index=True)
+    return df.astype({"AÑO": "int64", "MES": "int64", **{c: "float64" for c in df.columns[3:]}})
+
+
+@pytest.mark.parametrize("filas_por_bloque", [1, 1000])
+def test_el_almacen_coincide_con_la_hoja_total_del_excel(tmp_path, filas_por_bloque):
+    _descargas(tmp_path)
+    ingesta.ingerir(tmp_path, tmp_path / "almacen", filas_por_bloque)
+    excel = tmp_path / "DATA_TOTAL.xlsx"
+    _hoja_total().to_excel(excel, sheet_name="Total", index=False)
+
+    almacen = ingesta.leer_almacen(tmp_path / "almacen")
+    pd.testing.assert_frame_equal(_comparable(almacen), _comparable(pd.read_excel(excel, sheet_name="Total")))
+
+
+def test_una_version_ya_publicada_no_se_reescribe(tmp_path):
+    _descargas(tmp_path)
+    destino = tmp_path / "almacen"
+    m1 = ingesta.ingerir(tmp_path, destino)
+    assert m1["filas_leidas"] == {"EOH": 6, "EOAC": 2}
+    assert m1["zonas"] == 3 and sorted(m1["particiones"]) == ["2022", "2023"]
+    assert ingesta.ingerir(tmp_path, destino)["generado"] == m1["generado"]
+
+    # una descarga nueva publica otra versión y conserva la anterior
+    (tmp_path / "eotr_2024.csv").write_text("ZONA_TURISTICA,AÑO,MES,VIAJEROS\nCosta,2024,2,7\n", encoding="utf-8")
+    m2 = ingesta.ingerir(tmp_path, destino)
+    assert m2["version"] != m1["version"]
+    assert ingesta.leer_manifiesto(destino)["version"] == m2["version"]
+    assert {p.name for p in destino.glob("v_*")} == {m1["directorio"], m2["directorio"]}
+
+
+def test_leer_almacen_solo_lee_los_años_y_columnas_pedidos(tmp_path):
+    _descargas(tmp_path)
+    ingesta.ingerir(tmp_path, tmp_path / "almacen")
+    df = ingesta.leer_almacen(tmp_path / "almacen", años=[2023], columnas=["VIAJEROS_EOH"])
+    assert list(df.columns) == CLAVE_FILA + ["VIAJEROS_EOH"]
+    assert sorted(df["ZONA_TURISTICA"]) == ["Costa", "Sierra"]
+    assert ingesta.leer_almacen(tmp_path / "almacen", años=[1999]).empty
+
+
+def test_sin_descargas_o_sin_columnas_se_rechaza(tmp_path):
+    with pytest.raises(ValueError, match="No hay CSV"):
+        ingesta.ingerir(tmp_path, tmp_path / "almacen")
+    (tmp_path / "eoh.csv").write_text("ZONA_TURISTICA,AÑO,VIAJEROS\nCosta,2022,1\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="faltan columnas"):
+        ingesta.ingerir(tmp_path, tmp_path / "almacen")
+    assert ingesta.leer_manifiesto(tmp_path / "almacen") is None
@@ -0,0 +1,73 @@
+# Proyecto RedisTour
+# Métricas de operación: acumulación y formato de texto de Prometheus
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import metricas
+
+
+@pytest.fixture(autouse=True)
+def _limpias(monkeypatch):
+    monkeypatch.setattr(metricas, "_valores", {})
+    monkeypatch.setattr(metricas, "_medidores", {})
+
+
+def test_contadores_y_medidores_por_etiquetas():
+    metricas.incrementar("redistour_cache_aciertos_total", funcion="a")
+    metricas.incrementar("redistour_cache_aciertos_total", 2, funcion="a")
+    metricas.incrementar("redistour_cache_aciertos_total", funcion='b"c')
+    metricas.fijar("redistour_datos_bytes", 10, frame="df")
+    metricas.fijar("redistour_datos_bytes", 2.5, frame="df")
+    lineas = metricas.exposicion().splitlines()
+    assert "# TYPE redistour_cache_aciertos_total counter" in lineas
+    assert 'redistour_cache_aciertos_total{funcion="a"} 3' in lineas
+    assert 'redistour_cache_aciertos_total{funcion="b\\"c"} 1' in lineas
+    assert 'redistour_datos_bytes{frame="df"} 2.5' in lineas
+    # las métricas sin muestras no se publican
+    assert not any("redistour_mapa_segundos" in l for l in lineas)
+
+
+def test_histograma_con_buckets_acumulados():
+    for s in [0.003, 0.2, 0.2, 50.0]:
+        metricas.observar("redistour_mapa_segundos", s)
+    lineas = metricas.exposicion().splitlines()
+    assert 'redistour_mapa_segundos_bucket{le="0.005"} 1' in lineas
+    assert 'redistour_mapa_segundos_bucket{le="0.1"} 1' in lineas
+    assert 'redistour_mapa_segundos_bucket{le="0.25"} 3' in lineas
+    assert 'redistour_mapa_segundos_bucket{le="30"} 3' in lineas
+    assert 'redistour_mapa_segundos_bucket{le="+Inf"} 4' in lineas
+    assert "redistour_mapa_segundos_sum 50.403000" in lineas
+    assert "redistour_mapa_segundos_count 4" in lineas
+
+
+def test_cronometro_observa_aunque_falle():
+    with pytest.raises(RuntimeError):
+        with metricas.cronometro("redistour_carga_segundos", funcion="x"):
+            raise RuntimeError
+    assert 'redistour_carga_segundos_count{funcion="x"} 1' in metricas.exposicion().splitlines()
+
+
+def test_un_medidor_que_falla_no_rompe_la_exposicion():
+    metricas.registrar_medidor("redistour_sesiones_activas", lambda: [({}, 4)])
+    metricas.registrar_medidor("redistour_consultas_cache_bytes", lambda: 1 / 0)
+    texto = metricas.exposicion()
+    assert "redistour_sesiones_activas 4" in texto.splitlines()
+    assert "redistour_consultas_cache_bytes" not in texto
+
+
+def test_escribir_fichero(tmp_path):
+    metricas.incrementar("redistour_cache_fallos_total", funcion="a")
+    ruta = tmp_path / "prom" / "redistour.prom"
+    metricas.escribir_fichero(ruta)
+    assert ruta.read_text(encoding="utf-8") == metricas.exposicion()
+    assert [p.name for p in ruta.parent.iterdir()] == ["redistour.prom"]
+
+
+def test_tamaño_bytes():
+    arr = np.zeros(1000, dtype=np.float64)
+    df = pd.DataFrame({"a": arr})
+    assert metricas.tamaño_bytes(arr) == 8000
+    assert metricas.tamaño_bytes(df) >= 8000
+    assert metricas.tamaño_bytes((df, [arr], {"x": arr})) > 3 * 8000
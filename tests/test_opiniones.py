@@ -0,0 +1,23 @@
+# Proyecto RedisTour
+# Resumen de opiniones: alcance de las negaciones en el tono y cálculo en la app
+
+import opiniones
+from opiniones import tono
+
+
+def test_la_negacion_no_cruza_la_puntuacion():
+    assert tono("no me gustó, horrible") == -1.0
+
+
+def test_una_palabra_negativa_negada_es_neutra():
+    assert tono("no es nada caro") == 0.0
+    assert tono("no es precioso") == -1.0
+
+
+def test_calcular_en_un_proceso_por_defecto(monkeypatch):
+    monkeypatch.setattr(opiniones, "MIN_OPINIONES_PROCESOS", 0)
+    monkeypatch.setattr(opiniones, "ProcessPoolExecutor", None)  # fallaría si se usara el pool
+    df = opiniones.calcular({"A": ["precioso y tranquilo", "no me gustó, horrible"], "B": ["caro"]})
+    assert df["ZONA_TURISTICA"].tolist() == ["A", "B"]
+    assert df["N_OPINIONES"].tolist() == [2, 1]
+    assert df.loc[0, "TONO"] == 0.0 and df.loc[1, "TONO"] == -1.0
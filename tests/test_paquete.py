@@ -0,0 +1,91 @@
+# Proyecto RedisTour
+# Paquete de datos derivados: lo que se lee de disco coincide con el cálculo en memoria
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import datos
+import paquete
+from busqueda import IndiceTexto, analizar
+from historico import MotorAcumulados
+
+ZONAS = ["Costa A", "Costa B", "Sierra C", "Sierra D", "Isla E"]
+
+
+def _historico():
+    rng = np.random.default_rng(0)
+    filas = [(z, año, mes, *rng.uniform(100, 1000, 4), *rng.uniform(10, 90, 4))
+             for z in ZONAS[:4] for año in (2022, 2023, 2024) for mes in range(1, 13)]
+    return pd.DataFrame(filas, columns=datos.CLAVE_FILA + datos.VIAJEROS_COLS + datos.OCUPACION_COLS)
+
+
+def _forecasts():
+    rng = np.random.default_rng(1)
+    filas = [(z, 2025, mes, *rng.uniform(10, 90, 4)) for z in ZONAS for mes in range(1, 13)]
+    df = pd.DataFrame(filas, columns=datos.CLAVE_FILA + datos.OCUPACION_COLS)
+    for c in datos.OCUPACION_COLS:
+        df[c + "_P10"], df[c + "_P90"] = df[c] - 5, df[c] + 5
+    df.loc[0, datos.OCUPACION_COLS[1]] = np.nan
+    return df
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    df_hist, df_fore = _historico(), _forecasts()
+    df_zt = pd.DataFrame({
+        "ZONA_TURISTICA": ZONAS,
+        "Tipo_Ubicación": ["Costa", "Costa", "Interior", "Interior", "Isla"],
+        "Altitud_Media_msnm": [5.0, 20.0, 1200.0, 900.0, 300.0],
+        "Distancia_al_mar_km": [0.0, 1.0, 150.0, 90.0, 2.0],
+    })
+    textos = ["playa arena sol", "playa puerto", "montaña nieve pinos", "montaña ruta", "volcán playa"]
+    vectorizador = TfidfVectorizer(analyzer=analizar)
+    snap = SimpleNamespace(df=df_hist, motor=MotorAcumulados(df_hist, datos.VIAJEROS_COLS))
+
+    monkeypatch.setattr(paquete, "PAQUETE_DIR", tmp_path)
+    monkeypatch.setattr(datos, "instantanea_datos", lambda: snap)
+    monkeypatch.setattr(datos, "cargar_descripciones_y_datazt", lambda: (df_zt, None))
+    monkeypatch.setattr(datos, "cargar_forecasts", lambda: (df_fore, None))
+    monkeypatch.setattr(datos, "forecasts_regenerados", lambda: False)
+    monkeypatch.setattr(paquete, "indice_texto",
+                        lambda: IndiceTexto(ZONAS, vectorizador, vectorizador.fit_transform(textos).tocsr()))
+    paquete._abrir.clear()
+    manifest = paquete.construir()
+    yield SimpleNamespace(snap=snap, df_zt=df_zt, df_fore=df_fore, paq=paquete._abrir(manifest["version"]))
+    paquete._abrir.clear()
+
+
+def test_el_paquete_se_reabre_desde_disco(entorno):
+    assert entorno.paq is not None
+    assert isinstance(entorno.paq.arrays["viajeros_acum"], np.memmap)
+
+
+def test_motor_coincide_con_el_de_memoria(entorno):
+    motor = entorno.paq.motor()
+    for ventana in ["YTD", "R12", "T3M", "MES"]:
+        for zonas, tipos in [(None, None), (["Costa A", "Sierra D"], ["VIAJEROS_EOH"])]:
+            assert motor.comparar(ventana, zonas, tipos) == entorno.snap.motor.comparar(ventana, zonas, tipos)
+
+
+def test_ocupacion_coincide_con_los_forecasts(entorno):
+    for mes in (1, 8):
+        occ = entorno.paq.ocupacion(ZONAS, 2025, mes)
+        esperado = datos.attach_occupancy_breakdown(entorno.df_fore, ZONAS, 2025, mes)
+        for z in ZONAS:
+            assert {t: occ[z][c] for t, c in datos.OCC_COLS_DEFAULT.items()} == pytest.approx(esperado[z])
+    # fuera del horizonte no hay dato
+    assert all(v is None for v in entorno.paq.ocupacion(["Costa A"], 2030, 1)["Costa A"].values())
+
+
+def test_vecinos_coinciden_con_el_knn(entorno):
+    pipe, df_knn, _ = datos.entrenar_pipeline(entorno.df_zt.copy())
+    Xt = pipe.named_steps["preprocessor"].transform(df_knn)
+    dist, idx = pipe.named_steps["knn"].kneighbors(Xt, n_neighbors=4)
+    for i, zona in enumerate(ZONAS):
+        vecinos = entorno.paq.vecinos(zona, 4)
+        assert [z for z, _ in vecinos] == [ZONAS[j] for j in idx[i]]
+        assert [d for _, d in vecinos] == pytest.approx(dist[i].tolist(), abs=1e-6)
@@ -0,0 +1,59 @@
+# Proyecto RedisTour
+# Previsión de ocupación: horizonte de `generar`, intervalos y detección de forecasts obsoletos
+
+import numpy as np
+import pandas as pd
+
+import pronostico
+
+COL = "GRADO_OCUPA_PLAZAS_EOH"
+
+
+def _hist(años=(2021, 2022, 2023, 2024)):
+    rng = np.random.default_rng(0)
+    filas = []
+    for zona, base in [("A", 40.0), ("B", 60.0)]:
+        for año in años:
+            for mes in range(1, 13):
+                # estacionalidad marcada con pico en agosto y algo de ruido
+                filas.append((zona, año, mes, base + 20 * np.cos((mes - 8) * np.pi / 6) + rng.normal(0, 2)))
+    return pd.DataFrame(filas, columns=["ZONA_TURISTICA", "AÑO", "MES", COL])
+
+
+def test_generar_cubre_el_horizonte_sin_solaparse_con_el_historico():
+    df = pronostico.generar(_hist(), años=2)
+    assert set(df["ZONA_TURISTICA"]) == {"A", "B"}
+    assert (df["AÑO"].min(), df["AÑO"].max()) == (2025, 2026)
+    assert len(df) == 2 * 24
+    assert df[COL].between(0, 100).all()
+    # la estacionalidad del histórico se conserva: agosto por encima de febrero
+    a = df[df["ZONA_TURISTICA"] == "A"].set_index("MES")[COL]
+    assert a.loc[8].mean() > a.loc[2].mean() + 20
+
+
+def test_los_intervalos_contienen_la_prevision():
+    hist = _hist()
+    df = pronostico.con_intervalos(pronostico.generar(hist, años=1), hist, n_sim=50)
+    p10, p90 = (df[COL + s] for s in pronostico.SUFIJOS_INTERVALO)
+    assert (p10 <= df[COL]).all() and (df[COL] <= p90).all()
+    assert (p90 - p10).gt(0).any()
+    assert p10.between(0, 100).all() and p90.between(0, 100).all()
+
+
+def test_obsoleto():
+    hist = _hist()
+    fore = pronostico.generar(hist, años=1)
+    assert not pronostico.obsoleto(fore, hist)
+    # el histórico ya llega al primer mes previsto
+    assert pronostico.obsoleto(fore, pd.concat([hist, fore.head(1)]))
+    assert pronostico.obsoleto(None, hist)
+    assert pronostico.obsoleto(fore.iloc[:0], hist)
+
+
+def test_obsoleto_ignora_meses_vacios():
+    hist = _hist()
+    fore = pronostico.generar(hist, años=1)
+    fore.loc[0, "AÑO"] = pd.NA
+    fore.loc[1, "MES"] = pd.NA
+    assert not pronostico.obsoleto(fore, hist)
+    assert pronostico.obsoleto(fore.assign(AÑO=pd.NA), hist)
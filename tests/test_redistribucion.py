@@ -0,0 +1,101 @@
+# Proyecto RedisTour
+# Plan de redistribución: balance de oferta y capacidad, casos sin solución y exportación
+
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from busqueda import PerfilesZona
+from redistribucion import COLUMNAS_FLUJOS, exportar_plan, planificar
+from saturacion import IndiceSaturacion
+
+# (zona, saturación, ocupación %, viajeros, dirección del perfil de atributos)
+ZONAS = [
+    ("Sat1", 80.0, 90.0, 10_000.0, (1.0, 0.0)),
+    ("Sat2", 70.0, 85.0, 5_000.0, (0.0, 1.0)),
+    ("Libre1", 30.0, 35.0, 4_000.0, (1.0, 0.1)),
+    ("Libre2", 40.0, 50.0, 2_000.0, (0.1, 1.0)),
+    ("Llena", 50.0, 75.0, 3_000.0, (1.0, 0.05)),  # bajo el umbral pero sobre la ocupación objetivo
+]
+
+
+def _indice(zonas=ZONAS) -> IndiceSaturacion:
+    n = len(zonas)
+    comp = np.full((n, 1, 3), np.nan, dtype=np.float32)
+    comp[:, 0, 0] = [o / 100 for _, _, o, _, _ in zonas]
+    return IndiceSaturacion(
+        zonas=[z for z, *_ in zonas], t0=2024 * 12 + 7, ultimo_historico=2024 * 12 + 7,
+        valores=np.array([[s] for _, s, *_ in zonas], dtype=np.float32), componentes=comp,
+        viajeros=np.array([[v] for *_, v, _ in zonas], dtype=np.float32))
+
+
+def _perfiles(zonas=ZONAS) -> PerfilesZona:
+    X = np.array([d for *_, d in zonas], dtype=np.float32)
+    X /= np.linalg.norm(X, axis=1, keepdims=True)
+    return PerfilesZona([z for z, *_ in zonas], X, np.zeros((len(zonas), 4), dtype=np.float32))
+
+
+def test_el_plan_cuadra_oferta_y_capacidad():
+    plan = planificar(_indice(), _perfiles(), 2024, 8, umbral=55.0, ocupacion_objetivo=70.0)
+    assert plan.estado == "Óptimo"
+    o = plan.origenes.set_index("ZONA_TURISTICA")
+    assert set(o.index) == {"Sat1", "Sat2"}
+    # exceso = viajeros que sobran para bajar el índice al umbral
+    assert o.loc["Sat1", "EXCESO"] == pytest.approx(10_000 * 25 / 80)
+    assert (o["REUBICADO"] + o["SIN_DESTINO"]).to_numpy() == pytest.approx(o["EXCESO"].to_numpy())
+
+    # nada va a zonas saturadas o sin margen, y ningún destino pasa de la ocupación objetivo
+    assert set(plan.flujos["DESTINO"]) <= {"Libre1", "Libre2"}
+    llegan = plan.flujos.groupby("DESTINO")["VIAJEROS"].sum()
+    margen = {"Libre1": 4_000 * (70 - 35) / 35, "Libre2": 2_000 * (70 - 50) / 50}
+    for destino, n in llegan.items():
+        assert n <= margen[destino] + 1e-6
+    assert (plan.flujos["OCUPACION_DESTINO_TRAS"] <= 70.0 + 1e-6).all()
+    enviados = plan.flujos.groupby("ORIGEN")["VIAJEROS"].sum()
+    assert enviados.to_numpy() == pytest.approx(o.loc[enviados.index, "REUBICADO"].to_numpy(), abs=1.0)
+
+
+def test_cada_origen_va_a_su_destino_mas_parecido_si_cabe():
+    plan = planificar(_indice(), _perfiles(), 2024, 8)
+    principal = plan.flujos.sort_values("VIAJEROS").groupby("ORIGEN")["DESTINO"].last()
+    assert principal.to_dict() == {"Sat1": "Libre1", "Sat2": "Libre2"}
+
+
+def test_sin_capacidad_suficiente_el_resto_queda_sin_destino():
+    # un único destino con 400 viajeros de margen para 3125 de exceso
+    zonas = [ZONAS[0], ("Libre", 30.0, 56.0, 1_600.0, (1.0, 0.0))]
+    plan = planificar(_indice(zonas), _perfiles(zonas), 2024, 8)
+    o = plan.origenes.iloc[0]
+    assert o["REUBICADO"] == pytest.approx(400.0, rel=1e-4)
+    assert o["SIN_DESTINO"] == pytest.approx(o["EXCESO"] - 400.0, rel=1e-4)
+    assert plan.resumen()["pct_reubicado"] == pytest.approx(100 * 400 / o["EXCESO"], rel=1e-4)
+
+
+def test_sin_origenes_o_sin_destinos_devuelve_un_plan_vacio():
+    plan = planificar(_indice(), _perfiles(), 2024, 8, umbral=95.0)
+    assert plan.estado == "No hay zonas por encima del umbral"
+    assert plan.origenes.empty and plan.flujos.empty
+
+    plan = planificar(_indice(), _perfiles(), 2024, 8, ocupacion_objetivo=20.0)
+    assert plan.estado == "No hay zonas con margen de ocupación"
+    assert plan.flujos.empty
+    assert (plan.origenes["SIN_DESTINO"] == plan.origenes["EXCESO"]).all()
+    assert plan.resumen()["reubicado"] == 0.0
+
+    # un mes fuera de la rejilla tampoco tiene zonas saturadas
+    assert planificar(_indice(), _perfiles(), 2030, 1).flujos.empty
+
+
+def test_exportar_plan_incluye_flujos_balance_y_parametros():
+    plan = planificar(_indice(), _perfiles(), 2024, 8, ocupacion_objetivo=65.0)
+    with zipfile.ZipFile(io.BytesIO(exportar_plan(plan))) as zf:
+        assert sorted(zf.namelist()) == ["flujos.csv", "manifest.json", "origenes.csv"]
+        cabecera = zf.read("flujos.csv").decode("utf-8").splitlines()[0]
+        manifest = json.loads(zf.read("manifest.json"))
+    assert cabecera.split(",") == COLUMNAS_FLUJOS
+    assert (manifest["año"], manifest["mes"], manifest["estado"]) == (2024, 8, "Óptimo")
+    assert manifest["parametros"]["ocupacion_objetivo"] == 65.0
+    assert manifest["resumen"]["reubicado"] == pytest.approx(plan.resumen()["reubicado"])
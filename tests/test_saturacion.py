@@ -0,0 +1,77 @@
+# Proyecto RedisTour
+# Índice de saturación: rango, componentes, lecturas indexadas y meses previstos
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import saturacion
+
+
+def _hist():
+    filas = []
+    for zona, base, occ in [("Costa", 1000.0, 60.0), ("Interior", 500.0, 30.0)]:
+        for año in (2022, 2023):
+            for mes in range(1, 13):
+                # Costa muy estacional (pico en agosto); Interior plano
+                pico = 4.0 if zona == "Costa" and mes == 8 else 1.0
+                filas.append((zona, año, mes, base * pico, occ * min(pico, 1.5)))
+    return pd.DataFrame(filas, columns=["ZONA_TURISTICA", "AÑO", "MES", "VIAJEROS_EOH", "GRADO_OCUPA_PLAZAS_EOH"])
+
+
+def _fore():
+    return pd.DataFrame({"ZONA_TURISTICA": ["Costa", "Costa", "Interior"], "AÑO": [2023, 2024, 2024],
+                         "MES": [12, 8, 8], "GRADO_OCUPA_PLAZAS_EOH": [1.0, 95.0, 35.0]})
+
+
+def test_el_indice_esta_entre_0_y_100_y_refleja_la_presion():
+    ind = saturacion.calcular(_hist(), None)
+    v = ind.valores[np.isfinite(ind.valores)]
+    assert len(v) and (v >= 0).all() and (v <= 100).all()
+    assert ind.valor("Costa", 2023, 8) > ind.valor("Costa", 2023, 2)
+    assert ind.valor("Costa", 2023, 8) > ind.valor("Interior", 2023, 8)
+    # Interior no tiene estacionalidad: su componente es 0
+    assert ind.componentes[ind.zonas.index("Interior"), 0, 2] == pytest.approx(0.0)
+
+
+def test_fuera_de_la_rejilla_no_hay_valor():
+    ind = saturacion.calcular(_hist(), None)
+    assert ind.valor("Costa", 2021, 12) is None
+    assert ind.valor("Costa", 2024, 1) is None
+    assert ind.valor("Desconocida", 2023, 1) is None
+    out = ind.buscar(["Costa", "Costa", "Desconocida", "Interior"], [2023, 2019, 2023, 2022], [8, 1, 8, 3])
+    assert out[0] == pytest.approx(ind.valor("Costa", 2023, 8))
+    assert np.isnan(out[1]) and np.isnan(out[2])
+    assert out[3] == pytest.approx(ind.valor("Interior", 2022, 3))
+
+
+def test_corte_de_un_mes():
+    ind = saturacion.calcular(_hist(), None)
+    c = ind.corte(2023, 8)
+    assert list(c.columns) == ["SATURACION", "OCUPACION", "VIAJEROS"]
+    assert c.index.tolist() == ["Costa", "Interior"]
+    assert c.loc["Costa", "SATURACION"] == pytest.approx(ind.valor("Costa", 2023, 8))
+    assert c.loc["Costa", "OCUPACION"] == pytest.approx(90.0)
+    assert c.loc["Costa", "VIAJEROS"] == pytest.approx(4000.0)
+    fuera = ind.corte(2030, 1)
+    assert fuera.index.tolist() == ["Costa", "Interior"] and fuera.isna().all().all()
+
+
+def test_los_forecasts_solo_rellenan_meses_posteriores_al_historico():
+    ind = saturacion.calcular(_hist(), _fore())
+    # diciembre de 2023 es histórico: el forecast no lo pisa
+    assert ind.corte(2023, 12).loc["Costa", "OCUPACION"] == pytest.approx(60.0)
+    prev = ind.corte(2024, 8)
+    assert prev.loc["Costa", "OCUPACION"] == pytest.approx(95.0)
+    # viajeros previstos = media de la zona × perfil estacional de agosto
+    assert prev.loc["Costa", "VIAJEROS"] == pytest.approx(4000.0)
+    assert ind.valor("Costa", 2024, 8) > ind.valor("Interior", 2024, 8)
+    assert ind.ultimo_historico == 2023 * 12 + 11
+
+
+def test_media_de_un_periodo():
+    ind = saturacion.calcular(_hist(), None)
+    esperada = np.mean([ind.valor("Costa", a, 8) for a in (2022, 2023)])
+    assert ind.media(["Costa"], (2022, 2023), [8]) == pytest.approx(esperada)
+    assert ind.media(["Desconocida"], (2022, 2023), [8]) is None
+    assert ind.media(["Costa"], (2030, 2031), [8]) is None